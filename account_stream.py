@@ -0,0 +1,190 @@
+import os
+import threading
+import time
+from logger_setup import setup_logger
+from stream_worker import StreamWorker
+from market_data_stream import LIVE_WS_BASE_URL, TESTNET_WS_BASE_URL
+
+logger = setup_logger('account_stream')
+
+class AccountBalanceCache:
+    """
+    👛 كاش أرصدة الحساب - يُغذّى من User Data Stream (listenKey)
+    عبر أحداث outboundAccountPosition و balanceUpdate
+
+    REST (/api/v3/account) يُستخدم فقط للتحميل الأولي، بعد كل إعادة اتصال،
+    وللمطابقة الدورية.
+    """
+    def __init__(self, binance_client, ws_base_url=None, keepalive_interval_seconds=1800,
+                 reconcile_interval_seconds=300):
+        self.binance_client = binance_client
+        self.keepalive_interval_seconds = keepalive_interval_seconds
+        self.reconcile_interval_seconds = reconcile_interval_seconds
+
+        if ws_base_url is None:
+            ws_base_url = os.environ.get('BINANCE_WS_BASE_URL')
+        if ws_base_url is None:
+            ws_base_url = TESTNET_WS_BASE_URL if getattr(binance_client, 'testnet', False) else LIVE_WS_BASE_URL
+        self.ws_base_url = ws_base_url.rstrip('/')
+
+        self.listen_key = None
+        self._lock = threading.Lock()
+        self._balances = {}
+        self._asset_update_time = {}
+        self._needs_reload = True
+        self._last_rest_load = 0.0
+        self._keepalive_stop = threading.Event()
+        self._keepalive_thread = None
+
+        self.stats = {
+            'served_from_cache': 0,
+            'rest_loads': 0,
+            'reconciliations': 0,
+            'reconcile_mismatches': 0,
+            'account_events': 0,
+            'balance_events': 0,
+            'keepalives': 0,
+            'fallbacks': 0
+        }
+
+        self.worker = StreamWorker(
+            'user-data',
+            url_factory=self.build_stream_url,
+            on_message=self.handle_message,
+            on_connect=self._on_connect
+        )
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        stream_config = config.get('market_data', {}).get('user_data_stream', {})
+        return cls(
+            binance_client,
+            ws_base_url=stream_config.get('base_url') or config.get('endpoints', {}).get('ws_base_url'),
+            keepalive_interval_seconds=stream_config.get('keepalive_interval_seconds', 1800),
+            reconcile_interval_seconds=stream_config.get('reconcile_interval_seconds', 300)
+        )
+
+    def build_stream_url(self):
+        if not self.listen_key:
+            self.listen_key = self.binance_client.create_listen_key()
+            if not self.listen_key:
+                return None
+        return f"{self.ws_base_url}/ws/{self.listen_key}"
+
+    def start(self):
+        if not self.binance_client.client:
+            return False
+
+        started = self.worker.start()
+        if started:
+            self._keepalive_stop.clear()
+            self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name='user-data-keepalive', daemon=True)
+            self._keepalive_thread.start()
+            logger.info("👛 User data stream started")
+        return started
+
+    def stop(self):
+        self._keepalive_stop.set()
+        self.worker.stop()
+        if self.listen_key:
+            self.binance_client.close_listen_key(self.listen_key)
+            self.listen_key = None
+
+    def _keepalive_loop(self):
+        while not self._keepalive_stop.wait(self.keepalive_interval_seconds):
+            if not self.listen_key:
+                continue
+
+            if self.binance_client.keepalive_listen_key(self.listen_key):
+                self.stats['keepalives'] += 1
+            else:
+                logger.warning("⚠️ listenKey keepalive failed - requesting a new key")
+                self._expire_listen_key()
+
+    def _expire_listen_key(self):
+        self.listen_key = None
+        self.worker.reconnect()
+
+    def _on_connect(self):
+        # الأحداث التي فاتت أثناء الانقطاع غير قابلة للاسترجاع - نعيد التحميل من REST
+        with self._lock:
+            self._needs_reload = True
+
+    def handle_message(self, message):
+        data = message.get('data', message)
+        event_type = data.get('e')
+
+        if event_type == 'outboundAccountPosition':
+            self.stats['account_events'] += 1
+            event_time = data.get('u', data.get('E', 0))
+            with self._lock:
+                for balance in data.get('B', []):
+                    asset = balance['a']
+                    if event_time < self._asset_update_time.get(asset, 0):
+                        continue
+                    self._set_balance(asset, float(balance['f']), float(balance['l']))
+                    self._asset_update_time[asset] = event_time
+
+        elif event_type == 'balanceUpdate':
+            self.stats['balance_events'] += 1
+            asset = data['a']
+            delta = float(data['d'])
+            with self._lock:
+                current = self._balances.get(asset, {'free': 0.0, 'locked': 0.0})
+                self._set_balance(asset, current['free'] + delta, current['locked'])
+                self._asset_update_time[asset] = max(self._asset_update_time.get(asset, 0), data.get('E', 0))
+
+        elif event_type == 'listenKeyExpired':
+            logger.warning("⚠️ listenKey expired - reconnecting user data stream")
+            self._expire_listen_key()
+
+    def _set_balance(self, asset, free, locked):
+        if free > 0 or locked > 0:
+            self._balances[asset] = {'free': free, 'locked': locked, 'total': free + locked}
+        else:
+            self._balances.pop(asset, None)
+
+    def _load_from_rest(self):
+        balances = self.binance_client.fetch_account_balance_rest()
+        if balances is None:
+            return False
+
+        with self._lock:
+            if self._last_rest_load and not self._needs_reload:
+                self.stats['reconciliations'] += 1
+                if balances != self._balances:
+                    self.stats['reconcile_mismatches'] += 1
+                    logger.warning("⚠️ Account cache drifted from REST snapshot - reconciled")
+            else:
+                self.stats['rest_loads'] += 1
+
+            self._balances = balances
+            self._asset_update_time = {}
+            self._needs_reload = False
+            self._last_rest_load = time.time()
+        return True
+
+    def get_balances(self):
+        """
+        إرجاع الأرصدة من الذاكرة، أو None للرجوع إلى REST إذا كان البث غير متصل
+        """
+        if not self.worker.connected:
+            self.stats['fallbacks'] += 1
+            return None
+
+        reconcile_due = time.time() - self._last_rest_load >= self.reconcile_interval_seconds
+        if (self._needs_reload or reconcile_due) and not self._load_from_rest():
+            self.stats['fallbacks'] += 1
+            return None
+
+        self.stats['served_from_cache'] += 1
+        with self._lock:
+            return {asset: dict(balance) for asset, balance in self._balances.items()}
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'assets': len(self._balances),
+            'seconds_since_rest_load': round(time.time() - self._last_rest_load, 1) if self._last_rest_load else None,
+            **self.worker.get_stats()
+        }
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+import time
+from urllib.parse import urlencode
+from logger_setup import setup_logger
+from rate_limiter import (get_rate_limiter, endpoint_weight, PRIORITY_STOP_CHECK, PRIORITY_PRICE,
+                          PRIORITY_KLINES)
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+logger = setup_logger('async_market_client')
+
+LIVE_REST_BASE_URL = "https://api.binance.com"
+TESTNET_REST_BASE_URL = "https://testnet.binance.vision"
+
+class AsyncMarketDataClient:
+    """
+    ⚡ عميل بيانات السوق غير المتزامن (aiohttp)
+
+    يوفر نفس واجهة القراءة في BinanceClientManager، ويجلب كل الرموز
+    والأطر الزمنية بالتوازي في جولة واحدة قبل مرحلة اتخاذ القرار.
+    يعمل على event loop في خيط خلفي مع جلسة keep-alive واحدة.
+    """
+    def __init__(self, binance_client, base_url=None, max_concurrency=20, timeout_seconds=10):
+        self.binance_client = binance_client
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+
+        if base_url is None:
+            base_url = getattr(binance_client, 'rest_base_url', None)
+        if base_url is None:
+            # وضع العرض يستخدم الـ API العام الحي مثل BinanceClientManager
+            use_testnet = getattr(binance_client, 'testnet', False) and getattr(binance_client, 'client', None)
+            base_url = TESTNET_REST_BASE_URL if use_testnet else LIVE_REST_BASE_URL
+        self.base_url = base_url.rstrip('/')
+
+        self.api_key = os.environ.get('BINANCE_API_KEY')
+        self.api_secret = os.environ.get('BINANCE_API_SECRET')
+        self.rate_limiter = get_rate_limiter('spot')
+
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+        self._ready = threading.Event()
+
+        self.stats = {
+            'requests': 0,
+            'failures': 0,
+            'deferred': 0,
+            'gathers': 0,
+            'last_gather_ms': None
+        }
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        async_config = config.get('market_data', {}).get('async_client', {})
+        return cls(
+            binance_client,
+            base_url=async_config.get('base_url'),
+            max_concurrency=async_config.get('max_concurrency', 20),
+            timeout_seconds=async_config.get('timeout_seconds', 10)
+        )
+
+    def start(self):
+        if not AIOHTTP_AVAILABLE:
+            logger.warning("⚠️ aiohttp package not installed - concurrent market data disabled")
+            return False
+
+        if self._thread and self._thread.is_alive():
+            return True
+
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run_loop, name='async-market-data', daemon=True)
+        self._thread.start()
+        return self._ready.wait(timeout=5)
+
+    def stop(self):
+        if not self._loop:
+            return
+        try:
+            self.run(self._close_session(), timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout_seconds),
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            )
+        return self._session
+
+    async def _close_session(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def run(self, coro, timeout=None):
+        """تشغيل coroutine على الـ loop الخلفي وانتظار نتيجتها من كود متزامن"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout if timeout is not None else self.timeout_seconds * 3)
+
+    def _sign(self, params):
+        params = dict(params, timestamp=int(time.time() * 1000))
+        query = urlencode(params)
+        params['signature'] = hmac.new(self.api_secret.encode(), query.encode(), hashlib.sha256).hexdigest()
+        return params
+
+    async def _request(self, path, params=None, endpoint=None, priority=PRIORITY_PRICE, limit=None, signed=False):
+        if not self.rate_limiter.acquire(endpoint_weight('spot', endpoint, limit), priority, max_wait_seconds=0):
+            self.stats['deferred'] += 1
+            return None
+
+        params = dict(params or {})
+        headers = {}
+        if signed:
+            if not (self.api_key and self.api_secret):
+                return None
+            params = self._sign(params)
+            headers['X-MBX-APIKEY'] = self.api_key
+
+        session = await self._get_session()
+        async with self._semaphore:
+            self.stats['requests'] += 1
+            try:
+                async with session.get(f"{self.base_url}{path}", params=params, headers=headers) as response:
+                    self.rate_limiter.update_from_headers(response.headers, response.status)
+                    if response.status != 200:
+                        self.stats['failures'] += 1
+                        logger.debug(f"HTTP {response.status} for {path} {params.get('symbol', '')}")
+                        return None
+                    return await response.json()
+            except Exception as e:
+                self.stats['failures'] += 1
+                logger.debug(f"Async request {path} failed: {e}")
+                return None
+
+    async def fetch_klines(self, symbol, interval, limit=100, start_time=None):
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        return await self._request('/api/v3/klines', params, 'klines', PRIORITY_KLINES, limit=limit)
+
+    async def get_symbol_price(self, symbol):
+        data = await self._request('/api/v3/ticker/price', {'symbol': symbol}, 'ticker_price')
+        return float(data['price']) if data else None
+
+    async def get_all_prices(self):
+        tickers = await self._request('/api/v3/ticker/price', endpoint='ticker_price_all')
+        if not tickers:
+            return {}
+        return {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+
+    async def get_account_balance(self):
+        account = await self._request('/api/v3/account', endpoint='account', priority=PRIORITY_STOP_CHECK, signed=True)
+        if not account:
+            return {}
+
+        balances = {}
+        for balance in account['balances']:
+            free = float(balance['free'])
+            locked = float(balance['locked'])
+            if free > 0 or locked > 0:
+                balances[balance['asset']] = {'free': free, 'locked': locked, 'total': free + locked}
+        return balances
+
+    async def get_exchange_info(self):
+        return await self._request('/api/v3/exchangeInfo', endpoint='exchange_info', priority=PRIORITY_KLINES)
+
+    async def gather_iteration(self, kline_plans, include_prices=True):
+        """
+        جلب كل الشموع المطلوبة (+ لقطة الأسعار) بالتوازي
+        kline_plans: [(symbol, interval, limit, start_time), ...]
+        """
+        tasks = [self.fetch_klines(symbol, interval, limit, start_time)
+                 for symbol, interval, limit, start_time in kline_plans]
+        if include_prices:
+            tasks.append(self.get_all_prices())
+
+        results = await asyncio.gather(*tasks)
+        prices = results.pop() if include_prices else {}
+
+        klines = {(plan[0], plan[1]): rows for plan, rows in zip(kline_plans, results)}
+        return klines, prices
+
+    def fetch_iteration_inputs(self, kline_plans, include_prices=True):
+        """نسخة متزامنة من gather_iteration للحلقة الرئيسية"""
+        started = time.time()
+        try:
+            result = self.run(self.gather_iteration(kline_plans, include_prices))
+        except Exception as e:
+            logger.error(f"Error fetching iteration inputs: {e}")
+            return {}, {}
+
+        self.stats['gathers'] += 1
+        self.stats['last_gather_ms'] = round((time.time() - started) * 1000, 1)
+        return result
+
+    def get_stats(self):
+        return {**self.stats, 'base_url': self.base_url, 'max_concurrency': self.max_concurrency}
@@ -0,0 +1,295 @@
+"""
+⏱️ Benchmarks على بيانات سوق اصطناعية قابلة للتكرار
+
+    python benchmarks.py --seed 42 --symbols 10 --candles 100000
+    python benchmarks.py --only regime swarm
+"""
+
+import argparse
+import json
+import tempfile
+import time
+import numpy as np
+from logger_setup import setup_logger
+from synthetic_market import SyntheticMarket, REGIMES, DEFAULT_BASE_PRICES
+
+logger = setup_logger('benchmarks')
+
+def load_config(path='config.json'):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def timed(func, *args, repeat=1):
+    """أفضل زمن (ثوانٍ) من `repeat` تشغيلات + نتيجة آخر تشغيل"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def symbol_names(count):
+    names = list(DEFAULT_BASE_PRICES)
+    return (names + [f"SYN{i}USDT" for i in range(count)])[:count]
+
+def bench_generator(market, symbols, candles, interval):
+    seconds, _ = timed(market.generate_many, symbols, candles, interval, repeat=3)
+    total = len(symbols) * candles
+    logger.info(f"🧪 Generator: {total:,} candles ({len(symbols)} symbols) in {seconds * 1000:.1f}ms "
+                f"= {total / seconds / 1e6:.2f}M candles/s")
+
+    rows_seconds, _ = timed(market.generate_klines, symbols[0], 1000, interval, repeat=3)
+    logger.info(f"🧪 REST rows: 1,000 klines in {rows_seconds * 1000:.2f}ms")
+
+def indicator_frame(config, arrays):
+    from technical_indicators import TechnicalIndicators
+    return TechnicalIndicators(config).calculate_all_indicators(arrays)
+
+def bench_regime(config, market, symbol, candles, interval, window):
+    from market_regime import MarketRegime
+
+    arrays = market.generate(symbol, candles, interval)
+    df = indicator_frame(config, arrays)
+    regime = MarketRegime(config)
+
+    columns = ['close', 'adx', 'ema_short', 'ema_long', 'bb_upper', 'bb_lower', 'bb_middle']
+    rows = df[columns].to_dict('records')
+    closes = arrays['close']
+    start = max(window, config['indicators']['ema_long'] * 2)
+
+    def run():
+        detected = []
+        for i in range(start, len(rows)):
+            detected.append(regime.detect_regime(rows[i], {'close': closes[i - window + 1:i + 1]})[0])
+        return detected
+
+    seconds, detected = timed(run)
+    calls = len(detected)
+    truth = [REGIMES[index] for index in arrays['regime'][start:]]
+    agreement = np.mean([d == t for d, t in zip(detected, truth)]) * 100
+    distribution = {name: detected.count(name) for name in REGIMES}
+    logger.info(f"🌡️ detect_regime: {calls:,} calls in {seconds * 1000:.1f}ms "
+                f"= {seconds / calls * 1e6:.1f}µs/call | agreement with generator regime {agreement:.1f}% | {distribution}")
+
+def bench_swarm(config, market, symbol, candles, interval, num_workers):
+    from numpy.lib.stride_tricks import sliding_window_view
+    from swarm_intelligence import SwarmManager
+    from feature_builder import FeatureBuilder, FEATURE_NAMES, FeatureSnapshot
+
+    builder = FeatureBuilder.from_config(config)
+    window = builder.required_candles
+    arrays = market.generate(symbol, candles + window - 1, interval)
+    windows = {name: sliding_window_view(arrays[name], window) for name in ('high', 'low', 'close', 'volume')}
+    feature_seconds, matrix = timed(builder.compute, windows)
+    inputs = [FeatureSnapshot(*row) for row in matrix.tolist()]
+    logger.info(f"🧬 Features: {len(inputs):,} × {len(FEATURE_NAMES)} vectors ({window}-candle windows) "
+                f"in {feature_seconds * 1000:.1f}ms")
+    swarm = SwarmManager(num_workers=num_workers)
+
+    def run():
+        for market_data in inputs:
+            swarm.conduct_vote(symbol, market_data)
+            swarm.run_paper_trading_cycle(symbol, market_data)
+
+    seconds, _ = timed(run)
+    trades = sum(worker.performance.total_trades for worker in swarm.workers)
+    logger.info(f"🐝 Swarm ({num_workers} workers): {len(inputs):,} votes in {seconds * 1000:.1f}ms "
+                f"= {seconds / len(inputs) * 1e3:.2f}ms/vote | {trades:,} paper trades")
+
+def bench_indicator_bank(config, market, symbol, interval, num_workers):
+    from indicator_bank import IndicatorBank
+    from indicator_kernels import IndicatorKernels
+    from feature_builder import FeatureBuilder
+    from swarm_intelligence import SwarmManager
+
+    bank = IndicatorBank.from_swarm(SwarmManager(num_workers=num_workers))
+    arrays = market.generate(symbol, 250, interval)
+    features = FeatureBuilder.from_config(config).build(arrays)
+    base = IndicatorKernels.from_config(config).settings
+
+    def per_variant():
+        for rsi_period, stoch_k, stoch_d, bb_period, bb_std, fast, slow, signal, *_ in bank.params:
+            IndicatorKernels(dict(base, rsi_period=rsi_period, stochastic_period=stoch_k, stoch_d=stoch_d,
+                                  bb_period=bb_period, bb_std=bb_std, macd_fast=fast, macd_slow=slow,
+                                  macd_signal=signal)).latest_values(arrays)
+
+    bank_seconds, _ = timed(bank.variants, arrays, features, repeat=20)
+    naive_seconds, _ = timed(per_variant, repeat=5)
+    logger.info(f"🏦 Indicator bank: {len(bank.params)} variants in {bank_seconds * 1000:.2f}ms vs "
+                f"{naive_seconds * 1000:.2f}ms recomputed per variant ({naive_seconds / bank_seconds:.1f}x)")
+
+def bench_history(market, symbol, years):
+    from historical_data import HistoricalKlineStore
+    from market_data_stream import INTERVAL_MS
+
+    interval_ms = INTERVAL_MS['5m']
+    candles = int(years * 365 * 86_400_000 / interval_ms)
+    arrays = market.generate(symbol, candles, '5m', end_time_ms=int(time.time() * 1000) - interval_ms)
+    matrix = np.column_stack([arrays[name] for name in arrays if name != 'regime'])
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = HistoricalKlineStore(directory)
+        write_seconds, _ = timed(store.append, 'spot', symbol, '5m', matrix)
+
+        def cold_load():
+            store._memmaps.clear()
+            return store.load('spot', symbol, '5m')
+
+        load_seconds, loaded = timed(cold_load, repeat=5)
+        middle = loaded['open_time'][candles // 2]
+        range_seconds, window = timed(store.load, 'spot', symbol, '5m', middle, middle + 30 * 86_400_000, repeat=5)
+        checksum_seconds, _ = timed(lambda: float(loaded['close'].sum()), repeat=3)
+
+    logger.info(f"🗄️ History: {candles:,} 5m candles ({years}y) written in {write_seconds * 1000:.1f}ms | "
+                f"load {load_seconds * 1000:.2f}ms | 30-day range {range_seconds * 1e6:.0f}µs "
+                f"({len(window['close']):,} candles) | full scan {checksum_seconds * 1000:.1f}ms")
+
+def bench_indicators(config, market, symbol, candles, interval, iterations):
+    from indicator_kernels import IndicatorKernels
+    from streaming_indicators import StreamingIndicatorEngine
+
+    arrays = market.generate(symbol, candles + iterations, interval)
+    windows = [{name: column[i:i + candles] for name, column in arrays.items()} for i in range(iterations)]
+    rows = market.generate_klines(symbol, candles, interval)
+    kernels = IndicatorKernels.from_config(config)
+
+    results = {}
+    results['numpy kernels'], latest = timed(lambda: [kernels.latest_values(w) for w in windows])
+    results['numpy kernels (REST rows)'], _ = timed(lambda: [kernels.latest_values(rows) for _ in windows])
+
+    engine = StreamingIndicatorEngine.from_config(config)
+    engine.update(symbol, interval, windows[0])
+    results['streaming engine'], _ = timed(lambda: [engine.update(symbol, interval, w) for w in windows])
+
+    try:
+        from technical_indicators import TechnicalIndicators
+        indicators = TechnicalIndicators(config)
+
+        def pandas_path(klines):
+            df = indicators.calculate_all_indicators(klines)
+            return indicators.get_latest_values(df)
+
+        results['pandas_ta'], reference = timed(lambda: [pandas_path(w) for w in windows])
+        results['pandas_ta (REST rows)'], _ = timed(lambda: [pandas_path(rows) for _ in windows])
+        worst = max(
+            abs(float(ref[name]) - values[name]) / max(abs(float(ref[name])), 1e-9)
+            for ref, values in zip(reference, latest) for name in ref
+            if name not in ('timestamp',) and not np.isnan(float(ref[name]))
+        )
+        logger.info(f"📐 NumPy kernels vs pandas_ta: max relative difference {worst:.2e}")
+    except ImportError as e:
+        logger.warning(f"⚠️ pandas_ta path skipped: {e}")
+
+    baseline = results.get('pandas_ta')
+    for name, seconds in results.items():
+        per_call = seconds / iterations * 1e6
+        speedup = f" ({baseline / seconds:.1f}x)" if baseline and 'REST' not in name else ""
+        logger.info(f"📊 {name}: {per_call:,.0f}µs per {candles}-candle update{speedup}")
+
+def bench_indicator_batch(config, market, symbols, candles, interval):
+    from indicator_kernels import IndicatorKernels
+
+    kernels = IndicatorKernels.from_config(config)
+    data = market.generate_many(symbols, candles, interval)
+    per_symbol, single = timed(lambda: {s: kernels.latest_values(data[s]) for s in symbols}, repeat=5)
+    batched, batch = timed(kernels.latest_values_batch, data, repeat=5)
+    logger.info(f"🧮 Batch ({len(symbols)} symbols × {candles} candles): {batched * 1000:.2f}ms vs "
+                f"{per_symbol * 1000:.2f}ms per-symbol ({per_symbol / batched:.1f}x)")
+
+    # التكافؤ مع latest_values لكل المؤشرات ولمجموعة جزئية (NaN في طرف واحد فقط = خطأ)
+    for groups in (None, ('rsi', 'macd')):
+        single = {s: kernels.latest_values(data[s], groups) for s in symbols}
+        batch = kernels.latest_values_batch(data, groups)
+        worst, mismatched = 0.0, []
+        for s in symbols:
+            for name in single[s]:
+                if name == 'timestamp':
+                    continue
+                expected, actual = single[s][name], batch[s][name]
+                if np.isnan(expected) or np.isnan(actual):
+                    if np.isnan(expected) != np.isnan(actual):
+                        mismatched.append(f"{s}.{name}")
+                    continue
+                worst = max(worst, abs(expected - actual))
+        label = 'all groups' if groups is None else ', '.join(groups)
+        if mismatched or worst > 1e-9:
+            logger.error(f"❌ Batch vs latest_values ({label}): max diff {worst:.1e}, "
+                         f"{len(mismatched)} NaN mismatches (e.g. {', '.join(mismatched[:5])})")
+        else:
+            logger.info(f"✅ Batch vs latest_values ({label}): max diff {worst:.1e}")
+
+def bench_snapshot(config, market, symbol, interval, iterations):
+    import tracemalloc
+    from indicator_kernels import IndicatorKernels
+    from indicator_snapshot import IndicatorSnapshot
+    from feature_builder import FeatureBuilder, FEATURE_NAMES, FeatureSnapshot, causal_signals
+
+    arrays = market.generate(symbol, 250, interval)
+    indicators = IndicatorKernels.from_config(config).latest_values(arrays)
+    indicator_row = indicators.values()
+    feature_row = FeatureBuilder.from_config(config).compute(arrays).tolist()
+
+    def dict_pipeline():
+        # المسار السابق: dict للمؤشرات + copy() للاستراتيجيات + dict السرب بتحويلات float + dict السببية
+        values = dict(zip(IndicatorSnapshot.FIELDS, indicator_row))
+        for_strategy = values.copy()
+        for_strategy['stochastic'] = values.get('stoch_k')
+        for_strategy['current_price'] = values['close']
+        features = dict(zip(FEATURE_NAMES, feature_row))
+        swarm_input = {name: float(features[name]) for name in FEATURE_NAMES}
+        swarm_input['macd'] = {'macd': float(features['macd']), 'signal': float(features['macd_signal']),
+                               'histogram': float(features['macd_hist'])}
+        return values, for_strategy, swarm_input, causal_signals(features)
+
+    def snapshot_pipeline():
+        values = IndicatorSnapshot(*indicator_row)
+        features = FeatureSnapshot(*feature_row)
+        return values, features, causal_signals(features)
+
+    for name, pipeline in (('dicts', dict_pipeline), ('snapshots', snapshot_pipeline)):
+        seconds, _ = timed(lambda: [pipeline() for _ in range(iterations)], repeat=3)
+        tracemalloc.start()
+        retained = [pipeline() for _ in range(iterations)]
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        logger.info(f"📸 {name}: {seconds / iterations * 1e6:.2f}µs and {allocated / iterations:,.0f} bytes "
+                    f"per symbol-iteration ({len(retained[0])} objects)")
+
+BENCHMARKS = ('generator', 'regime', 'swarm', 'history', 'indicators', 'snapshot')
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks on reproducible synthetic market data')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--candles', type=int, default=100_000)
+    parser.add_argument('--interval', default='1h')
+    parser.add_argument('--window', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=50)
+    parser.add_argument('--years', type=float, default=5.0)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    market = SyntheticMarket(seed=args.seed)
+    symbols = symbol_names(args.symbols)
+    logger.info(f"⏱️ Benchmarks (seed={args.seed}, interval={args.interval})")
+
+    if 'generator' in args.only:
+        bench_generator(market, symbols, args.candles, args.interval)
+    if 'regime' in args.only:
+        bench_regime(config, market, symbols[0], min(args.candles, 20_000), args.interval, args.window)
+    if 'swarm' in args.only:
+        bench_swarm(config, market, symbols[0], min(args.candles, 2_000), args.interval, args.workers)
+        bench_indicator_bank(config, market, symbols[0], args.interval, args.workers)
+    if 'history' in args.only:
+        bench_history(market, symbols[0], args.years)
+    if 'indicators' in args.only:
+        bench_indicators(config, market, symbols[0], 100, args.interval, 500)
+        bench_indicator_batch(config, market, symbol_names(max(args.symbols, 100)), 100, args.interval)
+    if 'snapshot' in args.only:
+        bench_snapshot(config, market, symbols[0], args.interval, 10_000)
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,43 @@
 import os
-import requests
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from logger_setup import setup_logger
+from http_transport import get_transport
+from synthetic_market import SyntheticMarket
+from rate_limiter import (get_rate_limiter, endpoint_weight, ResponseCapture, PRIORITY_ORDER,
+                          PRIORITY_STOP_CHECK, PRIORITY_PRICE, PRIORITY_KLINES)
 
 logger = setup_logger('binance_client')
 
 class BinanceClientManager:
-    def __init__(self, testnet=True):
+    def __init__(self, testnet=True, base_url=None):
         self.testnet = testnet
         self.client = None
+        # base_url يوجّه كل طلبات REST إلى خادم بديل (مثل binance_standin_server)
+        self.rest_base_url = (base_url or os.environ.get('BINANCE_REST_BASE_URL') or '').rstrip('/') or None
+        self.public_base_url = self.rest_base_url or "https://api.binance.com"
+        self.kline_stream = None
+        self.kline_store = None
+        self.account_cache = None
+        self.synthetic_market = SyntheticMarket()
+        self.rate_limiter = get_rate_limiter('spot')
         self._initialize_client()
+        self.responses = ResponseCapture()
+        if self.client:
+            self.responses.attach(self.client)
     
     def _initialize_client(self):
         try:
             api_key = os.environ.get('BINANCE_API_KEY')
             api_secret = os.environ.get('BINANCE_API_SECRET')
             
+            if self.rest_base_url:
+                self.client = Client(api_key or 'standin', api_secret or 'standin', ping=False)
+                self.client.API_URL = f"{self.rest_base_url}/api"
+                self.client.ping()
+                logger.info(f"✅ Connected to Binance REST at {self.rest_base_url}")
+                return
+            
             if not api_key or not api_secret:
                 logger.warning("API keys not found in environment. Using demo mode.")
                 logger.warning("Please add BINANCE_API_KEY and BINANCE_API_SECRET to Replit Secrets.")
@@ -53,10 +74,31 @@ class BinanceClientManager:
             logger.info("Continuing in DEMO mode...")
             self.client = None
     
+    def _acquire_weight(self, endpoint, priority, limit=None):
+        return self.rate_limiter.acquire(endpoint_weight('spot', endpoint, limit), priority)
+    
+    def _record_weight(self, response=None):
+        if response is None:
+            response = self.responses.pop()
+        if response is not None:
+            self.rate_limiter.update_from_headers(response.headers, response.status_code)
+    
     def get_account_balance(self):
+        if self.account_cache:
+            balances = self.account_cache.get_balances()
+            if balances is not None:
+                return balances
+        
+        balances = self.fetch_account_balance_rest()
+        return balances if balances is not None else {}
+    
+    def fetch_account_balance_rest(self):
         if not self.client:
             return {}
         
+        if not self._acquire_weight('account', PRIORITY_STOP_CHECK):
+            return None
+        
         try:
             account = self.client.get_account()
             balances = {}
@@ -72,16 +114,73 @@ class BinanceClientManager:
             return balances
         except Exception as e:
             logger.error(f"Error getting account balance: {e}")
-            return {}
+            return None
+        finally:
+            self._record_weight()
+    
+    def attach_account_cache(self, account_cache):
+        self.account_cache = account_cache
+    
+    def create_listen_key(self):
+        if not self.client:
+            return None
+        
+        if not self._acquire_weight('user_data_stream', PRIORITY_STOP_CHECK):
+            return None
+        
+        try:
+            return self.client.stream_get_listen_key()
+        except Exception as e:
+            logger.error(f"Error creating listenKey: {e}")
+            return None
+        finally:
+            self._record_weight()
     
-    def get_symbol_price(self, symbol):
+    def keepalive_listen_key(self, listen_key):
+        if not self.client:
+            return False
+        
+        if not self._acquire_weight('user_data_stream', PRIORITY_STOP_CHECK):
+            return False
+        
+        try:
+            self.client.stream_keepalive(listen_key)
+            return True
+        except Exception as e:
+            logger.error(f"Error keeping listenKey alive: {e}")
+            return False
+        finally:
+            self._record_weight()
+    
+    def close_listen_key(self, listen_key):
+        if not self.client:
+            return False
+        
+        if not self._acquire_weight('user_data_stream', PRIORITY_STOP_CHECK):
+            return False
+        
+        try:
+            self.client.stream_close(listen_key)
+            return True
+        except Exception as e:
+            logger.debug(f"Error closing listenKey: {e}")
+            return False
+        finally:
+            self._record_weight()
+    
+    def get_symbol_price(self, symbol, priority=PRIORITY_PRICE):
+        if not self._acquire_weight('ticker_price', priority):
+            return None
+        
         try:
             if self.client:
                 ticker = self.client.get_symbol_ticker(symbol=symbol)
+                self._record_weight()
                 return float(ticker['price'])
             else:
-                url = f"https://api.binance.com/api/v3/ticker/price?symbol={symbol}"
-                response = requests.get(url, timeout=10)
+                url = f"{self.public_base_url}/api/v3/ticker/price?symbol={symbol}"
+                response = get_transport().get(url)
+                self._record_weight(response)
                 if response.status_code == 200:
                     data = response.json()
                     return float(data['price'])
@@ -95,6 +194,7 @@ class BinanceClientManager:
                     }
                     return base_prices.get(symbol, 100)
         except Exception as e:
+            self._record_weight()
             logger.error(f"Error getting price for {symbol}: {e}")
             base_prices = {
                 'BTCUSDT': 95000,
@@ -105,76 +205,119 @@ class BinanceClientManager:
             }
             return base_prices.get(symbol, 100)
     
+    def get_all_prices(self, priority=PRIORITY_PRICE):
+        if not self._acquire_weight('ticker_price_all', priority):
+            return {}
+        
+        try:
+            if self.client:
+                tickers = self.client.get_all_tickers()
+                self._record_weight()
+            else:
+                url = f"{self.public_base_url}/api/v3/ticker/price"
+                response = get_transport().get(url)
+                self._record_weight(response)
+                if response.status_code != 200:
+                    logger.debug(f"Error getting all prices: HTTP {response.status_code}")
+                    return {}
+                tickers = response.json()
+            
+            return {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+        except Exception as e:
+            self._record_weight()
+            logger.error(f"Error getting all prices: {e}")
+            return {}
+    
+    def get_server_time(self):
+        """توقيت خادم المنصة بالمللي ثانية أو None"""
+        if not self._acquire_weight('server_time', PRIORITY_PRICE):
+            return None
+        
+        try:
+            if self.client:
+                server_time = self.client.get_server_time()
+                self._record_weight()
+            else:
+                response = get_transport().get(f"{self.public_base_url}/api/v3/time")
+                self._record_weight(response)
+                if response.status_code != 200:
+                    logger.debug(f"Error getting server time: HTTP {response.status_code}")
+                    return None
+                server_time = response.json()
+            
+            return int(server_time['serverTime'])
+        except Exception as e:
+            self._record_weight()
+            logger.error(f"Error getting server time: {e}")
+            return None
+    
+    def attach_kline_stream(self, kline_stream):
+        self.kline_stream = kline_stream
+    
+    def attach_kline_store(self, kline_store):
+        self.kline_store = kline_store
+    
+    def get_kline_arrays(self, symbol, interval, limit=100):
+        if not self.kline_store:
+            return None
+        return self.kline_store.get_arrays(symbol, interval, limit)
+    
     def get_historical_klines(self, symbol, interval, limit=100):
+        if self.kline_stream:
+            klines = self.kline_stream.get_klines(symbol, interval, limit)
+            if klines:
+                return klines
+        
+        return self.fetch_klines_rest(symbol, interval, limit)
+    
+    def fetch_klines_rest(self, symbol, interval, limit=100, start_time=None, allow_mock=True, end_time=None):
+        if not self._acquire_weight('klines', PRIORITY_KLINES, limit=limit):
+            # التأجيل بسبب الميزانية ليس فشلاً - لا نستبدله ببيانات وهمية
+            return None
+        
         try:
             if self.client:
-                klines = self.client.get_klines(
-                    symbol=symbol,
-                    interval=interval,
-                    limit=limit
-                )
+                params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+                if start_time is not None:
+                    params['startTime'] = int(start_time)
+                if end_time is not None:
+                    params['endTime'] = int(end_time)
+                klines = self.client.get_klines(**params)
+                self._record_weight()
                 return klines
             else:
-                url = f"https://api.binance.com/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}"
-                response = requests.get(url, timeout=10)
+                url = f"{self.public_base_url}/api/v3/klines?symbol={symbol}&interval={interval}&limit={limit}"
+                if start_time is not None:
+                    url += f"&startTime={int(start_time)}"
+                if end_time is not None:
+                    url += f"&endTime={int(end_time)}"
+                response = get_transport().get(url)
+                self._record_weight(response)
                 if response.status_code == 200:
                     return response.json()
                 elif response.status_code == 451:
                     logger.warning(f"⚠️ Geo-restricted (HTTP 451) - using mock data for {symbol}")
-                    return self._generate_mock_klines(symbol, limit)
                 else:
                     logger.error(f"Error getting klines for {symbol}: HTTP {response.status_code}")
-                    return self._generate_mock_klines(symbol, limit)
         except Exception as e:
+            self._record_weight()
             logger.error(f"Error getting klines for {symbol}: {e}")
-            return self._generate_mock_klines(symbol, limit)
-    
-    def _generate_mock_klines(self, symbol, limit=100):
-        import time
-        base_prices = {
-            'BTCUSDT': 95000,
-            'ETHUSDT': 3200,
-            'SOLUSDT': 220,
-            'XRPUSDT': 0.65,
-            'BNBUSDT': 620
-        }
-        base_price = base_prices.get(symbol, 100)
-        
-        mock_klines = []
-        current_time = int(time.time() * 1000)
-        
-        for i in range(limit):
-            timestamp = current_time - (limit - i) * 60000
-            import random
-            variation = random.uniform(0.98, 1.02)
-            open_price = base_price * variation
-            high = open_price * random.uniform(1.0, 1.01)
-            low = open_price * random.uniform(0.99, 1.0)
-            close = (high + low) / 2
-            volume = random.uniform(100, 1000)
-            
-            mock_klines.append([
-                timestamp,
-                f"{open_price:.2f}",
-                f"{high:.2f}",
-                f"{low:.2f}",
-                f"{close:.2f}",
-                f"{volume:.2f}",
-                timestamp + 60000,
-                "0",
-                100,
-                "0",
-                "0",
-                "0"
-            ])
-        
-        return mock_klines
+        
+        if not allow_mock:
+            return None
+        return self._generate_mock_klines(symbol, limit, interval)
+    
+    def _generate_mock_klines(self, symbol, limit=100, interval='1m'):
+        return self.synthetic_market.generate_klines(symbol, limit, interval)
     
     def create_market_order(self, symbol, side, quantity):
         if not self.client:
             logger.warning(f"Cannot create order - client not initialized. Would {side} {quantity} {symbol}")
             return None
         
+        if not self._acquire_weight('order', PRIORITY_ORDER):
+            return None
+        
         try:
             order = self.client.create_order(
                 symbol=symbol,
@@ -198,12 +341,17 @@ class BinanceClientManager:
         except Exception as e:
             logger.error(f"❌ Error creating market order for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
     
     def create_test_order(self, symbol, side, quantity):
         if not self.client:
             logger.info(f"DEMO MODE: Would {side} {quantity} {symbol}")
             return {'demo': True, 'symbol': symbol, 'side': side, 'quantity': quantity}
         
+        if not self._acquire_weight('order', PRIORITY_ORDER):
+            return None
+        
         try:
             order = self.client.create_test_order(
                 symbol=symbol,
@@ -216,14 +364,36 @@ class BinanceClientManager:
         except Exception as e:
             logger.error(f"Error creating test order: {e}")
             return None
+        finally:
+            self._record_weight()
     
     def get_symbol_info(self, symbol):
         if not self.client:
             return None
         
+        if not self._acquire_weight('exchange_info', PRIORITY_PRICE):
+            return None
+        
         try:
             info = self.client.get_symbol_info(symbol)
             return info
         except Exception as e:
             logger.error(f"Error getting symbol info for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
+    
+    def get_exchange_info(self):
+        if not self.client:
+            return None
+        
+        if not self._acquire_weight('exchange_info', PRIORITY_KLINES):
+            return None
+        
+        try:
+            return self.client.get_exchange_info()
+        except Exception as e:
+            logger.error(f"Error getting exchange info: {e}")
+            return None
+        finally:
+            self._record_weight()
@@ -3,22 +3,41 @@ import requests
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 from logger_setup import setup_logger
+from http_transport import get_transport
+from rate_limiter import (get_rate_limiter, endpoint_weight, ResponseCapture, PRIORITY_ORDER,
+                          PRIORITY_STOP_CHECK, PRIORITY_PRICE, PRIORITY_KLINES)
 import time
 
 logger = setup_logger('binance_derivatives')
 
 class BinanceDerivativesClient:
-    def __init__(self, testnet=True):
+    def __init__(self, testnet=True, base_url=None):
         self.testnet = testnet
         self.client = None
-        self.base_url = "https://testnet.binancefuture.com" if testnet else "https://fapi.binance.com"
+        self.custom_base_url = (base_url or os.environ.get('BINANCE_FUTURES_BASE_URL') or '').rstrip('/') or None
+        self.base_url = self.custom_base_url or (
+            "https://testnet.binancefuture.com" if testnet else "https://fapi.binance.com"
+        )
+        self.rate_limiter = get_rate_limiter('futures')
         self._initialize_client()
+        self.responses = ResponseCapture()
+        if self.client:
+            self.responses.attach(self.client)
     
     def _initialize_client(self):
         try:
             api_key = os.environ.get('BINANCE_FUTURES_API_KEY') or os.environ.get('BINANCE_API_KEY')
             api_secret = os.environ.get('BINANCE_FUTURES_API_SECRET') or os.environ.get('BINANCE_API_SECRET')
             
+            if self.custom_base_url:
+                self.api_key = api_key or 'standin'
+                self.api_secret = api_secret or 'standin'
+                self.client = Client(self.api_key, self.api_secret, ping=False)
+                self.client.FUTURES_URL = f"{self.custom_base_url}/fapi"
+                self.client.futures_ping()
+                logger.info(f"✅ Connected to Binance Futures REST at {self.custom_base_url}")
+                return
+            
             if not api_key or not api_secret:
                 logger.warning("⚠️ Futures API keys not found in environment. Using demo mode.")
                 logger.warning("💡 Add BINANCE_FUTURES_API_KEY and BINANCE_FUTURES_API_SECRET to Replit Secrets.")
@@ -59,11 +78,23 @@ class BinanceDerivativesClient:
             logger.info("Continuing in DEMO mode...")
             self.client = None
     
+    def _acquire_weight(self, endpoint, priority, limit=None):
+        return self.rate_limiter.acquire(endpoint_weight('futures', endpoint, limit), priority)
+    
+    def _record_weight(self, response=None):
+        if response is None:
+            response = self.responses.pop()
+        if response is not None:
+            self.rate_limiter.update_from_headers(response.headers, response.status_code)
+    
     def set_leverage(self, symbol, leverage):
         if not self.client:
             logger.warning(f"Cannot set leverage - client not initialized. Would set {symbol} leverage to {leverage}x")
             return False
         
+        if not self._acquire_weight('leverage', PRIORITY_ORDER):
+            return False
+        
         try:
             result = self.client.futures_change_leverage(
                 symbol=symbol,
@@ -74,12 +105,17 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error setting leverage for {symbol}: {e}")
             return False
+        finally:
+            self._record_weight()
     
     def set_margin_type(self, symbol, margin_type="ISOLATED"):
         if not self.client:
             logger.warning(f"Cannot set margin type - client not initialized.")
             return False
         
+        if not self._acquire_weight('margin_type', PRIORITY_ORDER):
+            return False
+        
         try:
             result = self.client.futures_change_margin_type(
                 symbol=symbol,
@@ -96,11 +132,16 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error setting margin type for {symbol}: {e}")
             return False
+        finally:
+            self._record_weight()
     
     def get_futures_balance(self):
         if not self.client:
             return {}
         
+        if not self._acquire_weight('account', PRIORITY_STOP_CHECK):
+            return {}
+        
         try:
             account = self.client.futures_account()
             balances = {}
@@ -117,11 +158,16 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting futures balance: {e}")
             return {}
+        finally:
+            self._record_weight()
     
     def get_futures_position(self, symbol):
         if not self.client:
             return None
         
+        if not self._acquire_weight('position_risk', PRIORITY_STOP_CHECK):
+            return None
+        
         try:
             positions = self.client.futures_position_information(symbol=symbol)
             for pos in positions:
@@ -140,11 +186,16 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting position for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
     
     def get_all_positions(self):
         if not self.client:
             return []
         
+        if not self._acquire_weight('position_risk', PRIORITY_STOP_CHECK):
+            return []
+        
         try:
             positions = self.client.futures_position_information()
             open_positions = []
@@ -164,12 +215,17 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting all positions: {e}")
             return []
+        finally:
+            self._record_weight()
     
     def create_futures_order(self, symbol, side, order_type, quantity, price=None, stop_price=None):
         if not self.client:
             logger.warning(f"Cannot create order - client not initialized. Would {side} {quantity} {symbol}")
             return None
         
+        if not self._acquire_weight('order', PRIORITY_ORDER):
+            return None
+        
         try:
             params = {
                 'symbol': symbol,
@@ -200,6 +256,8 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error creating futures order: {e}")
             return None
+        finally:
+            self._record_weight()
     
     def open_long_position(self, symbol, quantity, leverage=2):
         if not self.set_leverage(symbol, leverage):
@@ -263,6 +321,9 @@ class BinanceDerivativesClient:
         if not self.client:
             return None
         
+        if not self._acquire_weight('funding_rate', PRIORITY_PRICE):
+            return None
+        
         try:
             funding_rate = self.client.futures_funding_rate(symbol=symbol, limit=1)
             if funding_rate:
@@ -275,11 +336,16 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting funding rate for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
     
     def get_open_interest(self, symbol):
         if not self.client:
             return None
         
+        if not self._acquire_weight('open_interest', PRIORITY_PRICE):
+            return None
+        
         try:
             open_interest = self.client.futures_open_interest(symbol=symbol)
             return {
@@ -290,6 +356,36 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting open interest for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
+    
+    def fetch_klines_rest(self, symbol, interval, limit=500, start_time=None, end_time=None):
+        """شموع العقود الدائمة (/fapi/v1/klines) - endpoint عام لا يحتاج مفاتيح"""
+        if not self._acquire_weight('klines', PRIORITY_KLINES, limit=limit):
+            return None
+        
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        if end_time is not None:
+            params['endTime'] = int(end_time)
+        
+        try:
+            if self.client:
+                klines = self.client.futures_klines(**params)
+                self._record_weight()
+                return klines
+            
+            response = get_transport().get(f"{self.base_url}/fapi/v1/klines", params=params)
+            self._record_weight(response)
+            if response.status_code == 200:
+                return response.json()
+            logger.error(f"Error getting futures klines for {symbol}: HTTP {response.status_code}")
+            return None
+        except Exception as e:
+            self._record_weight()
+            logger.error(f"Error getting futures klines for {symbol}: {e}")
+            return None
     
     def calculate_liquidation_price(self, entry_price, leverage, position_side, maintenance_margin_rate=0.004):
         if position_side == 'LONG':
@@ -303,6 +399,9 @@ class BinanceDerivativesClient:
         if not self.client:
             return None
         
+        if not self._acquire_weight('exchange_info', PRIORITY_PRICE):
+            return None
+        
         try:
             exchange_info = self.client.futures_exchange_info()
             for s in exchange_info['symbols']:
@@ -312,14 +411,36 @@ class BinanceDerivativesClient:
         except Exception as e:
             logger.error(f"Error getting symbol info for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
+    
+    def get_exchange_info(self):
+        if not self.client:
+            return None
+        
+        if not self._acquire_weight('exchange_info', PRIORITY_KLINES):
+            return None
+        
+        try:
+            return self.client.futures_exchange_info()
+        except Exception as e:
+            logger.error(f"Error getting futures exchange info: {e}")
+            return None
+        finally:
+            self._record_weight()
     
     def get_mark_price(self, symbol):
         if not self.client:
             return None
         
+        if not self._acquire_weight('premium_index', PRIORITY_PRICE):
+            return None
+        
         try:
             mark_price = self.client.futures_mark_price(symbol=symbol)
             return float(mark_price['markPrice'])
         except Exception as e:
             logger.error(f"Error getting mark price for {symbol}: {e}")
             return None
+        finally:
+            self._record_weight()
@@ -0,0 +1,869 @@
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+import numpy as np
+from aiohttp import web, WSMsgType
+from logger_setup import setup_logger
+from market_data_stream import INTERVAL_MS
+from rate_limiter import endpoint_weight, LIMITER_DEFAULTS
+from synthetic_market import SyntheticMarket
+
+logger = setup_logger('binance_standin')
+
+DEFAULT_SYMBOLS = {
+    'BTCUSDT': {'price': 95000, 'step_size': '0.00001000', 'tick_size': '0.01000000'},
+    'ETHUSDT': {'price': 3200, 'step_size': '0.00010000', 'tick_size': '0.01000000'},
+    'SOLUSDT': {'price': 220, 'step_size': '0.00100000', 'tick_size': '0.01000000'},
+    'XRPUSDT': {'price': 0.65, 'step_size': '0.10000000', 'tick_size': '0.00010000'},
+    'BNBUSDT': {'price': 620, 'step_size': '0.00100000', 'tick_size': '0.01000000'}
+}
+
+MINUTE_MS = 60_000
+CHUNK_MINUTES = 1440
+
+# المسار -> (السوق، endpoint) لحساب X-MBX-USED-WEIGHT-1M
+ROUTE_WEIGHTS = {
+    '/api/v3/klines': ('spot', 'klines'),
+    '/api/v3/ticker/price': ('spot', 'ticker_price'),
+    '/api/v3/account': ('spot', 'account'),
+    '/api/v3/order': ('spot', 'order'),
+    '/api/v3/order/test': ('spot', 'order'),
+    '/api/v3/exchangeInfo': ('spot', 'exchange_info'),
+    '/api/v3/userDataStream': ('spot', 'user_data_stream'),
+    '/fapi/v1/klines': ('futures', 'klines'),
+    '/fapi/v1/order': ('futures', 'order'),
+    '/fapi/v2/account': ('futures', 'account'),
+    '/fapi/v2/positionRisk': ('futures', 'position_risk'),
+    '/fapi/v3/positionRisk': ('futures', 'position_risk'),
+    '/fapi/v1/exchangeInfo': ('futures', 'exchange_info'),
+    '/fapi/v1/premiumIndex': ('futures', 'premium_index'),
+    '/fapi/v1/fundingRate': ('futures', 'funding_rate'),
+    '/fapi/v1/openInterest': ('futures', 'open_interest'),
+    '/fapi/v1/leverage': ('futures', 'leverage'),
+    '/fapi/v1/marginType': ('futures', 'margin_type')
+}
+
+def fmt(value):
+    return f"{value:.8f}"
+
+class PricePath:
+    """
+    مسار سعر حتمي لرمز واحد بدقة دقيقة واحدة
+
+    نفس seed ونفس نقطة البداية => نفس الشموع دائماً، ويمكن استبدال
+    الإغلاقات بسلسلة مسجلة (replay) تُعاد بشكل دوري.
+    """
+    def __init__(self, symbol, start_price, seed, base_minute, replay_closes=None):
+        self.symbol = symbol
+        self.start_price = float(start_price)
+        self.base_minute = base_minute
+        self.replay_closes = np.asarray(replay_closes, dtype=np.float64) if replay_closes else None
+
+        self._rng = np.random.default_rng([seed, zlib.crc32(symbol.encode())])
+        self._returns = SyntheticMarket(seed).path(symbol, '1m', rng=self._rng)
+        self._close = np.empty(0)
+        self._wick_high = np.empty(0)
+        self._wick_low = np.empty(0)
+        self._volume = np.empty(0)
+
+    def _ensure(self, index):
+        while len(self._close) <= index:
+            returns, volatility, _ = self._returns.next_returns(CHUNK_MINUTES)
+            wick_high = np.abs(self._rng.normal(0.0, 0.5, CHUNK_MINUTES)) * volatility
+            wick_low = np.abs(self._rng.normal(0.0, 0.5, CHUNK_MINUTES)) * volatility
+            volume = self._rng.lognormal(3.0, 0.6, CHUNK_MINUTES)
+
+            if self.replay_closes is not None:
+                positions = np.arange(len(self._close), len(self._close) + CHUNK_MINUTES) % len(self.replay_closes)
+                closes = self.replay_closes[positions]
+            else:
+                last = self._close[-1] if len(self._close) else self.start_price
+                closes = last * np.exp(np.cumsum(returns))
+
+            self._close = np.concatenate([self._close, closes])
+            self._wick_high = np.concatenate([self._wick_high, wick_high])
+            self._wick_low = np.concatenate([self._wick_low, wick_low])
+            self._volume = np.concatenate([self._volume, volume])
+
+    def _first_open(self):
+        return self.replay_closes[0] if self.replay_closes is not None else self.start_price
+
+    def minute_arrays(self, first_index, end_index, now_ms):
+        """
+        (open, high, low, close, volume) لكل دقيقة في [first_index, end_index)
+        الدقيقة الجارية تُعاد جزئية حسب الوقت الحالي
+        """
+        self._ensure(end_index)
+        index = np.arange(first_index, end_index)
+        previous = np.maximum(index - 1, 0)
+        opens = np.where(index > 0, self._close[previous], self._first_open())
+        closes = self._close[index].copy()
+        wick_high = self._wick_high[index].copy()
+        wick_low = self._wick_low[index].copy()
+        volume = self._volume[index].copy()
+
+        last_start = (self.base_minute + end_index - 1) * MINUTE_MS
+        if len(index) and now_ms < last_start + MINUTE_MS:
+            fraction = max(0.0, (now_ms - last_start) / MINUTE_MS)
+            closes[-1] = opens[-1] + (closes[-1] - opens[-1]) * fraction
+            wick_high[-1] *= fraction
+            wick_low[-1] *= fraction
+            volume[-1] *= fraction
+
+        highs = np.maximum(opens, closes) * (1 + wick_high)
+        lows = np.minimum(opens, closes) * (1 - wick_low)
+        return opens, highs, lows, closes, volume
+
+    def price(self, now_ms):
+        index = now_ms // MINUTE_MS - self.base_minute
+        return float(self.minute_arrays(index, index + 1, now_ms)[3][0])
+
+    def klines(self, interval, now_ms, limit=500, start_time=None, end_time=None):
+        interval_ms = INTERVAL_MS[interval]
+        minutes = interval_ms // MINUTE_MS
+        current_open = now_ms // interval_ms * interval_ms
+        earliest_open = -(-self.base_minute * MINUTE_MS // interval_ms) * interval_ms
+
+        last_open = current_open
+        if end_time is not None:
+            last_open = min(last_open, int(end_time) // interval_ms * interval_ms)
+
+        if start_time is not None:
+            first_open = max(-(-int(start_time) // interval_ms) * interval_ms, earliest_open)
+            last_open = min(last_open, first_open + (limit - 1) * interval_ms)
+        else:
+            first_open = max(last_open - (limit - 1) * interval_ms, earliest_open)
+
+        if last_open < first_open:
+            return []
+
+        first_index = first_open // MINUTE_MS - self.base_minute
+        end_index = min(last_open // MINUTE_MS - self.base_minute + minutes,
+                        now_ms // MINUTE_MS - self.base_minute + 1)
+        if end_index <= first_index:
+            return []
+
+        opens, highs, lows, closes, volume = self.minute_arrays(first_index, end_index, now_ms)
+
+        # تجميع الدقائق إلى شموع الإطار المطلوب
+        starts = np.arange(0, len(opens), minutes)
+        candle_open = opens[starts]
+        candle_close = closes[np.minimum(starts + minutes, len(opens)) - 1]
+        candle_high = np.maximum.reduceat(highs, starts)
+        candle_low = np.minimum.reduceat(lows, starts)
+        candle_volume = np.add.reduceat(volume, starts)
+        quote_volume = candle_volume * (candle_open + candle_close) / 2
+
+        rows = []
+        for i in range(len(starts)):
+            open_time = first_open + i * interval_ms
+            rows.append([
+                open_time, fmt(candle_open[i]), fmt(candle_high[i]), fmt(candle_low[i]), fmt(candle_close[i]),
+                fmt(candle_volume[i]), open_time + interval_ms - 1, fmt(quote_volume[i]),
+                int(candle_volume[i] * 7) + 1, fmt(candle_volume[i] / 2), fmt(quote_volume[i] / 2), '0'
+            ])
+        return rows
+
+class StandinExchange:
+    """
+    🧪 حالة المنصة المحلية: مسارات الأسعار، الأرصدة، الأوامر، والمراكز
+    """
+    def __init__(self, symbols=None, seed=42, start_time_ms=None, speed=1.0, history_days=30,
+                 replay=None, starting_balance=10000.0):
+        self.symbols = symbols or DEFAULT_SYMBOLS
+        self.seed = seed
+        self.speed = speed
+        self._real_start = time.time()
+        self._start_ms = int(start_time_ms if start_time_ms is not None else time.time() * 1000)
+        self.starting_balance = starting_balance
+
+        base_minute = self._start_ms // MINUTE_MS - history_days * 1440
+        replay = replay or {}
+        self.paths = {
+            symbol: PricePath(symbol, spec['price'], seed, base_minute, replay_closes=replay.get(symbol))
+            for symbol, spec in self.symbols.items()
+        }
+        self.reset()
+
+    def reset(self):
+        self.balances = {'USDT': {'free': self.starting_balance, 'locked': 0.0}}
+        self.futures_wallet = self.starting_balance
+        self.futures_positions = {}
+        self.leverage = {}
+        self.order_id = 0
+        self.update_id = 0
+
+    def now_ms(self):
+        return int(self._start_ms + (time.time() - self._real_start) * 1000 * self.speed)
+
+    def price(self, symbol):
+        return self.paths[symbol].price(self.now_ms())
+
+    def book_ticker(self, symbol):
+        price = self.price(symbol)
+        tick = float(self.symbols[symbol]['tick_size'])
+        self.update_id += 1
+        return {
+            'u': self.update_id,
+            's': symbol,
+            'b': fmt(price - tick),
+            'B': '1.00000000',
+            'a': fmt(price + tick),
+            'A': '1.00000000'
+        }
+
+    def symbol_info(self, symbol, futures=False):
+        spec = self.symbols[symbol]
+        filters = [
+            {'filterType': 'PRICE_FILTER', 'minPrice': spec['tick_size'], 'maxPrice': '1000000.00000000',
+             'tickSize': spec['tick_size']},
+            {'filterType': 'LOT_SIZE', 'minQty': spec['step_size'], 'maxQty': '9000000.00000000',
+             'stepSize': spec['step_size']}
+        ]
+        if futures:
+            filters.append({'filterType': 'MIN_NOTIONAL', 'notional': '5'})
+        else:
+            filters.append({'filterType': 'NOTIONAL', 'minNotional': '5.00000000', 'applyMinToMarket': True})
+
+        return {
+            'symbol': symbol,
+            'status': 'TRADING',
+            'baseAsset': symbol[:-4],
+            'quoteAsset': 'USDT',
+            'baseAssetPrecision': 8,
+            'quoteAssetPrecision': 8,
+            'orderTypes': ['LIMIT', 'MARKET', 'STOP_MARKET', 'TAKE_PROFIT_MARKET'],
+            'filters': filters
+        }
+
+    def account_balances(self):
+        return [
+            {'asset': asset, 'free': fmt(balance['free']), 'locked': fmt(balance['locked'])}
+            for asset, balance in self.balances.items()
+        ]
+
+    def spot_market_order(self, symbol, side, quantity):
+        """
+        تنفيذ أمر MARKET فوراً بالسعر الحالي
+        Returns: (order, changed_assets) أو يرفع ValueError برسالة Binance
+        """
+        price = self.price(symbol)
+        base_asset = symbol[:-4]
+        base = self.balances.setdefault(base_asset, {'free': 0.0, 'locked': 0.0})
+        quote = self.balances.setdefault('USDT', {'free': 0.0, 'locked': 0.0})
+        notional = quantity * price
+
+        if side == 'BUY':
+            if quote['free'] < notional:
+                raise ValueError('Account has insufficient balance for requested action.')
+            quote['free'] -= notional
+            base['free'] += quantity
+        else:
+            if base['free'] < quantity:
+                raise ValueError('Account has insufficient balance for requested action.')
+            base['free'] -= quantity
+            quote['free'] += notional
+
+        self.order_id += 1
+        order = {
+            'symbol': symbol,
+            'orderId': self.order_id,
+            'clientOrderId': f"standin{self.order_id}",
+            'transactTime': self.now_ms(),
+            'price': '0.00000000',
+            'origQty': fmt(quantity),
+            'executedQty': fmt(quantity),
+            'cummulativeQuoteQty': fmt(notional),
+            'status': 'FILLED',
+            'type': 'MARKET',
+            'side': side,
+            'fills': [{'price': fmt(price), 'qty': fmt(quantity), 'commission': '0', 'commissionAsset': 'USDT'}]
+        }
+        return order, [base_asset, 'USDT']
+
+    def futures_order(self, symbol, side, order_type, quantity):
+        price = self.price(symbol)
+        self.order_id += 1
+        order = {
+            'symbol': symbol,
+            'orderId': self.order_id,
+            'status': 'NEW' if order_type != 'MARKET' else 'FILLED',
+            'type': order_type,
+            'side': side,
+            'origQty': fmt(quantity),
+            'executedQty': fmt(quantity) if order_type == 'MARKET' else '0',
+            'avgPrice': fmt(price) if order_type == 'MARKET' else '0',
+            'updateTime': self.now_ms()
+        }
+        if order_type != 'MARKET':
+            return order
+
+        signed_qty = quantity if side == 'BUY' else -quantity
+        position = self.futures_positions.get(symbol, {'amount': 0.0, 'entry_price': 0.0})
+        new_amount = position['amount'] + signed_qty
+
+        if position['amount'] == 0 or (position['amount'] > 0) == (signed_qty > 0):
+            total = abs(position['amount']) + quantity
+            position['entry_price'] = (abs(position['amount']) * position['entry_price'] + quantity * price) / total
+        else:
+            closed = min(abs(signed_qty), abs(position['amount']))
+            direction = 1 if position['amount'] > 0 else -1
+            self.futures_wallet += closed * (price - position['entry_price']) * direction
+            if abs(new_amount) > 0 and (new_amount > 0) != (position['amount'] > 0):
+                position['entry_price'] = price
+
+        position['amount'] = new_amount
+        if abs(new_amount) < 1e-12:
+            self.futures_positions.pop(symbol, None)
+        else:
+            self.futures_positions[symbol] = position
+        return order
+
+    def futures_position_rows(self):
+        rows = []
+        for symbol in self.symbols:
+            position = self.futures_positions.get(symbol, {'amount': 0.0, 'entry_price': 0.0})
+            mark = self.price(symbol)
+            leverage = self.leverage.get(symbol, 2)
+            amount = position['amount']
+            entry = position['entry_price']
+            liquidation = 0.0
+            if amount:
+                liquidation = entry * (1 - 1 / leverage) if amount > 0 else entry * (1 + 1 / leverage)
+            rows.append({
+                'symbol': symbol,
+                'positionAmt': fmt(amount),
+                'entryPrice': fmt(entry),
+                'markPrice': fmt(mark),
+                'unRealizedProfit': fmt((mark - entry) * amount if amount else 0.0),
+                'liquidationPrice': fmt(liquidation),
+                'leverage': str(leverage),
+                'marginType': 'isolated',
+                'positionSide': 'BOTH'
+            })
+        return rows
+
+    def futures_account(self):
+        unrealized = sum(float(row['unRealizedProfit']) for row in self.futures_position_rows())
+        margin_used = sum(
+            abs(p['amount']) * p['entry_price'] / self.leverage.get(symbol, 2)
+            for symbol, p in self.futures_positions.items()
+        )
+        return {
+            'assets': [{
+                'asset': 'USDT',
+                'walletBalance': fmt(self.futures_wallet),
+                'unrealizedProfit': fmt(unrealized),
+                'marginBalance': fmt(self.futures_wallet + unrealized),
+                'availableBalance': fmt(self.futures_wallet - margin_used)
+            }],
+            'positions': self.futures_position_rows()
+        }
+
+class StandinServer:
+    """
+    🧪 خادم Binance محلي بديل - REST (spot + futures) و WebSocket
+    مع زمن استجابة قابل للضبط، حقن أخطاء، ومسارات أسعار قابلة للإعادة
+    """
+    def __init__(self, exchange, latency_ms=0, jitter_ms=0, error_rate=0.0, error_codes=(500, 503),
+                 ws_drop_rate=0.0, tick_interval=1.0, enforce_weight_limits=True):
+        self.exchange = exchange
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.ws_drop_rate = ws_drop_rate
+        self.tick_interval = tick_interval
+        self.enforce_weight_limits = enforce_weight_limits
+
+        self._random = random.Random(exchange.seed)
+        self._weights = {'spot': [0, 0], 'futures': [0, 0]}
+        self._subscribers = []
+        self._listen_keys = set()
+        self.stats = {'requests': 0, 'injected_errors': 0, 'rate_limited': 0, 'ws_messages': 0, 'ws_drops': 0}
+
+        self.app = web.Application(middlewares=[self._middleware])
+        self._add_routes()
+        self.app.on_startup.append(self._on_startup)
+        self.app.on_cleanup.append(self._on_cleanup)
+        self._runner = None
+        self._broadcast_task = None
+
+    def _add_routes(self):
+        r = self.app.router
+        for prefix in ('/api/v3', '/fapi/v1'):
+            r.add_get(f'{prefix}/ping', self.ping)
+            r.add_get(f'{prefix}/time', self.server_time)
+            r.add_get(f'{prefix}/klines', self.klines)
+            r.add_get(f'{prefix}/ticker/price', self.ticker_price)
+            r.add_get(f'{prefix}/ticker/bookTicker', self.book_ticker)
+        r.add_get('/api/v3/exchangeInfo', self.exchange_info)
+        r.add_get('/api/v3/account', self.account)
+        r.add_post('/api/v3/order', self.spot_order)
+        r.add_post('/api/v3/order/test', self.spot_test_order)
+        r.add_route('*', '/api/v3/userDataStream', self.user_data_stream)
+
+        r.add_get('/fapi/v1/exchangeInfo', self.futures_exchange_info)
+        r.add_get('/fapi/v1/premiumIndex', self.premium_index)
+        r.add_get('/fapi/v1/fundingRate', self.funding_rate)
+        r.add_get('/fapi/v1/openInterest', self.open_interest)
+        r.add_get('/fapi/v2/account', self.futures_account)
+        r.add_get('/fapi/v2/positionRisk', self.position_risk)
+        r.add_get('/fapi/v3/positionRisk', self.position_risk)
+        r.add_post('/fapi/v1/order', self.futures_order)
+        r.add_post('/fapi/v1/leverage', self.change_leverage)
+        r.add_post('/fapi/v1/marginType', self.change_margin_type)
+        r.add_route('*', '/fapi/v1/listenKey', self.user_data_stream)
+
+        r.add_get('/ws/{streams}', self.websocket)
+        r.add_get('/stream', self.websocket)
+
+        r.add_get('/standin/state', self.control_state)
+        r.add_post('/standin/config', self.control_config)
+        r.add_post('/standin/reset', self.control_reset)
+
+    # ------------------------------------------------------------------ middleware
+
+    def _consume_weight(self, path, params):
+        route = ROUTE_WEIGHTS.get(path)
+        if route is None:
+            return None
+        market, endpoint = route
+        if endpoint == 'ticker_price' and 'symbol' not in params:
+            endpoint = 'ticker_price_all'
+
+        minute = self.exchange.now_ms() // MINUTE_MS
+        bucket = self._weights[market]
+        if bucket[0] != minute:
+            bucket[0], bucket[1] = minute, 0
+        bucket[1] += endpoint_weight(market, endpoint, int(params.get('limit', 500)))
+        return market, bucket[1]
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        if request.path.startswith('/standin') or request.path.startswith('/ws') or request.path == '/stream':
+            return await handler(request)
+
+        self.stats['requests'] += 1
+        delay = self.latency_ms + (self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+        params = await self._params(request)
+        weight = self._consume_weight(request.path, params)
+        headers = {}
+        if weight:
+            market, used = weight
+            headers['X-MBX-USED-WEIGHT-1M'] = str(used)
+            if self.enforce_weight_limits and used > LIMITER_DEFAULTS[market]:
+                self.stats['rate_limited'] += 1
+                return self._error(429, -1003, 'Too many requests; current limit is exceeded.',
+                                   headers={**headers, 'Retry-After': '60'})
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.stats['injected_errors'] += 1
+            status = self._random.choice(self.error_codes)
+            if status == 429:
+                headers['Retry-After'] = '1'
+            return self._error(status, -1000, 'Injected stand-in error.', headers=headers)
+
+        try:
+            response = await handler(request)
+        except ValueError as e:
+            return self._error(400, -2010, str(e), headers=headers)
+        except KeyError as e:
+            return self._error(400, -1121, f'Invalid symbol or missing parameter {e}.', headers=headers)
+
+        response.headers.update(headers)
+        return response
+
+    async def _params(self, request):
+        if '_params' not in request:
+            params = dict(request.query)
+            if request.method in ('POST', 'PUT', 'DELETE') and request.can_read_body:
+                params.update(await request.post())
+            request['_params'] = params
+        return request['_params']
+
+    def _error(self, status, code, message, headers=None):
+        return web.json_response({'code': code, 'msg': message}, status=status, headers=headers)
+
+    # ------------------------------------------------------------------ market data
+
+    async def ping(self, request):
+        return web.json_response({})
+
+    async def server_time(self, request):
+        return web.json_response({'serverTime': self.exchange.now_ms()})
+
+    async def klines(self, request):
+        params = await self._params(request)
+        path = self.exchange.paths[params['symbol']]
+        rows = path.klines(
+            params['interval'],
+            self.exchange.now_ms(),
+            limit=min(int(params.get('limit', 500)), 1500),
+            start_time=params.get('startTime'),
+            end_time=params.get('endTime')
+        )
+        return web.json_response(rows)
+
+    async def ticker_price(self, request):
+        params = await self._params(request)
+        if 'symbol' in params:
+            return web.json_response({'symbol': params['symbol'], 'price': fmt(self.exchange.price(params['symbol']))})
+        return web.json_response([
+            {'symbol': symbol, 'price': fmt(self.exchange.price(symbol))} for symbol in self.exchange.symbols
+        ])
+
+    async def book_ticker(self, request):
+        params = await self._params(request)
+        rename = {'s': 'symbol', 'b': 'bidPrice', 'B': 'bidQty', 'a': 'askPrice', 'A': 'askQty'}
+
+        def as_rest(symbol):
+            event = self.exchange.book_ticker(symbol)
+            return {rename[k]: v for k, v in event.items() if k in rename}
+
+        if 'symbol' in params:
+            return web.json_response(as_rest(params['symbol']))
+        return web.json_response([as_rest(symbol) for symbol in self.exchange.symbols])
+
+    async def exchange_info(self, request):
+        params = await self._params(request)
+        symbols = [params['symbol']] if 'symbol' in params else list(self.exchange.symbols)
+        return web.json_response({
+            'timezone': 'UTC',
+            'serverTime': self.exchange.now_ms(),
+            'rateLimits': [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1,
+                            'limit': LIMITER_DEFAULTS['spot']}],
+            'symbols': [self.exchange.symbol_info(symbol) for symbol in symbols]
+        })
+
+    async def futures_exchange_info(self, request):
+        return web.json_response({
+            'timezone': 'UTC',
+            'serverTime': self.exchange.now_ms(),
+            'rateLimits': [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1,
+                            'limit': LIMITER_DEFAULTS['futures']}],
+            'symbols': [self.exchange.symbol_info(symbol, futures=True) for symbol in self.exchange.symbols]
+        })
+
+    def _premium(self, symbol):
+        now = self.exchange.now_ms()
+        mark = self.exchange.price(symbol)
+        return {
+            'symbol': symbol,
+            'markPrice': fmt(mark),
+            'indexPrice': fmt(mark),
+            'estimatedSettlePrice': fmt(mark),
+            'lastFundingRate': '0.00010000',
+            'interestRate': '0.00010000',
+            'nextFundingTime': (now // (8 * 3_600_000) + 1) * 8 * 3_600_000,
+            'time': now
+        }
+
+    async def premium_index(self, request):
+        params = await self._params(request)
+        if 'symbol' in params:
+            return web.json_response(self._premium(params['symbol']))
+        return web.json_response([self._premium(symbol) for symbol in self.exchange.symbols])
+
+    async def funding_rate(self, request):
+        params = await self._params(request)
+        now = self.exchange.now_ms()
+        funding_time = now // (8 * 3_600_000) * 8 * 3_600_000
+        return web.json_response([{'symbol': params['symbol'], 'fundingRate': '0.00010000', 'fundingTime': funding_time}])
+
+    async def open_interest(self, request):
+        params = await self._params(request)
+        return web.json_response({'symbol': params['symbol'], 'openInterest': '10000.000', 'time': self.exchange.now_ms()})
+
+    # ------------------------------------------------------------------ account & orders
+
+    async def account(self, request):
+        return web.json_response({
+            'makerCommission': 10,
+            'takerCommission': 10,
+            'canTrade': True,
+            'accountType': 'SPOT',
+            'updateTime': self.exchange.now_ms(),
+            'balances': self.exchange.account_balances()
+        })
+
+    async def spot_order(self, request):
+        params = await self._params(request)
+        if params.get('type', 'MARKET') != 'MARKET':
+            return self._error(400, -1116, 'Stand-in only supports MARKET orders on spot.')
+
+        order, changed_assets = self.exchange.spot_market_order(
+            params['symbol'], params['side'], float(params['quantity'])
+        )
+        await self._publish_account_update(order, changed_assets)
+        return web.json_response(order)
+
+    async def spot_test_order(self, request):
+        params = await self._params(request)
+        if params['symbol'] not in self.exchange.paths:
+            raise KeyError('symbol')
+        return web.json_response({})
+
+    async def futures_account(self, request):
+        return web.json_response(self.exchange.futures_account())
+
+    async def position_risk(self, request):
+        params = await self._params(request)
+        rows = self.exchange.futures_position_rows()
+        if 'symbol' in params:
+            rows = [row for row in rows if row['symbol'] == params['symbol']]
+        return web.json_response(rows)
+
+    async def futures_order(self, request):
+        params = await self._params(request)
+        order = self.exchange.futures_order(
+            params['symbol'], params['side'], params.get('type', 'MARKET'), float(params['quantity'])
+        )
+        return web.json_response(order)
+
+    async def change_leverage(self, request):
+        params = await self._params(request)
+        self.exchange.leverage[params['symbol']] = int(params['leverage'])
+        return web.json_response({'symbol': params['symbol'], 'leverage': int(params['leverage']),
+                                  'maxNotionalValue': '1000000'})
+
+    async def change_margin_type(self, request):
+        return web.json_response({'code': 200, 'msg': 'success'})
+
+    async def user_data_stream(self, request):
+        params = await self._params(request)
+        if request.method == 'POST':
+            listen_key = f"standin{self._random.getrandbits(64):016x}"
+            self._listen_keys.add(listen_key)
+            return web.json_response({'listenKey': listen_key})
+        if request.method == 'DELETE':
+            self._listen_keys.discard(params.get('listenKey'))
+        return web.json_response({})
+
+    async def _publish_account_update(self, order, changed_assets):
+        now = self.exchange.now_ms()
+        execution = {
+            'e': 'executionReport', 'E': now, 's': order['symbol'], 'S': order['side'], 'o': order['type'],
+            'q': order['origQty'], 'X': order['status'], 'x': 'TRADE', 'i': order['orderId'],
+            'z': order['executedQty'], 'L': order['fills'][0]['price'], 'T': now
+        }
+        position = {
+            'e': 'outboundAccountPosition', 'E': now, 'u': now,
+            'B': [
+                {'a': asset, 'f': fmt(self.exchange.balances[asset]['free']),
+                 'l': fmt(self.exchange.balances[asset]['locked'])}
+                for asset in changed_assets
+            ]
+        }
+        for listen_key in list(self._listen_keys):
+            await self._publish(listen_key, execution)
+            await self._publish(listen_key, position)
+
+    # ------------------------------------------------------------------ websocket
+
+    async def websocket(self, request):
+        ws = web.WebSocketResponse(heartbeat=20)
+        await ws.prepare(request)
+
+        combined = request.path == '/stream'
+        raw = request.query.get('streams', '') if combined else request.match_info['streams']
+        streams = [name for name in raw.split('/') if name]
+        subscriber = {'ws': ws, 'streams': streams, 'combined': combined}
+        self._subscribers.append(subscriber)
+
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+        return ws
+
+    def _stream_event(self, stream):
+        if '@' not in stream:
+            return None
+
+        symbol_lower, kind = stream.split('@', 1)
+        symbol = symbol_lower.upper()
+        if symbol not in self.exchange.paths:
+            return None
+
+        now = self.exchange.now_ms()
+        if kind == 'bookTicker':
+            return self.exchange.book_ticker(symbol)
+
+        if kind.startswith('kline_'):
+            interval = kind[len('kline_'):]
+            row = self.exchange.paths[symbol].klines(interval, now, limit=1)[-1]
+            return {
+                'e': 'kline', 'E': now, 's': symbol,
+                'k': {
+                    't': row[0], 'T': row[6], 's': symbol, 'i': interval,
+                    'o': row[1], 'h': row[2], 'l': row[3], 'c': row[4], 'v': row[5],
+                    'n': row[8], 'x': now >= row[6], 'q': row[7], 'V': row[9], 'Q': row[10], 'B': '0'
+                }
+            }
+        return None
+
+    async def _send(self, subscriber, stream, event):
+        payload = {'stream': stream, 'data': event} if subscriber['combined'] else event
+        await subscriber['ws'].send_str(json.dumps(payload))
+        self.stats['ws_messages'] += 1
+
+    async def _publish(self, stream, event):
+        for subscriber in list(self._subscribers):
+            if stream in subscriber['streams'] and not subscriber['ws'].closed:
+                await self._send(subscriber, stream, event)
+
+    async def _broadcast_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            for subscriber in list(self._subscribers):
+                ws = subscriber['ws']
+                if ws.closed:
+                    continue
+
+                if self.ws_drop_rate and self._random.random() < self.ws_drop_rate:
+                    self.stats['ws_drops'] += 1
+                    await ws.close()
+                    continue
+
+                try:
+                    for stream in subscriber['streams']:
+                        event = self._stream_event(stream)
+                        if event is not None:
+                            await self._send(subscriber, stream, event)
+                except Exception as e:
+                    logger.debug(f"Stand-in stream send failed: {e}")
+
+    async def _on_startup(self, app):
+        self._broadcast_task = asyncio.create_task(self._broadcast_loop())
+
+    async def _on_cleanup(self, app):
+        if self._broadcast_task:
+            self._broadcast_task.cancel()
+        for subscriber in list(self._subscribers):
+            await subscriber['ws'].close()
+
+    # ------------------------------------------------------------------ control
+
+    async def control_state(self, request):
+        return web.json_response({
+            'server_time': self.exchange.now_ms(),
+            'prices': {symbol: self.exchange.price(symbol) for symbol in self.exchange.symbols},
+            'balances': self.exchange.balances,
+            'futures_wallet': self.exchange.futures_wallet,
+            'futures_positions': self.exchange.futures_positions,
+            'config': {'latency_ms': self.latency_ms, 'jitter_ms': self.jitter_ms, 'error_rate': self.error_rate,
+                       'error_codes': list(self.error_codes), 'ws_drop_rate': self.ws_drop_rate},
+            'weights': {market: bucket[1] for market, bucket in self._weights.items()},
+            'subscribers': len(self._subscribers),
+            'stats': self.stats
+        })
+
+    async def control_config(self, request):
+        """تعديل زمن الاستجابة وحقن الأخطاء أثناء التشغيل"""
+        body = await request.json()
+        for key in ('latency_ms', 'jitter_ms', 'error_rate', 'ws_drop_rate'):
+            if key in body:
+                setattr(self, key, float(body[key]))
+        if 'error_codes' in body:
+            self.error_codes = tuple(int(code) for code in body['error_codes'])
+        return await self.control_state(request)
+
+    async def control_reset(self, request):
+        self.exchange.reset()
+        self._weights = {'spot': [0, 0], 'futures': [0, 0]}
+        return await self.control_state(request)
+
+    # ------------------------------------------------------------------ lifecycle
+
+    def start_in_background(self, host='127.0.0.1', port=8900):
+        """تشغيل الخادم في خيط خلفي (للاختبارات وقياس الأداء)"""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            self._runner = web.AppRunner(self.app)
+            loop.run_until_complete(self._runner.setup())
+            loop.run_until_complete(web.TCPSite(self._runner, host, port).start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name='binance-standin', daemon=True).start()
+        ready.wait(timeout=10)
+        return f"http://{host}:{port}", f"ws://{host}:{port}"
+
+def load_replay(path):
+    """
+    تحميل مسارات أسعار مسجلة: {"BTCUSDT": [close, ...]} أو {"BTCUSDT": [[kline row], ...]}
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    replay = {}
+    for symbol, series in data.items():
+        replay[symbol] = [float(item[4]) if isinstance(item, list) else float(item) for item in series]
+    return replay
+
+def main():
+    parser = argparse.ArgumentParser(description='Local Binance REST/WebSocket stand-in server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--symbols', default=','.join(DEFAULT_SYMBOLS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--start-time', type=int, default=None, help='server clock origin (ms) for replayable runs')
+    parser.add_argument('--speed', type=float, default=1.0, help='server clock speed multiplier')
+    parser.add_argument('--history-days', type=int, default=30)
+    parser.add_argument('--replay', default=None, help='JSON file of recorded 1m closes or klines per symbol')
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-codes', default='500,503')
+    parser.add_argument('--ws-drop-rate', type=float, default=0.0)
+    parser.add_argument('--tick-interval', type=float, default=1.0)
+    parser.add_argument('--no-weight-limits', action='store_true')
+    args = parser.parse_args()
+
+    symbols = {}
+    for symbol in args.symbols.split(','):
+        symbols[symbol] = DEFAULT_SYMBOLS.get(symbol, {'price': 100, 'step_size': '0.00100000', 'tick_size': '0.01000000'})
+
+    exchange = StandinExchange(
+        symbols=symbols,
+        seed=args.seed,
+        start_time_ms=args.start_time,
+        speed=args.speed,
+        history_days=args.history_days,
+        replay=load_replay(args.replay) if args.replay else None,
+        starting_balance=args.balance
+    )
+    server = StandinServer(
+        exchange,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        error_codes=[int(code) for code in args.error_codes.split(',') if code],
+        ws_drop_rate=args.ws_drop_rate,
+        tick_interval=args.tick_interval,
+        enforce_weight_limits=not args.no_weight_limits
+    )
+
+    logger.info(f"🧪 Binance stand-in listening on http://{args.host}:{args.port} (seed={args.seed})")
+    logger.info(f"   BINANCE_REST_BASE_URL=http://{args.host}:{args.port} "
+                f"BINANCE_FUTURES_BASE_URL=http://{args.host}:{args.port} "
+                f"BINANCE_WS_BASE_URL=ws://{args.host}:{args.port}")
+    web.run_app(server.app, host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+import time
+from logger_setup import setup_logger
+from market_data_stream import INTERVAL_MS
+
+logger = setup_logger('candle_scheduler')
+
+RISK_JOB = 'risk'
+
+class CandleScheduler:
+    """
+    ⏰ جدولة المهام على إغلاق الشموع بتوقيت خادم المنصة بدل النوم الثابت
+
+    - مهمة لكل (symbol, interval) تستحق مرة واحدة عند إغلاق شمعتها
+      (+ close_delay_ms حتى تصبح الشمعة المغلقة متاحة من المنصة)
+    - مهام دورية بفترة ثابتة مستقلة عن الشموع (فحص المخاطر على الأسعار)
+    إذا تأخرت الدورة أكثر من شمعة كاملة تُدمج الإغلاقات الفائتة في تشغيل واحد
+    """
+    def __init__(self, binance_client, close_delay_ms=1500, resync_seconds=3600):
+        self.binance_client = binance_client
+        self.close_delay_ms = close_delay_ms
+        self.resync_seconds = resync_seconds
+        self.clock_offset_ms = 0.0
+        self._synced_at = 0.0
+        self._jobs = {}
+        self._fired = {}
+        self._max_lateness_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        scheduler_config = config.get('scheduler', {})
+        return cls(
+            binance_client,
+            close_delay_ms=scheduler_config.get('close_delay_ms', 1500),
+            resync_seconds=scheduler_config.get('clock_resync_minutes', 60) * 60
+        )
+
+    def sync_clock(self):
+        """فرق الساعة المحلية عن خادم المنصة (مع تعويض نصف زمن الرحلة)"""
+        started = time.time() * 1000
+        server_ms = self.binance_client.get_server_time()
+        finished = time.time() * 1000
+        self._synced_at = time.time()
+
+        if server_ms is None:
+            logger.warning("⚠️ Exchange server time unavailable - scheduling on local clock")
+            return False
+
+        self.clock_offset_ms = server_ms - (started + finished) / 2
+        logger.info(f"🕰️ Clock synced with exchange (offset {self.clock_offset_ms:+.0f}ms)")
+        return True
+
+    def now_ms(self):
+        return time.time() * 1000 + self.clock_offset_ms
+
+    def _next_close(self, period_ms, now_ms):
+        # الشموع محاذاة لـ epoch على خادم Binance: الإغلاق التالي = بداية الشمعة التالية
+        return (now_ms - self.close_delay_ms) // period_ms * period_ms + period_ms + self.close_delay_ms
+
+    def add_candle_job(self, key, interval):
+        period_ms = INTERVAL_MS[interval]
+        self._jobs[key] = {
+            'group': interval,
+            'period_ms': period_ms,
+            'aligned': True,
+            'due_ms': self._next_close(period_ms, self.now_ms())
+        }
+
+    def add_periodic_job(self, key, seconds):
+        self._jobs[key] = {
+            'group': key,
+            'period_ms': seconds * 1000,
+            'aligned': False,
+            'due_ms': self.now_ms()
+        }
+
+    def next_due_ms(self):
+        return min((job['due_ms'] for job in self._jobs.values()), default=None)
+
+    def pop_due(self, now_ms=None):
+        """مفاتيح كل المهام المستحقة، وكل واحدة تُجدول لموعدها التالي"""
+        now_ms = self.now_ms() if now_ms is None else now_ms
+        due = []
+        for key, job in self._jobs.items():
+            if job['due_ms'] > now_ms:
+                continue
+
+            due.append(key)
+            self._fired[job['group']] = self._fired.get(job['group'], 0) + 1
+            if job['aligned']:
+                self._max_lateness_ms = max(self._max_lateness_ms, now_ms - job['due_ms'])
+                job['due_ms'] = self._next_close(job['period_ms'], now_ms)
+            else:
+                job['due_ms'] = now_ms + job['period_ms']
+        return due
+
+    def wait_for_due(self):
+        """ينام حتى أقرب موعد ثم يعيد المهام المستحقة"""
+        if time.time() - self._synced_at >= self.resync_seconds:
+            self.sync_clock()
+
+        due_ms = self.next_due_ms()
+        if due_ms is None:
+            time.sleep(1)
+            return []
+
+        wait_seconds = (due_ms - self.now_ms()) / 1000
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+        return self.pop_due()
+
+    def seconds_until(self, group):
+        """الثواني حتى أقرب موعد لمجموعة (interval أو اسم مهمة دورية)"""
+        due = [job['due_ms'] for job in self._jobs.values() if job['group'] == group]
+        return max(0.0, (min(due) - self.now_ms()) / 1000) if due else None
+
+    def get_stats(self):
+        return {
+            'jobs': len(self._jobs),
+            'clock_offset_ms': round(self.clock_offset_ms, 1),
+            'fired': dict(self._fired),
+            'max_lateness_ms': round(self._max_lateness_ms, 1)
+        }
@@ -0,0 +1,168 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+from logger_setup import setup_logger
+
+logger = setup_logger('exchange_metadata')
+
+def step_precision(step_size):
+    """عدد الخانات العشرية لـ stepSize (نفس منطق LOT_SIZE السابق)"""
+    step_size_str = f"{step_size:.10f}".rstrip('0')
+    if '.' in step_size_str:
+        return len(step_size_str.split('.')[1])
+    return 0
+
+@dataclass(frozen=True)
+class SymbolFilters:
+    symbol: str
+    base_asset: str
+    quote_asset: str
+    step_size: Optional[float] = None
+    precision: int = 8
+    min_qty: float = 0.0
+    max_qty: float = 0.0
+    min_notional: float = 0.0
+    tick_size: Optional[float] = None
+
+    def round_quantity(self, quantity):
+        if not self.step_size:
+            return quantity
+        quantity = round(quantity / self.step_size) * self.step_size
+        return round(quantity, self.precision)
+
+def parse_symbol_filters(info):
+    """تحويل عنصر exchangeInfo إلى SymbolFilters مع حساب الدقة مسبقاً"""
+    step_size = None
+    precision = 8
+    min_qty = 0.0
+    max_qty = 0.0
+    min_notional = 0.0
+    tick_size = None
+
+    for symbol_filter in info.get('filters', []):
+        filter_type = symbol_filter.get('filterType')
+
+        if filter_type == 'LOT_SIZE':
+            step_size = float(symbol_filter['stepSize'])
+            precision = step_precision(step_size)
+            min_qty = float(symbol_filter.get('minQty', 0))
+            max_qty = float(symbol_filter.get('maxQty', 0))
+        elif filter_type == 'PRICE_FILTER':
+            tick_size = float(symbol_filter.get('tickSize', 0)) or None
+        elif filter_type in ('NOTIONAL', 'MIN_NOTIONAL'):
+            # spot يستخدم minNotional و futures يستخدم notional
+            min_notional = float(symbol_filter.get('minNotional', symbol_filter.get('notional', 0)))
+
+    return SymbolFilters(
+        symbol=info['symbol'],
+        base_asset=info.get('baseAsset', ''),
+        quote_asset=info.get('quoteAsset', ''),
+        step_size=step_size,
+        precision=precision,
+        min_qty=min_qty,
+        max_qty=max_qty,
+        min_notional=min_notional,
+        tick_size=tick_size
+    )
+
+class ExchangeMetadataCache:
+    """
+    📚 كاش معلومات المنصة (exchangeInfo) لـ Spot و Futures
+    يُحمّل مرة واحدة ويُحدّث دورياً، ويوفر round_quantity بزمن O(1)
+    """
+    def __init__(self, binance_client, futures_client=None, refresh_interval_seconds=3600,
+                 retry_interval_seconds=60):
+        self.binance_client = binance_client
+        self.futures_client = futures_client
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.retry_interval_seconds = retry_interval_seconds
+
+        self._filters = {'spot': {}, 'futures': {}}
+        self._loaded_at = {'spot': 0.0, 'futures': 0.0}
+        self._last_attempt = {'spot': 0.0, 'futures': 0.0}
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+    @classmethod
+    def from_config(cls, config, binance_client, futures_client=None):
+        metadata_config = config.get('market_data', {}).get('exchange_metadata', {})
+        return cls(
+            binance_client,
+            futures_client=futures_client,
+            refresh_interval_seconds=metadata_config.get('refresh_interval_seconds', 3600)
+        )
+
+    def start(self):
+        """تحميل أولي ثم تحديث دوري في خيط خلفي"""
+        self.refresh()
+
+        if self._refresh_thread is None:
+            self._refresh_thread = threading.Thread(target=self._refresh_loop, name='exchange-metadata', daemon=True)
+            self._refresh_thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval_seconds)
+            self.refresh()
+
+    def refresh(self):
+        self._load('spot')
+        if self.futures_client:
+            self._load('futures')
+
+    def _load(self, market):
+        self._last_attempt[market] = time.time()
+        client = self.binance_client if market == 'spot' else self.futures_client
+
+        exchange_info = client.get_exchange_info()
+        if not exchange_info or not exchange_info.get('symbols'):
+            logger.debug(f"Exchange info unavailable for {market}")
+            return False
+
+        filters = {}
+        for info in exchange_info['symbols']:
+            try:
+                filters[info['symbol']] = parse_symbol_filters(info)
+            except Exception as e:
+                logger.debug(f"Skipping filters for {info.get('symbol')}: {e}")
+
+        with self._lock:
+            self._filters[market] = filters
+            self._loaded_at[market] = time.time()
+
+        logger.info(f"📚 Loaded {market} exchange metadata for {len(filters)} symbols")
+        return True
+
+    def _ensure_loaded(self, market):
+        if self._filters[market]:
+            return
+
+        if market == 'futures' and not self.futures_client:
+            return
+
+        if time.time() - self._last_attempt[market] >= self.retry_interval_seconds:
+            self._load(market)
+
+    def get_filters(self, symbol, market='spot'):
+        self._ensure_loaded(market)
+        return self._filters[market].get(symbol)
+
+    def round_quantity(self, symbol, quantity, market='spot'):
+        filters = self.get_filters(symbol, market)
+        if not filters:
+            return quantity
+        return filters.round_quantity(quantity)
+
+    def get_base_asset(self, symbol, market='spot'):
+        filters = self.get_filters(symbol, market)
+        return filters.base_asset if filters else None
+
+    def get_stats(self):
+        return {
+            market: {
+                'symbols': len(self._filters[market]),
+                'age_seconds': round(time.time() - self._loaded_at[market], 1) if self._loaded_at[market] else None
+            }
+            for market in ('spot', 'futures')
+        }
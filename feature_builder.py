@@ -0,0 +1,153 @@
+import numpy as np
+from logger_setup import setup_logger
+from indicator_kernels import IndicatorKernels, ema, sma, rsi, stoch, bbands, macd, adx, atr, true_range
+from indicator_snapshot import Snapshot
+
+logger = setup_logger('feature_builder')
+
+# المخطط المعلن: ترتيب ثابت لمتجه الميزات + وصف كل ميزة
+FEATURE_SCHEMA = (
+    ('price', 'آخر سعر إغلاق'),
+    ('price_change_pct', 'تغير الإغلاق عن الشمعة السابقة %'),
+    ('rate_of_change', 'ROC(10) %'),
+    ('rsi', 'RSI'),
+    ('stoch_k', 'Stochastic %K'),
+    ('stoch_d', 'Stochastic %D'),
+    ('macd', 'MACD line'),
+    ('macd_signal', 'MACD signal'),
+    ('macd_hist', 'MACD histogram'),
+    ('bb_upper', 'Bollinger upper'),
+    ('bb_middle', 'Bollinger middle'),
+    ('bb_lower', 'Bollinger lower'),
+    ('bb_width', '(upper - lower) / middle'),
+    ('bb_position', 'موقع السعر داخل النطاق 0..1'),
+    ('sma_20', 'SMA(20)'),
+    ('ema_9', 'EMA(9)'),
+    ('ema_21', 'EMA(21)'),
+    ('ema_50', 'EMA(50)'),
+    ('ema_200', 'EMA(200)'),
+    ('adx', 'ADX'),
+    ('atr', 'ATR(14)'),
+    ('atr_avg', 'متوسط ATR لآخر 20 شمعة'),
+    ('high_20', 'أعلى قمة في آخر 20 شمعة قبل الحالية'),
+    ('low_20', 'أدنى قاع في آخر 20 شمعة قبل الحالية'),
+    ('volume_ratio', 'حجم الشمعة الحالية / متوسط آخر 20 شمعة قبلها'),
+)
+FEATURE_NAMES = tuple(name for name, _ in FEATURE_SCHEMA)
+FEATURE_INDEX = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+EMA_PERIODS = (9, 21, 50, 200)
+SMA_PERIOD = 20
+ATR_PERIOD = 14
+ATR_AVERAGE_PERIOD = 20
+CHANNEL_PERIOD = 20
+VOLUME_PERIOD = 20
+ROC_PERIOD = 10
+
+class FeatureSnapshot(Snapshot):
+    """متجه الميزات بحقول FEATURE_SCHEMA؛ يُمرر مباشرة إلى SwarmManager"""
+    FIELDS = FEATURE_NAMES
+    ALIASES = {'stochastic': 'stoch_k', 'price_change': 'price_change_pct'}
+    __slots__ = FIELDS
+
+class FeatureBuilder:
+    """
+    🧬 كل الميزات التي يستهلكها السرب ومحرك السببية في تمريرة واحدة على
+    أعمدة الشموع، بترتيب FEATURE_SCHEMA
+
+    يعمل على المحور الأخير مثل IndicatorKernels، فيقبل (candles,) أو (symbols × candles)
+    """
+    def __init__(self, settings, required_candles=250):
+        self.settings = settings
+        self.required_candles = required_candles
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            IndicatorKernels.from_config(config).settings,
+            required_candles=config.get('features', {}).get('candles', 250)
+        )
+
+    def compute(self, arrays):
+        """
+        Returns: مصفوفة (..., len(FEATURE_NAMES)) لآخر شمعة
+        """
+        s = self.settings
+        high = np.asarray(arrays['high'], dtype=np.float64)
+        low = np.asarray(arrays['low'], dtype=np.float64)
+        close = np.asarray(arrays['close'], dtype=np.float64)
+        volume = np.asarray(arrays['volume'], dtype=np.float64)
+        n = close.shape[-1]
+        last = close[..., -1]
+        nan = np.full(last.shape, np.nan)
+
+        def lagged(values, lag):
+            return values[..., -1 - lag] if n > lag else nan
+
+        tr = true_range(high, low, close)
+        stoch_k, stoch_d = stoch(high, low, close, s['stochastic_period'], s['stoch_d'], s['stoch_smooth_k'])
+        bb_upper, bb_middle, bb_lower = bbands(close, s['bb_period'], s['bb_std'])
+        macd_line, macd_signal, macd_hist = macd(close, s['macd_fast'], s['macd_slow'], s['macd_signal'])
+        atr_series = atr(high, low, close, ATR_PERIOD, tr=tr)
+        upper, middle, lower = bb_upper[..., -1], bb_middle[..., -1], bb_lower[..., -1]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if n > CHANNEL_PERIOD:
+                high_20 = high[..., -1 - CHANNEL_PERIOD:-1].max(axis=-1)
+                low_20 = low[..., -1 - CHANNEL_PERIOD:-1].min(axis=-1)
+            else:
+                high_20 = low_20 = nan
+            volume_avg = volume[..., -1 - VOLUME_PERIOD:-1].mean(axis=-1) if n > VOLUME_PERIOD else nan
+
+            features = {
+                'price': last,
+                'price_change_pct': (last / lagged(close, 1) - 1.0) * 100.0,
+                'rate_of_change': (last / lagged(close, ROC_PERIOD) - 1.0) * 100.0,
+                'rsi': rsi(close, s['rsi_period'])[..., -1],
+                'stoch_k': stoch_k[..., -1],
+                'stoch_d': stoch_d[..., -1],
+                'macd': macd_line[..., -1],
+                'macd_signal': macd_signal[..., -1],
+                'macd_hist': macd_hist[..., -1],
+                'bb_upper': upper,
+                'bb_middle': middle,
+                'bb_lower': lower,
+                'bb_width': (upper - lower) / middle,
+                'bb_position': (last - lower) / (upper - lower),
+                'sma_20': sma(close, SMA_PERIOD)[..., -1],
+                'adx': adx(high, low, close, s['adx_period'], tr=tr)[0][..., -1],
+                'atr': atr_series[..., -1],
+                'atr_avg': sma(atr_series, ATR_AVERAGE_PERIOD)[..., -1],
+                'high_20': high_20,
+                'low_20': low_20,
+                'volume_ratio': volume[..., -1] / volume_avg,
+            }
+            for period in EMA_PERIODS:
+                features[f'ema_{period}'] = ema(close, period)[..., -1]
+
+        return np.stack([features[name] for name in FEATURE_NAMES], axis=-1)
+
+    def build(self, klines):
+        """
+        متجه الميزات لآخر شمعة كـ FeatureSnapshot، أو None
+        """
+        try:
+            arrays = IndicatorKernels.to_arrays(klines)
+            if len(arrays['close']) < 2:
+                return None
+            return FeatureSnapshot(*self.compute(arrays).tolist())
+        except Exception as e:
+            logger.error(f"Error building feature vector: {e}")
+            return None
+
+def causal_signals(features):
+    """إشارات CausalInferenceEngine.get_causal_recommendation من متجه الميزات"""
+    return {
+        'rsi': features['rsi'],
+        'stochastic': features['stoch_k'],
+        'macd': features['macd'],
+        'bb_position': features['bb_position'],
+        'volume_ratio': features['volume_ratio'],
+        'price_change': features['price_change_pct'],
+        'ema_alignment': 1 if features['price'] > features['ema_50'] else 0
+    }
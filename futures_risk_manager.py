@@ -31,21 +31,7 @@ class FuturesRiskMixin:
             if current_price and current_price > 0:
                 quantity = position_value / current_price
                 
-                symbol_info = self.futures_client.get_symbol_info(symbol)
-                if symbol_info:
-                    for filter in symbol_info['filters']:
-                        if filter['filterType'] == 'LOT_SIZE':
-                            step_size = float(filter['stepSize'])
-                            
-                            step_size_str = f"{step_size:.10f}".rstrip('0')
-                            if '.' in step_size_str:
-                                precision = len(step_size_str.split('.')[1])
-                            else:
-                                precision = 0
-                            
-                            quantity = round(quantity / step_size) * step_size
-                            quantity = round(quantity, precision)
-                            break
+                quantity = self.exchange_metadata.round_quantity(symbol, quantity, market='futures')
                 
                 contract_value = position_value * leverage
                 logger.info(f"Futures position for {symbol}: {quantity:.8f} @ {leverage}x")
@@ -0,0 +1,360 @@
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from logger_setup import setup_logger
+from kline_store import KLINE_FIELDS, MAX_KLINES_PER_REQUEST, rows_to_matrix
+from market_data_stream import INTERVAL_MS
+
+logger = setup_logger('historical_data')
+
+MARKETS = ('spot', 'futures')
+COLUMN_DTYPE = np.dtype('<f8')
+DAY_MS = 86_400_000
+
+class HistoricalKlineStore:
+    """
+    🗄️ مخزن شموع تاريخية عمودي على القرص (append-only)
+
+    لكل (market, symbol, interval) مجلد فيه ملف float64 خام لكل عمود
+    و meta.json بعدد الصفوف المعتمدة. القراءة عبر np.memmap (بدون نسخ)
+    والفهرسة بـ open_time المرتب عبر searchsorted.
+    """
+    def __init__(self, directory='data/history'):
+        self.directory = directory
+        self._locks = {}
+        self._memmaps = {}
+        self._lock = threading.Lock()
+
+    def _series_dir(self, market, symbol, interval):
+        return os.path.join(self.directory, market, symbol, interval)
+
+    def _series_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def read_meta(self, market, symbol, interval):
+        path = os.path.join(self._series_dir(market, symbol, interval), 'meta.json')
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rows': 0, 'first_open_time': None, 'last_open_time': None, 'gaps': 0}
+
+    def _write_meta(self, series_dir, meta):
+        # الكتابة الذرية لـ meta هي نقطة الاعتماد - أي بايتات بعدها تُهمل
+        tmp_path = os.path.join(series_dir, 'meta.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(series_dir, 'meta.json'))
+
+    def last_open_time(self, market, symbol, interval):
+        return self.read_meta(market, symbol, interval)['last_open_time']
+
+    def append(self, market, symbol, interval, rows):
+        """
+        إلحاق صفوف REST (أو مصفوفة (n, fields)) بعد آخر شمعة مخزنة
+        الشموع غير المغلقة بعد والمكررة تُتجاهل
+        Returns: عدد الصفوف المضافة
+        """
+        matrix = rows if isinstance(rows, np.ndarray) else rows_to_matrix(rows)
+        if not len(matrix):
+            return 0
+
+        key = (market, symbol, interval)
+        series_dir = self._series_dir(*key)
+        interval_ms = INTERVAL_MS[interval]
+
+        with self._series_lock(key):
+            meta = self.read_meta(*key)
+            last_open = meta['last_open_time']
+
+            now_ms = time.time() * 1000
+            keep = matrix[:, 6] < now_ms
+            if last_open is not None:
+                keep &= matrix[:, 0] > last_open
+            matrix = matrix[keep]
+            if not len(matrix):
+                return 0
+
+            open_times = matrix[:, 0]
+            previous = np.concatenate([[last_open if last_open is not None else open_times[0] - interval_ms],
+                                       open_times[:-1]])
+            gaps = int(np.count_nonzero(open_times - previous != interval_ms))
+
+            os.makedirs(series_dir, exist_ok=True)
+            committed_bytes = meta['rows'] * COLUMN_DTYPE.itemsize
+            for i, name in enumerate(KLINE_FIELDS):
+                path = os.path.join(series_dir, f"{name}.f64")
+                with open(path, 'ab') as f:
+                    # قص بقايا أي إلحاق لم يُعتمد (انقطاع أثناء الكتابة)
+                    if f.tell() != committed_bytes:
+                        f.truncate(committed_bytes)
+                    f.write(np.ascontiguousarray(matrix[:, i], dtype=COLUMN_DTYPE).tobytes())
+
+            meta = {
+                'rows': meta['rows'] + len(matrix),
+                'first_open_time': meta['first_open_time'] if meta['first_open_time'] is not None else int(open_times[0]),
+                'last_open_time': int(open_times[-1]),
+                'gaps': meta.get('gaps', 0) + gaps,
+                'interval_ms': interval_ms
+            }
+            self._write_meta(series_dir, meta)
+            return len(matrix)
+
+    def _columns(self, market, symbol, interval):
+        meta = self.read_meta(market, symbol, interval)
+        rows = meta['rows']
+        if rows == 0:
+            return None
+
+        key = (market, symbol, interval)
+        cached = self._memmaps.get(key)
+        if cached and cached[0] == rows:
+            return cached[1]
+
+        series_dir = self._series_dir(*key)
+        columns = {
+            name: np.memmap(os.path.join(series_dir, f"{name}.f64"), dtype=COLUMN_DTYPE, mode='r', shape=(rows,))
+            for name in KLINE_FIELDS
+        }
+        self._memmaps[key] = (rows, columns)
+        return columns
+
+    def load(self, market, symbol, interval, start_time=None, end_time=None):
+        """
+        الشموع ذات open_time ضمن [start_time, end_time] كـ views على memmap
+        بنفس صيغة KlineRingBuffer.view، أو None إذا لا توجد بيانات
+        """
+        columns = self._columns(market, symbol, interval)
+        if columns is None:
+            return None
+
+        open_times = columns['open_time']
+        begin = 0 if start_time is None else int(np.searchsorted(open_times, start_time, side='left'))
+        end = len(open_times) if end_time is None else int(np.searchsorted(open_times, end_time, side='right'))
+        return {name: column[begin:end] for name, column in columns.items()}
+
+    def index_of(self, market, symbol, interval, open_time):
+        """موقع الشمعة ذات open_time المحدد، أو None"""
+        columns = self._columns(market, symbol, interval)
+        if columns is None:
+            return None
+        open_times = columns['open_time']
+        position = int(np.searchsorted(open_times, open_time))
+        if position < len(open_times) and open_times[position] == open_time:
+            return position
+        return None
+
+    def list_series(self):
+        series = []
+        for market in MARKETS:
+            market_dir = os.path.join(self.directory, market)
+            if not os.path.isdir(market_dir):
+                continue
+            for symbol in sorted(os.listdir(market_dir)):
+                for interval in sorted(os.listdir(os.path.join(market_dir, symbol))):
+                    series.append((market, symbol, interval))
+        return series
+
+    def get_stats(self):
+        return {
+            f"{market}:{symbol}:{interval}": self.read_meta(market, symbol, interval)
+            for market, symbol, interval in self.list_series()
+        }
+
+class HistoricalKlineDownloader:
+    """
+    ⬇️ تنزيل الشموع التاريخية بالصفحات (startTime/endTime) إلى HistoricalKlineStore
+
+    كل صفحة تُعتمد على القرص فوراً، لذلك يُستأنف التنزيل المنقطع من آخر
+    شمعة مخزنة. الطلبات تمر عبر محدد المعدل بأولوية klines.
+    """
+    def __init__(self, store, binance_client, futures_client=None, page_limit=MAX_KLINES_PER_REQUEST,
+                 max_retries=5, retry_delay_seconds=1.0):
+        self.store = store
+        self.binance_client = binance_client
+        self.futures_client = futures_client
+        self.page_limit = page_limit
+        self.max_retries = max_retries
+        self.retry_delay_seconds = retry_delay_seconds
+
+        self.symbols = []
+        self.intervals = []
+        self.markets = ['spot']
+        self.lookback_days = 365
+
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            'pages': 0,
+            'candles_stored': 0,
+            'retries': 0,
+            'failed_series': 0,
+            'last_sync_seconds': None
+        }
+
+    @classmethod
+    def from_config(cls, config, binance_client, futures_client=None):
+        history_config = config.get('market_data', {}).get('historical', {})
+        downloader = cls(
+            HistoricalKlineStore(history_config.get('directory', 'data/history')),
+            binance_client,
+            futures_client=futures_client,
+            page_limit=history_config.get('page_limit', MAX_KLINES_PER_REQUEST),
+            max_retries=history_config.get('max_retries', 5),
+            retry_delay_seconds=history_config.get('retry_delay_seconds', 1.0)
+        )
+        downloader.symbols = history_config.get('symbols') or config.get('trading_pairs', [])
+        downloader.intervals = history_config.get('intervals', ['5m', '1h'])
+        downloader.markets = history_config.get('markets', ['spot'])
+        downloader.lookback_days = history_config.get('lookback_days', 365)
+        return downloader
+
+    def _client_for(self, market):
+        return self.binance_client if market == 'spot' else self.futures_client
+
+    def _fetch_page(self, market, symbol, interval, start_time, end_time):
+        client = self._client_for(market)
+        for attempt in range(self.max_retries + 1):
+            if self._stop_event.is_set():
+                return None
+
+            if market == 'spot':
+                rows = client.fetch_klines_rest(symbol, interval, limit=self.page_limit, start_time=start_time,
+                                                allow_mock=False, end_time=end_time)
+            else:
+                rows = client.fetch_klines_rest(symbol, interval, limit=self.page_limit, start_time=start_time,
+                                                end_time=end_time)
+            if rows is not None:
+                return rows
+
+            # تأجيل من محدد المعدل أو خطأ مؤقت - ننتظر ونعيد
+            self.stats['retries'] += 1
+            self._stop_event.wait(self.retry_delay_seconds * (2 ** attempt))
+        return None
+
+    def download(self, symbol, interval, start_time, end_time=None, market='spot'):
+        """
+        تنزيل (أو استئناف) سلسلة واحدة حتى end_time (الافتراضي: الآن)
+        Returns: عدد الشموع المضافة، أو None عند الفشل
+        """
+        if self._client_for(market) is None:
+            logger.warning(f"⚠️ No {market} client - skipping {symbol} {interval} history")
+            return None
+
+        interval_ms = INTERVAL_MS[interval]
+        end_time = int(end_time if end_time is not None else time.time() * 1000)
+        last_open = self.store.last_open_time(market, symbol, interval)
+        cursor = int(start_time) if last_open is None else max(int(start_time), last_open + interval_ms)
+
+        added = 0
+        while cursor <= end_time and not self._stop_event.is_set():
+            rows = self._fetch_page(market, symbol, interval, cursor, end_time)
+            if rows is None:
+                self.stats['failed_series'] += 1
+                logger.error(f"❌ History download stalled for {market} {symbol} {interval} at {cursor} "
+                             f"({added} candles stored - will resume from here)")
+                return None
+            if not rows:
+                break
+
+            self.stats['pages'] += 1
+            stored = self.store.append(market, symbol, interval, rows)
+            added += stored
+            self.stats['candles_stored'] += stored
+
+            cursor = int(rows[-1][0]) + interval_ms
+            if len(rows) < self.page_limit:
+                break
+
+        if added:
+            logger.info(f"🗄️ {market} {symbol} {interval}: +{added} candles")
+        return added
+
+    def sync(self, symbols=None, intervals=None, markets=None, lookback_days=None, end_time=None):
+        """تنزيل كل السلاسل المُعدّة حتى الآن (يستأنف من آخر شمعة لكل سلسلة)"""
+        started = time.time()
+        lookback_days = lookback_days if lookback_days is not None else self.lookback_days
+        end_time = int(end_time if end_time is not None else started * 1000)
+        start_time = end_time - int(lookback_days * DAY_MS)
+
+        summary = {}
+        for market in markets or self.markets:
+            for symbol in symbols or self.symbols:
+                for interval in intervals or self.intervals:
+                    if self._stop_event.is_set():
+                        return summary
+                    summary[f"{market}:{symbol}:{interval}"] = self.download(
+                        symbol, interval, start_time, end_time, market=market
+                    )
+
+        self.stats['last_sync_seconds'] = round(time.time() - started, 1)
+        logger.info(f"🗄️ Historical sync finished in {self.stats['last_sync_seconds']}s "
+                    f"({sum(v or 0 for v in summary.values())} new candles)")
+        return summary
+
+    def start(self):
+        """مزامنة في الخلفية عند بدء البوت"""
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.sync, name='history-sync', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def get_stats(self):
+        return {**self.stats, 'series': len(self.store.list_series())}
+
+def main():
+    parser = argparse.ArgumentParser(description='Download historical klines into the columnar store')
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--symbols', nargs='+')
+    parser.add_argument('--intervals', nargs='+')
+    parser.add_argument('--markets', nargs='+', choices=MARKETS)
+    parser.add_argument('--days', type=float, help='lookback in days (default: market_data.historical.lookback_days)')
+    parser.add_argument('--info', action='store_true', help='list stored series and exit')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.load(f)
+
+    from http_transport import configure_transport
+    from rate_limiter import configure_rate_limiters
+    from binance_client import BinanceClientManager
+    from binance_derivatives_client import BinanceDerivativesClient
+
+    configure_transport(config)
+    configure_rate_limiters(config)
+    endpoints = config.get('endpoints', {})
+    markets = args.markets or config.get('market_data', {}).get('historical', {}).get('markets', ['spot'])
+
+    binance_client = BinanceClientManager(testnet=config.get('testnet', False), base_url=endpoints.get('spot_base_url'))
+    futures_client = None
+    if 'futures' in markets:
+        futures_client = BinanceDerivativesClient(
+            testnet=config.get('futures', {}).get('testnet', True), base_url=endpoints.get('futures_base_url')
+        )
+
+    downloader = HistoricalKlineDownloader.from_config(config, binance_client, futures_client)
+    if args.info:
+        for series, meta in downloader.store.get_stats().items():
+            logger.info(f"🗄️ {series}: {meta['rows']} candles, gaps={meta.get('gaps', 0)}, "
+                        f"{meta['first_open_time']} → {meta['last_open_time']}")
+        return
+
+    downloader.sync(symbols=args.symbols, intervals=args.intervals, markets=markets, lookback_days=args.days)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from logger_setup import setup_logger
+
+logger = setup_logger('http_transport')
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'DELETE', 'PUT'}
+
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    'api.binance.com/api/v3/ticker/price': 5,
+    'api.binance.com/api/v3/klines': 10,
+    'api.coingecko.com': 10,
+    'api.telegram.org': 10
+}
+
+class HttpTransport:
+    """
+    🌐 طبقة HTTP مشتركة وآمنة للخيوط
+    Session مستقلة (connection pool + keep-alive) لكل host، مع إعادة محاولة
+    محدودة بتأخير أسي عشوائي، ومهلات لكل endpoint
+    """
+    def __init__(self, pool_maxsize=10, max_retries=3, backoff_base_seconds=0.3,
+                 backoff_max_seconds=5.0, default_timeout_seconds=10, endpoint_timeouts=None):
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.default_timeout_seconds = default_timeout_seconds
+
+        timeouts = dict(DEFAULT_ENDPOINT_TIMEOUTS)
+        timeouts.update(endpoint_timeouts or {})
+        # أطول بادئة أولاً حتى يفوز التطابق الأدق
+        self.endpoint_timeouts = sorted(timeouts.items(), key=lambda item: len(item[0]), reverse=True)
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'requests': 0,
+            'retries': 0,
+            'failures': 0
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        http_config = config.get('http', {})
+        return cls(
+            pool_maxsize=http_config.get('pool_maxsize', 10),
+            max_retries=http_config.get('max_retries', 3),
+            backoff_base_seconds=http_config.get('backoff_base_seconds', 0.3),
+            backoff_max_seconds=http_config.get('backoff_max_seconds', 5.0),
+            default_timeout_seconds=http_config.get('default_timeout_seconds', 10),
+            endpoint_timeouts=http_config.get('endpoint_timeouts', {})
+        )
+
+    def _get_session(self, host):
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def get_timeout(self, url):
+        parts = urlsplit(url)
+        target = f"{parts.netloc}{parts.path}"
+        for prefix, timeout in self.endpoint_timeouts:
+            if target.startswith(prefix):
+                return timeout
+        return self.default_timeout_seconds
+
+    def _backoff(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max_seconds)
+
+        delay = min(self.backoff_base_seconds * (2 ** attempt), self.backoff_max_seconds)
+        return random.uniform(0, delay)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """
+        تنفيذ طلب HTTP مع إعادة المحاولة
+        Returns: آخر Response (حتى لو كان خطأ HTTP)، أو يرفع آخر استثناء اتصال
+        """
+        method = method.upper()
+        session = self._get_session(urlsplit(url).netloc)
+        if timeout is None:
+            timeout = self.get_timeout(url)
+
+        attempt = 0
+        while True:
+            self.stats['requests'] += 1
+            try:
+                response = session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # POST غير متكرر إلا إذا فشل الاتصال قبل إرسال الطلب
+                retryable = method in IDEMPOTENT_METHODS or isinstance(e, requests.exceptions.ConnectTimeout)
+                if attempt >= self.max_retries or not retryable:
+                    self.stats['failures'] += 1
+                    raise
+                delay = self._backoff(attempt)
+                logger.debug(f"🔄 {method} {url} failed ({e.__class__.__name__}) - retry in {delay:.2f}s")
+            else:
+                if (response.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries
+                        or method not in IDEMPOTENT_METHODS):
+                    return response
+                delay = self._backoff(attempt, response)
+                logger.debug(f"🔄 {method} {url} returned {response.status_code} - retry in {delay:.2f}s")
+
+            attempt += 1
+            self.stats['retries'] += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def get_stats(self):
+        """إحصائيات إعادة استخدام الاتصالات لكل host"""
+        hosts = {}
+        with self._lock:
+            sessions = list(self._sessions.items())
+
+        for host, session in sessions:
+            connections = 0
+            requests_sent = 0
+            for adapter in set(session.adapters.values()):
+                for pool in list(adapter.poolmanager.pools._container.values()):
+                    connections += pool.num_connections
+                    requests_sent += pool.num_requests
+
+            hosts[host] = {
+                'requests': requests_sent,
+                'connections_opened': connections,
+                'reuse_rate': round((1 - connections / requests_sent) * 100, 1) if requests_sent else 0.0
+            }
+
+        return {**self.stats, 'hosts': hosts}
+
+_transport = None
+_transport_lock = threading.Lock()
+
+def configure_transport(config):
+    """إنشاء الـ transport المشترك من الإعدادات (يُستدعى مرة واحدة عند بدء البوت)"""
+    global _transport
+    with _transport_lock:
+        _transport = HttpTransport.from_config(config)
+    return _transport
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HttpTransport()
+    return _transport
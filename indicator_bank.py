@@ -0,0 +1,148 @@
+import numpy as np
+from collections.abc import Mapping
+from logger_setup import setup_logger
+from indicator_kernels import ema, rolling_std, rsi, sma, stoch
+
+logger = setup_logger('indicator_bank')
+
+class FeatureVariant:
+    """
+    عرض خفيف فوق متجه الميزات المشترك: قيم متغير البوت أولاً ثم الأساس
+    (بدون نسخ الـ 25 ميزة لكل بوت)
+    """
+    __slots__ = ('base', 'overrides')
+
+    def __init__(self, base, overrides):
+        self.base = base
+        self.overrides = overrides
+
+    def get(self, name, default=None):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.base.get(name, default)
+
+    def __getitem__(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.base[name]
+
+    def __contains__(self, name):
+        return name in self.overrides or name in self.base
+
+    def __iter__(self):
+        return iter(self.base)
+
+    def __len__(self):
+        return len(self.base)
+
+    def keys(self):
+        return self.base.keys()
+
+Mapping.register(FeatureVariant)
+
+class IndicatorBank:
+    """
+    🏦 كل متغيرات المعاملات التي يطلبها بوتات السرب في تمريرة واحدة
+
+    كل معامل مميز يُحسب مرة واحدة ويُشارك: EMA لكل فترة (تُستخدم في MACD و EMA معاً)،
+    ومتوسط/انحراف واحد لكل bb_period تُشتق منه كل مستويات bb_std كمصفوفة،
+    وقمم/قيعان Stochastic لكل فترة k. كل بوت يقرأ متغيره عبر FeatureVariant.
+
+    params: (rsi_period, stoch_k, stoch_d, bb_period, bb_std,
+             macd_fast, macd_slow, macd_signal, ema_fast, ema_medium, ema_slow)
+    """
+    def __init__(self, params, stoch_smooth_k=3):
+        self.params = sorted(set(params))
+        self.stoch_smooth_k = stoch_smooth_k
+        self.rsi_periods = sorted({p[0] for p in self.params})
+        self.stoch_periods = sorted({(p[1], p[2]) for p in self.params})
+        self.bb_levels = {}
+        for p in self.params:
+            self.bb_levels.setdefault(p[3], set()).add(p[4])
+        self.bb_levels = {period: sorted(stds) for period, stds in self.bb_levels.items()}
+        self.macd_params = sorted({p[5:8] for p in self.params})
+        self.ema_periods = sorted({period for p in self.params for period in p[8:11]} |
+                                  {period for fast, slow, _ in self.macd_params for period in (fast, slow)})
+        self.stats = {'passes': 0}
+
+    @classmethod
+    def from_swarm(cls, swarm):
+        return cls([worker.config.indicator_params for worker in swarm.workers])
+
+    def compute(self, arrays):
+        """
+        Returns: {('rsi', 14): value, ('bb_upper', 20, 2.0): value, ...} لآخر شمعة
+        """
+        high = np.asarray(arrays['high'], dtype=np.float64)
+        low = np.asarray(arrays['low'], dtype=np.float64)
+        close = np.asarray(arrays['close'], dtype=np.float64)
+        values = {}
+
+        for period in self.rsi_periods:
+            values[('rsi', period)] = float(rsi(close, period)[-1])
+
+        for k, d in self.stoch_periods:
+            stoch_k, stoch_d = stoch(high, low, close, k, d, self.stoch_smooth_k)
+            values[('stoch_k', k, d)] = float(stoch_k[-1])
+            values[('stoch_d', k, d)] = float(stoch_d[-1])
+
+        for period, stds in self.bb_levels.items():
+            middle = sma(close, period)[-1]
+            deviation = rolling_std(close, period)[-1] * np.asarray(stds)
+            for std, upper, lower in zip(stds, (middle + deviation).tolist(), (middle - deviation).tolist()):
+                values[('bb_upper', period, std)] = upper
+                values[('bb_lower', period, std)] = lower
+            values[('bb_middle', period)] = float(middle)
+
+        emas = {period: ema(close, period) for period in self.ema_periods}
+        for period, series in emas.items():
+            values[('ema', period)] = float(series[-1])
+        for fast, slow, signal in self.macd_params:
+            line = emas[fast] - emas[slow]
+            signal_line = ema(line, signal)[-1]
+            values[('macd', fast, slow, signal)] = (float(line[-1]), float(signal_line))
+
+        self.stats['passes'] += 1
+        return values
+
+    def variants(self, arrays, base):
+        """
+        {params: FeatureVariant} لكل متغير مميز فوق متجه الميزات base، أو {} عند الفشل
+        """
+        try:
+            values = self.compute(arrays)
+        except Exception as e:
+            logger.error(f"Error computing indicator bank: {e}")
+            return {}
+
+        result = {}
+        for params in self.params:
+            (rsi_period, stoch_k, stoch_d, bb_period, bb_std,
+             macd_fast, macd_slow, macd_signal, ema_fast, ema_medium, ema_slow) = params
+            macd_line, signal_line = values[('macd', macd_fast, macd_slow, macd_signal)]
+            result[params] = FeatureVariant(base, {
+                'rsi': values[('rsi', rsi_period)],
+                'stoch_k': values[('stoch_k', stoch_k, stoch_d)],
+                'stoch_d': values[('stoch_d', stoch_k, stoch_d)],
+                'bb_upper': values[('bb_upper', bb_period, bb_std)],
+                'bb_middle': values[('bb_middle', bb_period)],
+                'bb_lower': values[('bb_lower', bb_period, bb_std)],
+                'macd': macd_line,
+                'macd_signal': signal_line,
+                'macd_hist': macd_line - signal_line,
+                # أسماء الحقول ثابتة في WorkerBot: ema_9/21/50 = ema_fast/medium/slow للبوت
+                'ema_9': values[('ema', ema_fast)],
+                'ema_21': values[('ema', ema_medium)],
+                'ema_50': values[('ema', ema_slow)]
+            })
+        return result
+
+    def get_stats(self):
+        return {
+            'variants': len(self.params),
+            'rsi_periods': self.rsi_periods,
+            'stoch_periods': [list(p) for p in self.stoch_periods],
+            'bb_levels': self.bb_levels,
+            'ema_periods': self.ema_periods,
+            'passes': self.stats['passes']
+        }
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import threading
+import time
+from logger_setup import setup_logger
+
+logger = setup_logger('indicator_cache')
+
+def config_fingerprint(config):
+    """بصمة إعدادات المؤشرات: أي تغيير في الفترات أو المحرك يبطل كل النتائج المخزنة"""
+    engine = config.get('indicator_engine', {})
+    payload = json.dumps({'indicators': config.get('indicators', {}), 'mode': engine.get('mode', 'pandas')},
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+class IndicatorResultCache:
+    """
+    🗃️ ذاكرة نتائج أمام TechnicalIndicators
+    المفتاح: (symbol, interval, open_time آخر شمعة مغلقة, بصمة الإعدادات)
+
+    - الأطر في closed_intervals (الاتجاهات الأعلى) تُحسب على الشموع المغلقة فقط
+      وتُعاد كما هي حتى تُغلق الشمعة التالية
+    - باقي الأطر: يُعاد الحساب فقط إذا تغيّر high/low/close للشمعة المفتوحة
+    """
+    def __init__(self, config_hash, closed_intervals=()):
+        self.config_hash = config_hash
+        self.closed_intervals = set(closed_intervals)
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._misses = {}
+
+    @classmethod
+    def from_config(cls, config):
+        cache_config = config.get('indicator_engine', {}).get('cache', {})
+        mtf = config.get('multi_timeframe', {})
+        default_closed = [mtf[name] for name in ('medium_timeframe', 'long_timeframe') if name in mtf]
+        return cls(
+            config_fingerprint(config),
+            closed_intervals=cache_config.get('closed_intervals', default_closed)
+        )
+
+    def _count(self, counter, interval):
+        with self._lock:
+            counter[interval] = counter.get(interval, 0) + 1
+
+    def get_or_compute(self, symbol, interval, arrays, compute, now_ms=None):
+        """
+        compute(arrays) -> (indicators, trend) أو None
+        """
+        n = len(arrays['close'])
+        if n == 0:
+            return compute(arrays)
+
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+        closed_count = n if arrays['close_time'][-1] < now_ms else n - 1
+        if closed_count == 0:
+            return compute(arrays)
+
+        closed_only = interval in self.closed_intervals
+        if closed_only or closed_count == n:
+            open_bar = None
+        else:
+            open_bar = (float(arrays['high'][-1]), float(arrays['low'][-1]), float(arrays['close'][-1]))
+        key = (int(arrays['open_time'][closed_count - 1]), self.config_hash, open_bar)
+
+        with self._lock:
+            entry = self._entries.get((symbol, interval))
+
+        if entry and entry['key'] == key:
+            self._count(self._hits, interval)
+            result = entry['result']
+            if open_bar is None or result is None:
+                return result
+            # الحجم ليس جزءاً من المفتاح: نحدّثه بدون إعادة الحساب
+            indicators, trend = result
+            return indicators.replace(volume=float(arrays['volume'][-1])), trend
+
+        self._count(self._misses, interval)
+        if closed_only and closed_count < n:
+            arrays = {name: values[:closed_count] for name, values in arrays.items()}
+        result = compute(arrays)
+        with self._lock:
+            self._entries[(symbol, interval)] = {'key': key, 'result': result}
+        return result
+
+    def invalidate(self, symbol=None, interval=None):
+        with self._lock:
+            for key in list(self._entries):
+                if (symbol is None or key[0] == symbol) and (interval is None or key[1] == interval):
+                    del self._entries[key]
+
+    def get_stats(self):
+        with self._lock:
+            intervals = sorted(set(self._hits) | set(self._misses))
+            per_interval = {}
+            for interval in intervals:
+                hits = self._hits.get(interval, 0)
+                total = hits + self._misses.get(interval, 0)
+                per_interval[interval] = {
+                    'hits': hits,
+                    'misses': total - hits,
+                    'hit_ratio': round(hits / total, 3) if total else 0.0
+                }
+            hits = sum(self._hits.values())
+            total = hits + sum(self._misses.values())
+            return {
+                'series': len(self._entries),
+                'hits': hits,
+                'misses': total - hits,
+                'hit_ratio': round(hits / total, 3) if total else 0.0,
+                'intervals': per_interval
+            }
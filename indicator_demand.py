@@ -0,0 +1,69 @@
+from logger_setup import setup_logger
+from indicator_snapshot import INDICATOR_GROUPS
+
+logger = setup_logger('indicator_demand')
+
+# ما يقرأه كل مستهلك من قيم get_latest_values
+CONSUMER_INPUTS = {
+    'trend': ('close', 'ema_short', 'ema_long', 'adx'),
+    'trading_strategy': ('close', 'rsi', 'stoch_k', 'bb_lower', 'macd_hist', 'ema_short', 'ema_long'),
+    'futures_strategies': ('close', 'rsi', 'stoch_k', 'bb_lower', 'macd'),
+    'market_regime': ('close', 'adx', 'ema_short', 'ema_long', 'bb_upper', 'bb_middle', 'bb_lower'),
+    'custom_momentum': ('close', 'volume', 'rsi', 'stoch_k', 'macd_hist'),
+    # السرب والسببية يقرآن متجه FeatureBuilder؛ هذه مدخلات المسار البديل فقط
+    'swarm': ('close', 'rsi', 'stoch_k', 'bb_lower', 'bb_upper', 'macd', 'macd_signal', 'macd_hist', 'adx'),
+    'causal_inference': ('close', 'rsi', 'stoch_k', 'bb_lower', 'bb_upper'),
+    'status_log': ('close', 'rsi', 'stoch_k', 'bb_lower')
+}
+
+GROUP_OF = {name: group for group, outputs in INDICATOR_GROUPS.items() for name in outputs}
+
+class IndicatorDemand:
+    """
+    🕸️ رسم اعتماديات: أي مستهلك مفعّل يحتاج أي مؤشرات على أي إطار زمني
+    TechnicalIndicators يحسب لكل إطار المجموعات المطلوبة فقط
+    """
+    def __init__(self, consumers_by_interval):
+        self.consumers_by_interval = {interval: set(consumers) for interval, consumers in consumers_by_interval.items()}
+        self._groups = {}
+        for interval, consumers in self.consumers_by_interval.items():
+            needed = {GROUP_OF[name] for consumer in consumers for name in CONSUMER_INPUTS[consumer] if name in GROUP_OF}
+            self._groups[interval] = tuple(group for group in INDICATOR_GROUPS if group in needed)
+
+    @classmethod
+    def from_config(cls, config):
+        signal_consumers = ['trading_strategy', 'status_log']
+        if config.get('futures', {}).get('enabled', False):
+            signal_consumers.append('futures_strategies')
+        if config.get('market_regime', {}).get('enabled', False):
+            signal_consumers.append('market_regime')
+        if config.get('custom_momentum', {}).get('enabled', False):
+            signal_consumers.append('custom_momentum')
+        if config.get('swarm_intelligence', {}).get('enabled', False):
+            signal_consumers.append('swarm')
+            if config.get('causal_inference', {}).get('enabled', True):
+                signal_consumers.append('causal_inference')
+
+        multi_tf = config.get('multi_timeframe', {})
+        consumers = {}
+        if multi_tf.get('enabled', False):
+            # short_trend لا يُستخدم مع تعدد الأطر: الاتجاه مطلوب للأطر الأعلى فقط
+            consumers.setdefault(multi_tf['short_timeframe'], set()).update(signal_consumers)
+            for name in ('medium_timeframe', 'long_timeframe'):
+                consumers.setdefault(multi_tf[name], set()).add('trend')
+        else:
+            consumers.setdefault(config['trading']['candle_interval'], set()).update(signal_consumers + ['trend'])
+        return cls(consumers)
+
+    def consumers(self, interval):
+        return self.consumers_by_interval.get(interval, set())
+
+    def groups(self, interval):
+        """مجموعات INDICATOR_GROUPS المطلوبة لهذا الإطار، أو None (الكل) لإطار غير معروف"""
+        return self._groups.get(interval)
+
+    def needs_trend(self, interval):
+        return interval not in self.consumers_by_interval or 'trend' in self.consumers_by_interval[interval]
+
+    def describe(self):
+        return {interval: list(groups) for interval, groups in self._groups.items()}
@@ -0,0 +1,280 @@
+import sys
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from logger_setup import setup_logger
+from kline_store import rows_to_arrays
+from indicator_snapshot import INDICATOR_GROUPS, INDICATOR_OUTPUTS, IndicatorSnapshot
+
+logger = setup_logger('indicator_kernels')
+
+# حتى هذا الطول تُحسب المرشحات التكرارية كضرب مصفوفات، وبعده بحلقة زمنية
+MATRIX_MAX_CANDLES = 1024
+
+@lru_cache(maxsize=64)
+def _decay_matrix(decay, n):
+    """W[t, i] = decay^(t-i) للـ i <= t"""
+    lags = np.arange(n)[:, None] - np.arange(n)[None, :]
+    matrix = np.where(lags >= 0, decay ** np.maximum(lags, 0), 0.0)
+    matrix.setflags(write=False)
+    return matrix
+
+def linear_filter(u, decay):
+    """
+    y_t = decay * y_{t-1} + u_t على المحور الأخير (y_{-1} = 0)
+    أساس كل المتوسطات الأسية بدون حلقة Python على الشموع
+    """
+    n = u.shape[-1]
+    if n <= MATRIX_MAX_CANDLES:
+        return u @ _decay_matrix(decay, n).T
+
+    y = np.empty_like(u)
+    acc = np.zeros(u.shape[:-1])
+    for t in range(n):
+        acc = acc * decay + u[..., t]
+        y[..., t] = acc
+    return y
+
+def _leading_nans(x):
+    """عدد الأعمدة الأولى التي كلها NaN"""
+    valid = ~np.isnan(x)
+    if valid.ndim > 1:
+        valid = valid.any(axis=tuple(range(valid.ndim - 1)))
+    return int(np.argmax(valid)) if valid.any() else x.shape[-1]
+
+def rma(x, length):
+    """pandas_ta.rma: ewm(alpha=1/length, adjust=True, min_periods=length)"""
+    decay = 1.0 - 1.0 / length
+    valid = ~np.isnan(x)
+    numerator = linear_filter(np.where(valid, x, 0.0), decay)
+    denominator = linear_filter(valid.astype(np.float64), decay)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        result = numerator / denominator
+    result[np.cumsum(valid, axis=-1) < length] = np.nan
+    return result
+
+def ema(x, length):
+    """pandas_ta.ema: SMA لأول length قيمة صالحة ثم ewm(span=length, adjust=False)"""
+    alpha = 2.0 / (length + 1)
+    result = np.full(x.shape, np.nan)
+    start = _leading_nans(x)
+    seed_index = start + length - 1
+    if seed_index >= x.shape[-1]:
+        return result
+
+    u = np.zeros(x.shape)
+    u[..., seed_index] = x[..., start:seed_index + 1].mean(axis=-1)
+    u[..., seed_index + 1:] = alpha * x[..., seed_index + 1:]
+    result[..., seed_index:] = linear_filter(u[..., seed_index:], 1.0 - alpha)
+    return result
+
+def _rolling(x, length, reducer, **kwargs):
+    result = np.full(x.shape, np.nan)
+    if x.shape[-1] >= length:
+        result[..., length - 1:] = reducer(sliding_window_view(x, length, axis=-1), axis=-1, **kwargs)
+    return result
+
+def rolling_std(x, length):
+    """انحراف معياري للمجتمع (ddof=0) كما في pandas_ta.bbands"""
+    return _rolling(x, length, np.std)
+
+def sma(x, length):
+    """متوسط متحرك عبر فروق المجموع التراكمي؛ NaN إذا احتوت النافذة على NaN"""
+    result = np.full(x.shape, np.nan)
+    if x.shape[-1] < length:
+        return result
+
+    valid = ~np.isnan(x)
+    pad = [(0, 0)] * (x.ndim - 1) + [(1, 0)]
+    sums = np.pad(np.cumsum(np.where(valid, x, 0.0), axis=-1), pad)
+    missing = np.pad(np.cumsum(~valid, axis=-1), pad)
+    window_sums = sums[..., length:] - sums[..., :-length]
+    window_missing = missing[..., length:] - missing[..., :-length]
+    result[..., length - 1:] = np.where(window_missing > 0, np.nan, window_sums / length)
+    return result
+
+def _non_zero_range(high, low):
+    # pandas_ta.non_zero_range: يضيف epsilon لكل السلسلة إذا وُجد مدى صفري
+    price_range = high - low
+    has_zero = (price_range == 0).any(axis=-1, keepdims=True)
+    return np.where(has_zero, price_range + sys.float_info.epsilon, price_range)
+
+def rsi(close, length=14):
+    change = np.full(close.shape, np.nan)
+    change[..., 1:] = np.diff(close, axis=-1)
+    gain = np.where(np.isnan(change), np.nan, np.maximum(change, 0.0))
+    loss = np.where(np.isnan(change), np.nan, -np.minimum(change, 0.0))
+    avg_gain = rma(gain, length)
+    avg_loss = rma(loss, length)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 100.0 * avg_gain / (avg_gain + avg_loss)
+
+def stoch(high, low, close, k=14, d=3, smooth_k=3):
+    lowest = _rolling(low, k, np.min)
+    highest = _rolling(high, k, np.max)
+    raw = 100.0 * (close - lowest) / _non_zero_range(highest, lowest)
+    stoch_k = sma(raw, smooth_k)
+    return stoch_k, sma(stoch_k, d)
+
+def bbands(close, length=20, std=2.0):
+    middle = sma(close, length)
+    deviation = std * rolling_std(close, length)
+    return middle + deviation, middle, middle - deviation
+
+def macd(close, fast=12, slow=26, signal=9):
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+def true_range(high, low, close):
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[..., 1:] = close[..., :-1]
+    result = np.fmax(np.abs(_non_zero_range(high, low)),
+                     np.fmax(np.abs(high - prev_close), np.abs(prev_close - low)))
+    result[..., 0] = np.nan
+    return result
+
+def atr(high, low, close, length=14, tr=None):
+    """pandas_ta.atr (mamode=rma)"""
+    return rma(true_range(high, low, close) if tr is None else tr, length)
+
+def adx(high, low, close, length=14, tr=None):
+    tr = true_range(high, low, close) if tr is None else tr
+
+    up = np.full(high.shape, np.nan)
+    down = np.full(low.shape, np.nan)
+    up[..., 1:] = np.diff(high, axis=-1)
+    down[..., 1:] = -np.diff(low, axis=-1)
+    plus = np.where((up > down) & (up > 0), up, 0.0)
+    minus = np.where((down > up) & (down > 0), down, 0.0)
+    plus[..., 0] = minus[..., 0] = np.nan
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = 100.0 / rma(tr, length)
+        dmp = scale * rma(plus, length)
+        dmn = scale * rma(minus, length)
+        dx = 100.0 * np.abs(dmp - dmn) / (dmp + dmn)
+    return rma(dx, length), dmp, dmn
+
+class IndicatorKernels:
+    """
+    🧮 مؤشرات بـ NumPy مباشرة على مصفوفات float64 من الشموع (بدون DataFrame)
+    نفس صيغ pandas_ta المستخدمة في TechnicalIndicators
+
+    كل النوى تعمل على المحور الأخير، فتقبل سلسلة واحدة (candles,) أو
+    مصفوفة (symbols × candles) بنفس التكلفة الثابتة لاستدعاءات Python.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+
+    @classmethod
+    def from_config(cls, config):
+        indicators = config['indicators']
+        return cls({
+            'rsi_period': indicators['rsi_period'],
+            'stochastic_period': indicators['stochastic_period'],
+            'stoch_smooth_k': indicators.get('stoch_smooth_k', 3),
+            'stoch_d': indicators.get('stoch_d', 3),
+            'bb_period': indicators['bb_period'],
+            'bb_std': indicators['bb_std'],
+            'macd_fast': indicators['macd_fast'],
+            'macd_slow': indicators['macd_slow'],
+            'macd_signal': indicators['macd_signal'],
+            'ema_short': indicators['ema_short'],
+            'ema_long': indicators['ema_long'],
+            'adx_period': indicators['adx_period']
+        })
+
+    @staticmethod
+    def to_arrays(klines):
+        """يقبل arrays من KlineStore أو صفوف REST"""
+        return klines if isinstance(klines, dict) else rows_to_arrays(klines)
+
+    def compute(self, arrays, groups=None):
+        """
+        المؤشرات كسلاسل كاملة على المحور الأخير
+        groups: أسماء من INDICATOR_GROUPS لحسابها فقط (None = الكل)
+        """
+        s = self.settings
+        groups = INDICATOR_GROUPS if groups is None else groups
+        high = np.asarray(arrays['high'], dtype=np.float64)
+        low = np.asarray(arrays['low'], dtype=np.float64)
+        close = np.asarray(arrays['close'], dtype=np.float64)
+
+        result = {}
+        if 'rsi' in groups:
+            result['rsi'] = rsi(close, s['rsi_period'])
+        if 'stoch' in groups:
+            result['stoch_k'], result['stoch_d'] = stoch(high, low, close, s['stochastic_period'],
+                                                         s['stoch_d'], s['stoch_smooth_k'])
+        if 'bbands' in groups:
+            result['bb_upper'], result['bb_middle'], result['bb_lower'] = bbands(close, s['bb_period'], s['bb_std'])
+        if 'macd' in groups:
+            result['macd'], result['macd_signal'], result['macd_hist'] = macd(close, s['macd_fast'], s['macd_slow'],
+                                                                              s['macd_signal'])
+        if 'ema' in groups:
+            result['ema_short'] = ema(close, s['ema_short'])
+            result['ema_long'] = ema(close, s['ema_long'])
+        if 'adx' in groups:
+            result['adx'], result['dmp'], result['dmn'] = adx(high, low, close, s['adx_period'])
+        return result
+
+    def latest_values_batch(self, klines_by_symbol, groups=None):
+        """
+        آخر القيم لعدة رموز في تمريرة واحدة: الرموز ذات نفس عدد الشموع تُكدّس
+        في مصفوفة (symbols × candles) وتُحسب كل المؤشرات على المحور 1 معاً
+        Returns: {symbol: latest_values}
+        """
+        by_length = {}
+        for symbol, klines in klines_by_symbol.items():
+            if klines is None:
+                continue
+            arrays = self.to_arrays(klines)
+            if len(arrays['close']):
+                by_length.setdefault(len(arrays['close']), []).append((symbol, arrays))
+
+        results = {}
+        for members in by_length.values():
+            try:
+                stacked = {
+                    name: np.vstack([arrays[name] for _, arrays in members])
+                    for name in ('high', 'low', 'close')
+                }
+                series = self.compute(stacked, groups)
+                latest = {name: values[:, -1].tolist() for name, values in series.items()}
+                missing = [np.nan] * len(members)
+            except Exception as e:
+                logger.error(f"Error computing batched indicator kernels: {e}")
+                continue
+
+            columns = [latest.get(name, missing) for name in INDICATOR_OUTPUTS]
+            for row, (symbol, arrays) in enumerate(members):
+                results[symbol] = IndicatorSnapshot(
+                    pd.Timestamp(int(arrays['close_time'][-1]), unit='ms'),
+                    float(arrays['close'][-1]),
+                    float(arrays['volume'][-1]),
+                    *(column[row] for column in columns)
+                )
+        return results
+
+    def latest_values(self, klines, groups=None):
+        """
+        آخر القيم بنفس مفاتيح TechnicalIndicators.get_latest_values، أو None
+        المؤشرات خارج groups تُعاد NaN
+        """
+        try:
+            arrays = self.to_arrays(klines)
+            if len(arrays['close']) == 0:
+                return None
+
+            series = self.compute(arrays, groups)
+            return IndicatorSnapshot(
+                pd.Timestamp(int(arrays['close_time'][-1]), unit='ms'),
+                float(arrays['close'][-1]),
+                float(arrays['volume'][-1]),
+                *(float(series[name][-1]) if name in series else np.nan for name in INDICATOR_OUTPUTS)
+            )
+        except Exception as e:
+            logger.error(f"Error computing indicator kernels: {e}")
+            return None
@@ -0,0 +1,104 @@
+from collections.abc import Mapping
+
+# مجموعات المؤشرات وأعمدتها: وحدة الحساب الأصغر (adx يُنتج dmp/dmn معه)
+INDICATOR_GROUPS = {
+    'rsi': ('rsi',),
+    'stoch': ('stoch_k', 'stoch_d'),
+    'bbands': ('bb_upper', 'bb_middle', 'bb_lower'),
+    'macd': ('macd', 'macd_signal', 'macd_hist'),
+    'ema': ('ema_short', 'ema_long'),
+    'adx': ('adx', 'dmp', 'dmn')
+}
+INDICATOR_OUTPUTS = tuple(name for outputs in INDICATOR_GROUPS.values() for name in outputs)
+
+NAN = float('nan')
+
+class Snapshot:
+    """
+    📸 لقطة قيم بحقول مسماة ثابتة (__slots__) بدل dict جديد في كل دورة
+    تقبل نفس الوصول القديم: snapshot['rsi'] و snapshot.get('rsi') و dict(snapshot)
+    الحقول غير الممررة تبقى NaN
+    """
+    __slots__ = ()
+    FIELDS = ()
+    ALIASES = {}
+    _NAMES = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._NAMES = frozenset(cls.FIELDS) | frozenset(cls.ALIASES)
+        # __init__ بتوقيع ثابت (كما يفعل namedtuple/dataclasses): أسرع من حلقة setattr
+        arguments = ', '.join(f"{name}=NAN" for name in cls.FIELDS)
+        body = '\n'.join(f"    self.{name} = {name}" for name in cls.FIELDS) or '    pass'
+        namespace = {}
+        exec(f"def __init__(self, {arguments}):\n{body}", {'NAN': NAN}, namespace)
+        cls.__init__ = namespace['__init__']
+
+    @classmethod
+    def from_mapping(cls, values):
+        return cls(*(values.get(name, NAN) for name in cls.FIELDS))
+
+    def __getitem__(self, name):
+        if name not in self._NAMES:
+            raise KeyError(name)
+        return getattr(self, self.ALIASES.get(name, name))
+
+    def get(self, name, default=None):
+        if name not in self._NAMES:
+            return default
+        return getattr(self, self.ALIASES.get(name, name))
+
+    def __contains__(self, name):
+        return name in self._NAMES
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def keys(self):
+        return self.FIELDS
+
+    def values(self):
+        return [getattr(self, name) for name in self.FIELDS]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self.FIELDS]
+
+    def replace(self, **changes):
+        """نسخة جديدة مع تغيير بعض الحقول (اللقطات لا تُعدّل في مكانها)"""
+        return type(self)(*(changes.pop(name, getattr(self, name)) for name in self.FIELDS))
+
+    def copy(self):
+        return self.replace()
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+        return self.FIELDS == other.FIELDS and self.values() == other.values()
+
+    __hash__ = None
+
+    def __getstate__(self):
+        return self.values()
+
+    def __setstate__(self, state):
+        for name, value in zip(self.FIELDS, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+Mapping.register(Snapshot)
+
+class IndicatorSnapshot(Snapshot):
+    """آخر قيم المؤشرات بنفس مفاتيح TechnicalIndicators.get_latest_values"""
+    FIELDS = ('timestamp', 'close', 'volume') + INDICATOR_OUTPUTS
+    # أسماء تستخدمها استراتيجيات العقود (كانت تُضاف على نسخة من dict)
+    ALIASES = {'stochastic': 'stoch_k', 'current_price': 'close'}
+    __slots__ = FIELDS
@@ -0,0 +1,211 @@
+import threading
+import time
+import numpy as np
+from logger_setup import setup_logger
+from market_data_stream import INTERVAL_MS
+
+logger = setup_logger('kline_store')
+
+KLINE_FIELDS = (
+    'open_time', 'open', 'high', 'low', 'close', 'volume',
+    'close_time', 'quote_volume', 'trades', 'taker_buy_base', 'taker_buy_quote'
+)
+FIELD_INDEX = {name: i for i, name in enumerate(KLINE_FIELDS)}
+
+MAX_KLINES_PER_REQUEST = 1000
+
+def rows_to_matrix(rows):
+    """تحويل صفوف REST إلى مصفوفة (n, fields) من نوع float64"""
+    if not rows:
+        return np.empty((0, len(KLINE_FIELDS)), dtype=np.float64)
+    return np.array([row[:len(KLINE_FIELDS)] for row in rows], dtype=np.float64)
+
+def rows_to_arrays(rows):
+    """تحويل صفوف REST إلى dict من الأعمدة بنفس صيغة KlineRingBuffer.view"""
+    matrix = rows_to_matrix(rows)
+    return {name: matrix[:, i].copy() for i, name in enumerate(KLINE_FIELDS)}
+
+class KlineRingBuffer:
+    """
+    حلقة شموع بسعة ثابتة بتخزين struct-of-arrays (float64)
+
+    كل صف يُكتب مرتين (i و i+capacity) حتى تكون آخر n شمعة دائماً
+    شريحة متصلة في الذاكرة، فنعيد views بدون أي نسخ.
+    """
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self._data = np.full((len(KLINE_FIELDS), 2 * capacity), np.nan, dtype=np.float64)
+        self._start = 0
+        self.size = 0
+        self.lock = threading.Lock()
+
+    @property
+    def last_open_time(self):
+        if self.size == 0:
+            return None
+        return int(self._data[0, self._slot(self.size - 1)])
+
+    def _slot(self, offset):
+        return (self._start + offset) % self.capacity
+
+    def _write(self, slot, values):
+        self._data[:, slot] = values
+        self._data[:, slot + self.capacity] = values
+
+    def clear(self):
+        self._start = 0
+        self.size = 0
+
+    def upsert(self, matrix):
+        """
+        إضافة شموع جديدة، واستبدال الشمعة الجارية (نفس open_time) في مكانها
+        Returns: عدد الشموع الجديدة المضافة
+        """
+        appended = 0
+        last_open = self.last_open_time
+
+        for values in matrix:
+            open_time = values[0]
+
+            if last_open is not None and open_time < last_open:
+                continue
+
+            if last_open is not None and open_time == last_open:
+                self._write(self._slot(self.size - 1), values)
+                continue
+
+            if self.size < self.capacity:
+                self._write(self._slot(self.size), values)
+                self.size += 1
+            else:
+                self._write(self._start, values)
+                self._start = (self._start + 1) % self.capacity
+
+            last_open = open_time
+            appended += 1
+
+        return appended
+
+    def view(self, limit=None):
+        """
+        إرجاع dict من views (بدون نسخ) لآخر `limit` شمعة
+        """
+        n = self.size if limit is None else min(limit, self.size)
+        begin = self._slot(self.size - n) if n else 0
+        return {name: self._data[i, begin:begin + n] for i, name in enumerate(KLINE_FIELDS)}
+
+class KlineStore:
+    """
+    📦 مخزن شموع تراكمي لكل (symbol, interval)
+    يجلب فقط الشموع الأحدث من آخر شمعة مخزنة عبر startTime
+    """
+    def __init__(self, binance_client, capacity=500, kline_stream=None):
+        self.binance_client = binance_client
+        self.capacity = capacity
+        self.kline_stream = kline_stream
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'full_fetches': 0,
+            'delta_fetches': 0,
+            'stream_updates': 0,
+            'candles_fetched': 0
+        }
+
+    def get_buffer(self, symbol, interval):
+        key = (symbol, interval)
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = KlineRingBuffer(self.capacity)
+                self._buffers[key] = buffer
+            return buffer
+
+    def get_arrays(self, symbol, interval, limit=100):
+        """
+        تحديث المخزن ثم إرجاع views لآخر `limit` شمعة، أو None عند الفشل
+        """
+        buffer = self.get_buffer(symbol, interval)
+
+        with buffer.lock:
+            if not self._refresh(buffer, symbol, interval, limit):
+                return None
+            if buffer.size == 0:
+                return None
+            return buffer.view(limit)
+
+    def plan_fetch(self, symbol, interval, limit):
+        """
+        تحديد الطلب اللازم لتحديث المخزن
+        Returns: (fetch_limit, start_time) - start_time=None يعني إعادة تحميل كاملة
+        """
+        buffer = self.get_buffer(symbol, interval)
+        last_open = buffer.last_open_time
+        interval_ms = INTERVAL_MS.get(interval)
+
+        if last_open is not None and interval_ms and buffer.size >= min(limit, self.capacity):
+            missing = int((time.time() * 1000 - last_open) // interval_ms) + 1
+            if missing <= MAX_KLINES_PER_REQUEST:
+                return missing, last_open
+
+        return min(max(limit, 1), self.capacity), None
+
+    def apply_fetch(self, symbol, interval, rows, start_time):
+        """دمج نتيجة طلب حسب plan_fetch (delta أو تحميل كامل)"""
+        if not rows:
+            return False
+
+        buffer = self.get_buffer(symbol, interval)
+        with buffer.lock:
+            self._apply_rows(buffer, rows, start_time)
+        return True
+
+    def peek_arrays(self, symbol, interval, limit=100):
+        """views لآخر `limit` شمعة بدون أي تحديث"""
+        buffer = self.get_buffer(symbol, interval)
+        with buffer.lock:
+            if buffer.size == 0:
+                return None
+            return buffer.view(limit)
+
+    def _apply_rows(self, buffer, rows, start_time):
+        self.stats['candles_fetched'] += len(rows)
+        if start_time is None:
+            self.stats['full_fetches'] += 1
+            buffer.clear()
+        else:
+            self.stats['delta_fetches'] += 1
+        buffer.upsert(rows_to_matrix(rows))
+
+    def _refresh(self, buffer, symbol, interval, limit):
+        fetch_limit, start_time = self.plan_fetch(symbol, interval, limit)
+
+        if start_time is not None:
+            if self.kline_stream:
+                rows = self.kline_stream.get_klines(symbol, interval, limit=fetch_limit)
+                if rows:
+                    self.stats['stream_updates'] += 1
+                    self.stats['candles_fetched'] += len(rows)
+                    buffer.upsert(rows_to_matrix(rows))
+                    return True
+
+            rows = self.binance_client.fetch_klines_rest(
+                symbol, interval, limit=fetch_limit, start_time=start_time, allow_mock=False
+            )
+            if rows:
+                self._apply_rows(buffer, rows, start_time)
+                return True
+
+            logger.debug(f"Delta fetch unavailable for {symbol} {interval} - reloading window")
+            fetch_limit, start_time = min(max(limit, 1), self.capacity), None
+
+        rows = self.binance_client.fetch_klines_rest(symbol, interval, limit=fetch_limit, allow_mock=False)
+        if not rows:
+            return False
+
+        self._apply_rows(buffer, rows, start_time)
+        return True
+
+    def get_stats(self):
+        return {**self.stats, 'series': len(self._buffers)}
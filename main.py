@@ -3,6 +3,7 @@ import time
 import os
 import threading
 import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from flask import Flask, jsonify, render_template
 from binance_client import BinanceClientManager
@@ -22,6 +23,25 @@ from db_manager import DatabaseManager
 from telegram_bot import TelegramBotController
 from swarm_intelligence import SwarmManager
 from causal_inference import CausalInferenceEngine
+from market_data_stream import KlineStreamCache, BookTickerStream
+from risk_monitor import RiskMonitor
+from shard_coordinator import ShardCoordinator, SHARD_ENV, connect_ledger
+from stage_profiler import StageProfiler
+from kline_store import KlineStore
+from request_coalescer import IterationKlineCache, collect_kline_requests
+from async_market_client import AsyncMarketDataClient
+from price_snapshot import PriceSnapshotService
+from exchange_metadata import ExchangeMetadataCache
+from historical_data import HistoricalKlineDownloader
+from streaming_indicators import StreamingIndicatorEngine
+from indicator_cache import IndicatorResultCache
+from indicator_demand import IndicatorDemand
+from feature_builder import FeatureBuilder, causal_signals
+from indicator_bank import IndicatorBank
+from account_stream import AccountBalanceCache
+from http_transport import configure_transport
+from rate_limiter import configure_rate_limiters, get_rate_limit_stats, PRIORITY_STOP_CHECK
+from candle_scheduler import CandleScheduler, RISK_JOB
 
 logger = setup_logger('main_bot')
 
@@ -49,14 +69,25 @@ bot_stats = {
 }
 
 class BinanceTradingBot:
-    def __init__(self, config_file='config.json'):
+    def __init__(self, config_file='config.json', shard=None):
         logger.info("=" * 80)
-        logger.info("🤖 Binance Trading Bot Starting...")
+        logger.info("🤖 Binance Trading Bot Starting..." + (f" (shard {shard['index']})" if shard else ""))
         logger.info("=" * 80)
         
         with open(config_file, 'r') as f:
             self.config = json.load(f)
         
+        self.config_file = config_file
+        self.shard = shard
+        if shard:
+            # عامل Shard يحلل رموزه فقط؛ الصفقات ومراقبة المخاطر عند المنسق
+            # وأي خروج (من العامل أو المنسق) يأخذ أولاً claim_exit من الدفتر
+            self.config['trading_pairs'] = shard['symbols']
+            self.config.setdefault('risk_monitor', {})['enabled'] = False
+        
+        self.http = configure_transport(self.config)
+        self.rate_limiters = configure_rate_limiters(self.config)
+        
         self.testnet = self.config.get('testnet', True)
         self.trading_pairs = self.config['trading_pairs']
         self.check_interval = self.config['trading']['check_interval_seconds']
@@ -78,12 +109,55 @@ class BinanceTradingBot:
             logger.error(f"❌ Database connection failed: {e}")
             self.db = None
         
-        self.binance_client = BinanceClientManager(testnet=self.testnet)
+        endpoints = self.config.get('endpoints', {})
+        self.binance_client = BinanceClientManager(testnet=self.testnet, base_url=endpoints.get('spot_base_url'))
+        
+        self.kline_stream = None
+        if self.config.get('market_data', {}).get('websocket', {}).get('enabled', False):
+            self.kline_stream = KlineStreamCache.from_config(self.config, self.binance_client)
+            if self.kline_stream.start():
+                self.binance_client.attach_kline_stream(self.kline_stream)
+                logger.info("📡 WebSocket Kline Stream: ENABLED")
+            else:
+                self.kline_stream = None
+        
+        store_config = self.config.get('market_data', {}).get('kline_store', {})
+        if store_config.get('enabled', False):
+            self.binance_client.attach_kline_store(KlineStore(
+                self.binance_client,
+                capacity=store_config.get('capacity', 500),
+                kline_stream=self.kline_stream
+            ))
+            logger.info("📦 Incremental Kline Store: ENABLED")
+        
+        self.account_cache = None
+        if self.config.get('market_data', {}).get('user_data_stream', {}).get('enabled', False):
+            self.account_cache = AccountBalanceCache.from_config(self.config, self.binance_client)
+            if self.account_cache.start():
+                self.binance_client.attach_account_cache(self.account_cache)
+                logger.info("👛 User Data Stream Balance Cache: ENABLED")
+            else:
+                self.account_cache = None
+        
+        self.market_data = IterationKlineCache(self.binance_client)
+        self.price_snapshot = PriceSnapshotService.from_config(self.config, self.binance_client)
+        self.kline_requests = collect_kline_requests(self.config)
+        
+        self.async_market = None
+        if self.config.get('market_data', {}).get('async_client', {}).get('enabled', False):
+            self.async_market = AsyncMarketDataClient.from_config(self.config, self.binance_client)
+            if self.async_market.start():
+                self.market_data.attach_async_client(self.async_market)
+                logger.info(f"⚡ Concurrent Market Data Prefetch: ENABLED ({len(self.kline_requests)} series)")
+            else:
+                self.async_market = None
         
         if self.futures_enabled:
             futures_testnet = self.config.get('futures', {}).get('testnet', True)
             try:
-                self.futures_client = BinanceDerivativesClient(testnet=futures_testnet)
+                self.futures_client = BinanceDerivativesClient(
+                    testnet=futures_testnet, base_url=endpoints.get('futures_base_url')
+                )
                 logger.info(f"✅ Futures Client initialized ({'TESTNET' if futures_testnet else 'LIVE'})")
             except Exception as e:
                 logger.error(f"❌ Futures Client initialization failed: {e}")
@@ -92,7 +166,35 @@ class BinanceTradingBot:
         else:
             self.futures_client = None
         
+        self.exchange_metadata = ExchangeMetadataCache.from_config(
+            self.config, self.binance_client, futures_client=self.futures_client
+        )
+        self.exchange_metadata.start()
+        
+        self.history_downloader = None
+        if self.config.get('market_data', {}).get('historical', {}).get('enabled', False):
+            self.history_downloader = HistoricalKlineDownloader.from_config(
+                self.config, self.binance_client, futures_client=self.futures_client
+            )
+            self.history_downloader.start()
+            logger.info("🗄️ Historical Kline Sync: ENABLED")
+        
         self.technical_indicators = TechnicalIndicators(self.config)
+        if self.config.get('indicator_engine', {}).get('mode', 'pandas') == 'streaming':
+            self.technical_indicators.attach_streaming_engine(StreamingIndicatorEngine.from_config(self.config))
+            logger.info("⚡ Streaming Indicator Engine: ENABLED")
+        if self.config.get('indicator_engine', {}).get('cache', {}).get('enabled', False):
+            self.technical_indicators.attach_result_cache(IndicatorResultCache.from_config(self.config))
+            logger.info("🗃️ Indicator Result Cache: ENABLED")
+        if self.config.get('indicator_engine', {}).get('demand_driven', False):
+            demand = IndicatorDemand.from_config(self.config)
+            self.technical_indicators.attach_demand(demand)
+            logger.info(f"🕸️ Demand-Driven Indicators: {demand.describe()}")
+        self.batch_indicators_enabled = self.config.get('indicator_engine', {}).get('batch', False)
+        self.iteration_analysis = {}
+        self.iteration_features = {}
+        if self.batch_indicators_enabled:
+            logger.info("🧮 Batched Cross-Symbol Indicators: ENABLED")
         self.trading_strategy = TradingStrategy(self.config)
         
         if self.futures_enabled and self.futures_client:
@@ -101,15 +203,26 @@ class BinanceTradingBot:
         else:
             self.strategy_coordinator = None
         
-        self.risk_manager = RiskManager(
-            self.config, 
-            self.binance_client, 
-            self.trading_strategy, 
-            db_manager=self.db,
-            futures_client=self.futures_client
-        )
+        if shard:
+            self.risk_manager, self.stats = connect_ledger(shard['address'], shard['authkey'])
+            logger.info(f"📒 Connected to coordinator position ledger at {shard['address'][0]}:{shard['address'][1]}")
+        else:
+            self.risk_manager = RiskManager(
+                self.config, 
+                self.binance_client, 
+                self.trading_strategy, 
+                db_manager=self.db,
+                futures_client=self.futures_client,
+                price_service=self.price_snapshot,
+                exchange_metadata=self.exchange_metadata
+            )
+            self.stats = StatisticsTracker(db_manager=self.db)
         self.telegram = TelegramNotifier(self.config)
-        self.stats = StatisticsTracker(db_manager=self.db)
+        
+        self.sharding = None
+        if not shard and self.config.get('sharding', {}).get('enabled', False):
+            self.sharding = ShardCoordinator.from_config(self.config)
+            logger.info(f"🧩 Multi-Process Sharding: ENABLED ({self.sharding.processes} shard processes)")
         self.market_regime = MarketRegime(self.config)
         self.sentiment_analyzer = SentimentAnalyzer(self.config)
         self.custom_momentum = CustomMomentumIndex(self.config, self.sentiment_analyzer)
@@ -160,6 +273,69 @@ class BinanceTradingBot:
         else:
             self.swarm = None
         
+        self.indicator_bank = None
+        if self.swarm_enabled and self.config['swarm_intelligence'].get('indicator_bank', False):
+            self.indicator_bank = IndicatorBank.from_swarm(self.swarm)
+            logger.info(f"   🏦 Indicator bank: {len(self.indicator_bank.params)} parameter variants")
+        
+        self.feature_builder = FeatureBuilder.from_config(self.config)
+        self.feature_interval = (self.config['multi_timeframe']['short_timeframe'] if self.multi_tf_enabled
+                                 else self.config['trading']['candle_interval'])
+        if self.swarm_enabled:
+            # ema_200 يحتاج تاريخاً أطول من نافذة المؤشرات: نوسّع الجلب المسبق لهذا الإطار فقط
+            self.kline_requests = [
+                (symbol, interval, max(limit, self.feature_builder.required_candles)
+                 if interval == self.feature_interval and symbol in self.trading_pairs else limit)
+                for symbol, interval, limit in self.kline_requests
+            ]
+        
+        self.profiler = StageProfiler.from_config(self.config)
+        if self.profiler.enabled:
+            logger.info(f"⏱️ Stage Profiler: ENABLED (window {self.profiler.window})")
+        
+        # مرحلة الجلب/التحليل لكل رمز تعمل بالتوازي؛ تعديل الصفقات يمر فقط عبر position_lock
+        pipeline_config = self.config.get('pipeline', {})
+        self.pipeline_executor = None
+        if pipeline_config.get('concurrent', False):
+            max_workers = pipeline_config.get('max_workers', 4)
+            self.pipeline_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='symbol')
+            logger.info(f"🧵 Concurrent Symbol Pipeline: ENABLED ({max_workers} workers)")
+        self.position_lock = threading.RLock()
+        self.symbol_durations = {}
+        
+        # أمر خروج واحد في الطيران لكل رمز، وبعد فشله لا إعادة قبل exit_retry_seconds
+        self.exits_in_flight = set()
+        self.exit_retry_after = {}
+        self.exit_retry_seconds = self.config.get('risk_monitor', {}).get('exit_retry_seconds', 10)
+        
+        # قواعد الخروج على كل تحديث سعر، مستقلة عن حلقة التحليل
+        self.risk_monitor = None
+        if self.config.get('risk_monitor', {}).get('enabled', False):
+            ticker_stream = None
+            if self.config['risk_monitor'].get('book_ticker', True):
+                ticker_stream = BookTickerStream.from_config(self.config, self.binance_client)
+                if not ticker_stream.start():
+                    ticker_stream = None
+            self.risk_monitor = RiskMonitor.from_config(
+                self.config, self.evaluate_quote, self.run_risk_checks, ticker_stream=ticker_stream
+            )
+            logger.info(f"🛡️ Risk Monitor: ENABLED ({'book ticker stream' if ticker_stream else 'price snapshot polling'})")
+        
+        # التحليل عند إغلاق كل شمعة (بتوقيت خادم المنصة) + فحص مخاطر سريع بينهما
+        scheduler_config = self.config.get('scheduler', {})
+        self.scheduler = None
+        self.close_cutoff_ms = None
+        if scheduler_config.get('mode', 'interval') == 'candle_close':
+            self.scheduler = CandleScheduler.from_config(self.config, self.binance_client)
+            self.scheduler.sync_clock()
+            for symbol in self.trading_pairs:
+                for interval in self.analysis_intervals():
+                    self.scheduler.add_candle_job((symbol, interval), interval)
+            if not self.risk_monitor and not shard:
+                # RiskMonitor يغطي فحص المخاطر بنفسه؛ بدونه نجدوله بين الإغلاقات
+                self.scheduler.add_periodic_job(RISK_JOB, scheduler_config.get('risk_interval_seconds', 1))
+            logger.info(f"⏰ Candle-Close Scheduler: ENABLED ({', '.join(self.analysis_intervals())})")
+        
         self.causal_enabled = self.config.get('causal_inference', {}).get('enabled', True)
         if self.causal_enabled:
             try:
@@ -211,38 +387,134 @@ class BinanceTradingBot:
             if timeframe is None:
                 timeframe = self.config['trading']['candle_interval']
             
-            klines = self.binance_client.get_historical_klines(symbol, timeframe, limit=100)
+            prepared = self.iteration_analysis.get((symbol, timeframe))
+            if prepared is not None:
+                return prepared
             
-            if not klines:
-                return None
+            with self.profiler.stage('klines'):
+                klines = self.market_data.get_kline_arrays(symbol, timeframe, limit=100)
             
-            df = self.technical_indicators.calculate_all_indicators(klines)
-            if df is None or df.empty:
+            if klines is None:
                 return None
             
-            indicators = self.technical_indicators.get_latest_values(df)
-            trend = self.technical_indicators.analyze_trend(df)
-            
-            return indicators, trend
+            with self.profiler.stage('indicators'):
+                return self.technical_indicators.analyze(klines, symbol, timeframe)
             
         except Exception as e:
             logger.error(f"Error analyzing {symbol} on {timeframe}: {e}")
             return None
     
+    def analysis_intervals(self):
+        """الأطر التي يحللها process_symbol فعلاً"""
+        if self.multi_tf_enabled:
+            mtf = self.config['multi_timeframe']
+            return list(dict.fromkeys([mtf['short_timeframe'], mtf['medium_timeframe'], mtf['long_timeframe']]))
+        return [self.config['trading']['candle_interval']]
+    
+    def prepare_batch_indicators(self, symbols):
+        """
+        🧮 حساب مؤشرات كل الرموز لكل إطار زمني دفعة واحدة (symbols × candles)
+        قبل حلقة الرموز؛ analyze_symbol يقرأ من هذه النتائج
+        """
+        for interval in self.analysis_intervals():
+            try:
+                klines_by_symbol = {
+                    symbol: self.market_data.get_kline_arrays(symbol, interval, limit=100)
+                    for symbol in symbols
+                }
+                for symbol, result in self.technical_indicators.analyze_batch(klines_by_symbol, interval).items():
+                    self.iteration_analysis[(symbol, interval)] = result
+            except Exception as e:
+                logger.error(f"Error preparing batched indicators for {interval}: {e}")
+    
+    def prepare_symbol(self, symbol):
+        """
+        ⚙️ مرحلة الجلب والتحليل لرمز واحد: لا تقرأ ولا تعدّل أي صفقة
+        (آمنة على ThreadPool) - تملأ iteration_analysis و iteration_features
+        وتسخّن بيانات الزخم، ثم يقرأ process_symbol منها
+        Returns: المدة بالثواني
+        """
+        started = time.time()
+        try:
+            for interval in self.analysis_intervals():
+                if (symbol, interval) not in self.iteration_analysis:
+                    result = self.analyze_symbol(symbol, interval)
+                    if result:
+                        self.iteration_analysis[(symbol, interval)] = result
+            
+            if self.regime_enabled:
+                with self.profiler.stage('klines'):
+                    self.market_data.get_kline_arrays(symbol, self.config['trading']['candle_interval'], limit=100)
+            
+            if self.swarm_enabled and self.swarm:
+                with self.profiler.stage('features'):
+                    self.iteration_features[symbol] = self.swarm_inputs(symbol)
+            
+            if self.momentum_enabled:
+                with self.profiler.stage('klines'):
+                    self.get_24h_data(symbol)
+                    self.calculate_btc_change_24h()
+                if self.custom_momentum.sentiment_weight > 0:
+                    with self.profiler.stage('sentiment'):
+                        self.sentiment_analyzer.get_sentiment_score(symbol)
+        except Exception as e:
+            logger.error(f"Error preparing {symbol}: {e}")
+        return time.time() - started
+    
+    def commit_symbol(self, symbol, prepare_seconds, ready_after):
+        """
+        🔒 مرحلة القرار على الخيط الرئيسي: كل تعديل للصفقات يمر عبر position_lock
+        (apply_signals ومراقب المخاطر وواجهات Flask)
+        """
+        logger.info(f"\n🔍 Analyzing {symbol}...")
+        started = time.time()
+        with self.profiler.stage('process_symbol'):
+            self.process_symbol(symbol)
+        if self.profiler.enabled:
+            self.profiler.record(f"symbol.{symbol}", prepare_seconds + time.time() - started)
+        self.symbol_durations[symbol] = {
+            'prepare_ms': round(prepare_seconds * 1000, 1),
+            'commit_ms': round((time.time() - started) * 1000, 1),
+            'ready_after_ms': round(ready_after * 1000, 1)
+        }
+    
+    def run_symbol_pipeline(self, symbols):
+        """
+        🧵 تحليل كل الرموز: بالتوازي على pipeline_executor إن كان مفعلاً،
+        وكل رمز يُلتزم فور جاهزيته فلا يؤخر رمز بطيء وقف الخسارة في الباقي
+        """
+        self.symbol_durations = {}
+        started = time.time()
+        
+        if self.pipeline_executor:
+            futures = {self.pipeline_executor.submit(self.prepare_symbol, symbol): symbol
+                       for symbol in symbols}
+            for future in as_completed(futures):
+                self.commit_symbol(futures[future], future.result(), time.time() - started)
+        else:
+            for symbol in symbols:
+                prepare_seconds = self.prepare_symbol(symbol)
+                self.commit_symbol(symbol, prepare_seconds, time.time() - started)
+        
+        bot_stats['symbol_durations'] = self.symbol_durations
+        if self.symbol_durations:
+            slowest = max(self.symbol_durations, key=lambda s: self.symbol_durations[s]['prepare_ms'])
+            logger.info(f"\n⏱️ Symbol pipeline: {len(self.symbol_durations)} symbols in {(time.time() - started) * 1000:.0f}ms "
+                        f"| slowest {slowest} ({self.symbol_durations[slowest]['prepare_ms']:.0f}ms prepare)")
+    
     def get_24h_data(self, symbol):
         """
         الحصول على بيانات 24 ساعة (volume avg, open price)
         Returns: (volume_avg, open_24h)
         """
         try:
-            klines = self.binance_client.get_historical_klines(symbol, '1h', limit=24)
-            if not klines or len(klines) < 2:
+            klines = self.market_data.get_kline_arrays(symbol, '1h', limit=24)
+            if klines is None or len(klines['close']) < 2:
                 return None, None
             
-            volumes = [float(candle[5]) for candle in klines]
-            volume_avg = sum(volumes) / len(volumes)
+            volume_avg = float(klines['volume'].mean())
             
-            open_24h = float(klines[0][1])
+            open_24h = float(klines['open'][0])
             
             return volume_avg, open_24h
         except Exception as e:
@@ -252,12 +524,12 @@ class BinanceTradingBot:
     def calculate_btc_change_24h(self):
         """حساب تغير سعر BTC خلال 24 ساعة"""
         try:
-            klines = self.binance_client.get_historical_klines('BTCUSDT', '1h', limit=24)
-            if not klines or len(klines) < 2:
+            klines = self.market_data.get_kline_arrays('BTCUSDT', '1h', limit=24)
+            if klines is None or len(klines['close']) < 2:
                 return None
             
-            open_price = float(klines[0][1])
-            close_price = float(klines[-1][4])
+            open_price = float(klines['open'][0])
+            close_price = float(klines['close'][-1])
             
             change_percent = ((close_price - open_price) / open_price) * 100
             return change_percent
@@ -313,87 +585,55 @@ class BinanceTradingBot:
             if not indicators:
                 return
             
-            current_price = indicators['close']
-            
             market_regime = 'sideways'
             regime_reason = 'Not detected'
             if self.regime_enabled:
                 timeframe = self.config['trading']['candle_interval']
-                klines = self.binance_client.get_historical_klines(symbol, timeframe, limit=100)
-                market_regime, regime_reason = self.market_regime.detect_regime(indicators, klines)
-                self.trading_strategy.adapt_to_regime(market_regime, regime_reason)
+                klines = self.market_data.get_kline_arrays(symbol, timeframe, limit=100)
+                with self.profiler.stage('regime'):
+                    market_regime, regime_reason = self.market_regime.detect_regime(indicators, klines)
+                # العتبات يقرؤها مراقب المخاطر تحت position_lock: التعديل تحته أيضاً
+                with self.position_lock:
+                    self.trading_strategy.adapt_to_regime(market_regime, regime_reason)
+                    rsi_oversold = self.trading_strategy.rsi_oversold
+                    stoch_oversold = self.trading_strategy.stoch_oversold
                 
                 if self.swarm_enabled and self.swarm:
-                    self.swarm.set_regime_adjustments(
-                        rsi_oversold=self.trading_strategy.rsi_oversold,
-                        stoch_oversold=self.trading_strategy.stoch_oversold
-                    )
+                    self.swarm.set_regime_adjustments(rsi_oversold=rsi_oversold, stoch_oversold=stoch_oversold)
             
             swarm_vote = self.get_swarm_decision(symbol, indicators)
             
+            # 🔒 الجزء الذي يقرأ/يعدّل الصفقات فقط تحت القفل - حلقة المخاطر لا تنتظر التحليل
+            with self.profiler.stage('apply_signals'), self.position_lock:
+                self.apply_signals(symbol, indicators, prev_indicators, short_trend, medium_trend, long_trend,
+                                   market_regime, swarm_vote)
+            
+        except Exception as e:
+            logger.error(f"Error processing {symbol}: {e}")
+    
+    def apply_signals(self, symbol, indicators, prev_indicators, short_trend, medium_trend, long_trend,
+                      market_regime, swarm_vote):
+        """قرارات الدخول/الخروج لرمز واحد بعد التحليل (يُستدعى تحت position_lock)"""
+        try:
+            current_price = indicators['close']
+            
             position = self.risk_manager.get_position(symbol)
             
             if position and position.get('status') == 'open':
+                if self.check_price_exits(symbol, position, current_price, indicators):
+                    return
+                
                 entry_price = position['entry_price']
                 position_type = position.get('position_type', 'SPOT')
                 
-                if self.futures_enabled and position_type in ['LONG', 'SHORT']:
-                    self.risk_manager.update_futures_trailing_stop(symbol, current_price)
-                    
-                    should_exit, exit_reason, profit_pct = self.strategy_coordinator.check_exit_signal(
-                        symbol, position, current_price, indicators
-                    )
-                    
-                    if should_exit:
-                        logger.info(f"💵 Closing {position_type} {symbol} at ${current_price:.2f} ({exit_reason})")
-                        closed_position = self.risk_manager.close_futures_position(symbol, current_price, exit_reason)
-                        if closed_position:
-                            self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], exit_reason)
-                            self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, exit_reason)
-                else:
-                    self.risk_manager.update_trailing_stop(symbol, current_price)
-                    
-                    if self.risk_manager.check_trailing_stop(symbol, current_price):
-                        logger.warning(f"🛑 TRAILING STOP triggered for {symbol}")
-                        order = self.binance_client.create_market_order(
-                            symbol=symbol,
-                            side='SELL',
-                            quantity=position['quantity']
-                        )
-                        if order:
-                            self.risk_manager.close_position(symbol, current_price, "TRAILING_STOP")
-                            self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], "TRAILING_STOP")
-                            self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, "TRAILING_STOP")
-                        return
-                    
-                    if self.trading_strategy.should_stop_loss(current_price, entry_price, position):
-                        logger.warning(f"🛑 STOP LOSS triggered for {symbol}")
-                        order = self.binance_client.create_market_order(
-                            symbol=symbol,
-                            side='SELL',
-                            quantity=position['quantity']
-                        )
-                        if order:
-                            self.risk_manager.close_position(symbol, current_price, "STOP_LOSS")
-                            self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], "STOP_LOSS")
-                            self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, "STOP_LOSS")
-                        return
-                    
+                if not (self.futures_enabled and position_type in ['LONG', 'SHORT']):
                     sell_signal, signals, reason = self.trading_strategy.check_sell_signal(
                         indicators, entry_price, prev_indicators, market_regime, position
                     )
                     
                     if sell_signal:
                         logger.info(f"💵 Selling {symbol} at ${current_price:.2f}")
-                        order = self.binance_client.create_market_order(
-                            symbol=symbol,
-                            side='SELL',
-                            quantity=position['quantity']
-                        )
-                        if order:
-                            self.risk_manager.close_position(symbol, current_price, reason)
-                            self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], reason)
-                            self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, reason)
+                        self.close_spot_position(symbol, position, current_price, reason)
             
             else:
                 logger.info(f"   📊 RSI: {indicators['rsi']:.1f} | Stoch: {indicators['stoch_k']:.1f} | "
@@ -410,9 +650,10 @@ class BinanceTradingBot:
                         volume_24h_avg, symbol_open_24h = self.get_24h_data(symbol)
                         btc_change_24h = self.calculate_btc_change_24h()
                         
-                        momentum_index, momentum_components = self.custom_momentum.compute(
-                            symbol, indicators, volume_24h_avg=volume_24h_avg, btc_change_24h=btc_change_24h, symbol_open_24h=symbol_open_24h
-                        )
+                        with self.profiler.stage('momentum'):
+                            momentum_index, momentum_components = self.custom_momentum.compute(
+                                symbol, indicators, volume_24h_avg=volume_24h_avg, btc_change_24h=btc_change_24h, symbol_open_24h=symbol_open_24h
+                            )
                         
                         if momentum_index is not None:
                             self.symbol_momentum_cache[symbol] = momentum_index
@@ -487,77 +728,80 @@ class BinanceTradingBot:
                         buy_signal = False
                 
                 if buy_signal and self.risk_manager.can_open_position(symbol):
-                    if self.futures_enabled and self.strategy_coordinator:
-                        allowed_strategies = self.strategy_coordinator.get_allowed_strategies(market_regime)
-                        position_opened = False
-                        
-                        indicators_for_strategy = indicators.copy()
-                        indicators_for_strategy['stochastic'] = indicators.get('stoch_k')
-                        indicators_for_strategy['current_price'] = current_price
+                    position_opened = False
+                    try:
+                        if self.futures_enabled and self.strategy_coordinator:
+                            allowed_strategies = self.strategy_coordinator.get_allowed_strategies(market_regime)
                         
-                        if 'LONG' in allowed_strategies:
-                            should_long, long_reason = self.strategy_coordinator.long_strategy.check_entry_signal(
-                                symbol, indicators_for_strategy, market_regime, {
-                                    'short_trend': short_trend,
-                                    'medium_trend': medium_trend,
-                                    'long_trend': long_trend
-                                }
-                            )
+                            if 'LONG' in allowed_strategies:
+                                should_long, long_reason = self.strategy_coordinator.long_strategy.check_entry_signal(
+                                    symbol, indicators, market_regime, {
+                                        'short_trend': short_trend,
+                                        'medium_trend': medium_trend,
+                                        'long_trend': long_trend
+                                    }
+                                )
                             
-                            if not should_long:
-                                logger.info(f"   ⏭️ LONG strategy rejected: {long_reason}")
+                                if not should_long:
+                                    logger.info(f"   ⏭️ LONG strategy rejected: {long_reason}")
                             
-                            if should_long:
-                                quantity = self.risk_manager.calculate_futures_position_size(symbol, current_price)
-                                if quantity > 0:
-                                    success = self.risk_manager.open_futures_position(
-                                        symbol=symbol,
-                                        entry_price=current_price,
-                                        quantity=quantity,
-                                        position_type='LONG',
-                                        signals=signals,
-                                        market_regime=market_regime
-                                    )
-                                    if success:
-                                        position_opened = True
-                                        self.telegram.notify_buy(symbol, current_price, quantity, signals)
+                                if should_long:
+                                    quantity = self.risk_manager.calculate_futures_position_size(symbol, current_price)
+                                    if quantity > 0:
+                                        success = self.risk_manager.open_futures_position(
+                                            symbol=symbol,
+                                            entry_price=current_price,
+                                            quantity=quantity,
+                                            position_type='LONG',
+                                            signals=signals,
+                                            market_regime=market_regime
+                                        )
+                                        if success:
+                                            position_opened = True
+                                            self.telegram.notify_buy(symbol, current_price, quantity, signals)
                         
-                        if not position_opened and 'SHORT' in allowed_strategies:
-                            should_short, short_reason = self.strategy_coordinator.short_strategy.check_entry_signal(
-                                symbol, indicators_for_strategy, market_regime, {
-                                    'short_trend': short_trend,
-                                    'medium_trend': medium_trend,
-                                    'long_trend': long_trend
-                                }
-                            )
+                            if not position_opened and 'SHORT' in allowed_strategies:
+                                should_short, short_reason = self.strategy_coordinator.short_strategy.check_entry_signal(
+                                    symbol, indicators, market_regime, {
+                                        'short_trend': short_trend,
+                                        'medium_trend': medium_trend,
+                                        'long_trend': long_trend
+                                    }
+                                )
                             
-                            if should_short:
-                                quantity = self.risk_manager.calculate_futures_position_size(symbol, current_price)
-                                if quantity > 0:
-                                    success = self.risk_manager.open_futures_position(
-                                        symbol=symbol,
-                                        entry_price=current_price,
-                                        quantity=quantity,
-                                        position_type='SHORT',
-                                        signals=signals,
-                                        market_regime=market_regime
-                                    )
-                                    if success:
-                                        position_opened = True
-                                        self.telegram.notify_buy(symbol, current_price, quantity, signals)
-                    else:
-                        quantity = self.risk_manager.calculate_position_size(symbol, current_price)
+                                if should_short:
+                                    quantity = self.risk_manager.calculate_futures_position_size(symbol, current_price)
+                                    if quantity > 0:
+                                        success = self.risk_manager.open_futures_position(
+                                            symbol=symbol,
+                                            entry_price=current_price,
+                                            quantity=quantity,
+                                            position_type='SHORT',
+                                            signals=signals,
+                                            market_regime=market_regime
+                                        )
+                                        if success:
+                                            position_opened = True
+                                            self.telegram.notify_buy(symbol, current_price, quantity, signals)
+                        else:
+                            quantity = self.risk_manager.calculate_position_size(symbol, current_price)
                         
-                        if quantity > 0:
-                            logger.info(f"💸 Buying {symbol} at ${current_price:.2f}")
-                            order = self.binance_client.create_market_order(
-                                symbol=symbol,
-                                side='BUY',
-                                quantity=quantity
-                            )
-                            if order:
-                                self.risk_manager.open_position(symbol, current_price, quantity, signals)
-                                self.telegram.notify_buy(symbol, current_price, quantity, signals)
+                            if quantity > 0:
+                                logger.info(f"💸 Buying {symbol} at ${current_price:.2f}")
+                                order = self.binance_client.create_market_order(
+                                    symbol=symbol,
+                                    side='BUY',
+                                    quantity=quantity
+                                )
+                                if order:
+                                    self.risk_manager.open_position(symbol, current_price, quantity, signals,
+                                                                    market_regime=self.trading_strategy.current_regime)
+                                    position_opened = True
+                                    self.telegram.notify_buy(symbol, current_price, quantity, signals)
+                    finally:
+                        # مقعد الدفتر المحجوز لا يُستهلك إلا بفتح صفقة: أي مسار آخر يحرره فوراً لبقية الـ Shards
+                        if self.shard and not position_opened:
+                            self.risk_manager.release(symbol)
                 elif not buy_signal:
                     reasons = []
                     rsi_threshold = self.trading_strategy.rsi_oversold
@@ -581,7 +825,169 @@ class BinanceTradingBot:
                         logger.info(f"   ⏭️ No buy: {', '.join(reasons)}")
         
         except Exception as e:
-            logger.error(f"Error processing {symbol}: {e}")
+            logger.error(f"Error applying signals for {symbol}: {e}")
+    
+    def check_price_exits(self, symbol, position, current_price, indicators):
+        """
+        🛡️ قواعد الخروج السعرية لصفقة مفتوحة (Trailing Stop / Stop Loss / Take Profit / خروج العقود)
+        مشتركة بين apply_signals و RiskMonitor ومهمة المخاطر المجدولة
+        Returns: True إذا انتهت معالجة الصفقة في هذه الدورة
+        """
+        if not self.exit_allowed(symbol):
+            return True
+        
+        entry_price = position['entry_price']
+        position_type = position.get('position_type', 'SPOT')
+        
+        if self.futures_enabled and position_type in ['LONG', 'SHORT']:
+            self.risk_manager.update_futures_trailing_stop(symbol, current_price)
+            
+            should_exit, exit_reason, profit_pct = self.strategy_coordinator.check_exit_signal(
+                symbol, position, current_price, indicators
+            )
+            
+            if should_exit:
+                logger.info(f"💵 Closing {position_type} {symbol} at ${current_price:.2f} ({exit_reason})")
+                closed_position = self.submit_exit(
+                    symbol, lambda: self.risk_manager.close_futures_position(symbol, current_price, exit_reason)
+                )
+                if closed_position:
+                    self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], exit_reason)
+                    self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, exit_reason)
+            return True
+        
+        self.risk_manager.update_trailing_stop(symbol, current_price)
+        
+        if self.risk_manager.check_trailing_stop(symbol, current_price):
+            logger.warning(f"🛑 TRAILING STOP triggered for {symbol}")
+            self.close_spot_position(symbol, position, current_price, "TRAILING_STOP")
+            return True
+        
+        if self.trading_strategy.should_stop_loss(current_price, entry_price, position):
+            logger.warning(f"🛑 STOP LOSS triggered for {symbol}")
+            self.close_spot_position(symbol, position, current_price, "STOP_LOSS")
+            return True
+        
+        if self.trading_strategy.should_take_profit(current_price, entry_price, position):
+            logger.info(f"🎯 TAKE PROFIT reached for {symbol}")
+            self.close_spot_position(symbol, position, current_price, "TAKE_PROFIT")
+            return True
+        
+        return False
+    
+    def exit_allowed(self, symbol):
+        """لا خروج جديد لرمز أمره في الطيران أو فشل أمره قبل أقل من exit_retry_seconds"""
+        return symbol not in self.exits_in_flight and time.time() >= self.exit_retry_after.get(symbol, 0)
+    
+    def exit_ledger(self):
+        """دفتر الصفقات المشترك بين العمليات (وكيل في العامل، كائن محلي في المنسق)"""
+        if self.shard:
+            return self.risk_manager
+        if self.sharding:
+            return self.sharding.ledger
+        return None
+    
+    def submit_exit(self, symbol, close):
+        """
+        ينفذ close() (أمر الخروج) مع علم in-flight للرمز
+        مع الـ Sharding يأخذ claim_exit من الدفتر أولاً فلا تبيع عمليتان نفس الصفقة
+        عند الفشل يؤجل المحاولة التالية بدل أمر جديد مع كل تحديث سعر
+        """
+        ledger = self.exit_ledger()
+        if ledger and not ledger.claim_exit(symbol):
+            logger.info(f"⏭️ Exit for {symbol} already claimed or closed by another process")
+            return None
+        
+        self.exits_in_flight.add(symbol)
+        try:
+            result = close()
+        finally:
+            self.exits_in_flight.discard(symbol)
+            if ledger:
+                ledger.release_exit(symbol)
+        
+        if result:
+            self.exit_retry_after.pop(symbol, None)
+        else:
+            self.exit_retry_after[symbol] = time.time() + self.exit_retry_seconds
+            logger.warning(f"⚠️ Exit order for {symbol} failed - next attempt in {self.exit_retry_seconds}s")
+        return result
+    
+    def close_spot_position(self, symbol, position, current_price, reason):
+        """أمر SELL بكامل الكمية ثم إغلاق الصفقة (داخل claim الخروج) وتسجيلها"""
+        def sell_and_close():
+            order = self.binance_client.create_market_order(
+                symbol=symbol,
+                side='SELL',
+                quantity=position['quantity']
+            )
+            if order:
+                self.risk_manager.close_position(symbol, current_price, reason)
+            return order
+        
+        order = self.submit_exit(symbol, sell_and_close)
+        if order:
+            entry_price = position['entry_price']
+            self.stats.record_trade(symbol, entry_price, current_price, position['quantity'], reason)
+            self.telegram.notify_sell(symbol, current_price, position['quantity'], entry_price, reason)
+        return order
+    
+    def run_risk_checks(self):
+        """
+        ⚡ مهمة المخاطر عالية التردد: قواعد الخروج السعرية لكل الصفقات المفتوحة
+        على لقطة الأسعار فقط، بدون شموع أو تصويت (المؤشرات من آخر شمعة محللة)
+        """
+        if not trading_enabled:
+            return
+        
+        with self.position_lock:
+            open_positions = self.risk_manager.get_open_positions()
+            if not open_positions:
+                return
+            
+            snapshot = self.price_snapshot.get_snapshot(priority=PRIORITY_STOP_CHECK)
+            for symbol, position in open_positions.items():
+                try:
+                    current_price = self.price_snapshot.get_price(symbol, snapshot, priority=PRIORITY_STOP_CHECK)
+                    if current_price:
+                        self.check_price_exits(symbol, position, current_price, self.prev_indicators.get(symbol) or {})
+                except Exception as e:
+                    logger.error(f"Error in risk check for {symbol}: {e}")
+    
+    def evaluate_quote(self, symbol, bid, ask):
+        """
+        ⚡ تقييم قواعد الخروج لرمز واحد فور تغير سعره (من RiskMonitor)
+        الخروج من LONG/SPOT يُنفذ على bid ومن SHORT على ask
+        """
+        if not trading_enabled:
+            return
+        
+        position = self.risk_manager.get_position(symbol)
+        if not position or position.get('status') != 'open':
+            return
+        
+        with self.position_lock:
+            position = self.risk_manager.get_position(symbol)
+            if not position or position.get('status') != 'open':
+                return
+            
+            price = ask if position.get('position_type') == 'SHORT' else bid
+            self.check_price_exits(symbol, position, price, self.prev_indicators.get(symbol) or {})
+    
+    def wait_for_scheduled_symbols(self):
+        """
+        ⏰ ينتظر المهمة المجدولة التالية: يشغّل فحص المخاطر إن استحق
+        ويعيد الرموز التي أُغلقت شمعة أحد أطرها
+        """
+        due = set(self.scheduler.wait_for_due())
+        if RISK_JOB in due and trading_enabled:
+            self.run_risk_checks()
+        
+        # كل شمعة تُغلق قبل هذه اللحظة بتوقيت الخادم؛ ما بعدها فُتح للتو ولا يدخل التحليل
+        self.close_cutoff_ms = self.scheduler.now_ms()
+        intervals = self.analysis_intervals()
+        return [symbol for symbol in self.trading_pairs
+                if any((symbol, interval) in due for interval in intervals)]
     
     def resolve_pending_outcomes(self):
         """حل نتائج الإشارات بعد ساعة واحدة"""
@@ -591,13 +997,16 @@ class BinanceTradingBot:
         current_time = time.time()
         resolved_indices = []
         failed_count = 0
+        snapshot = None
         
         for idx, pending in enumerate(self.pending_resolutions):
             time_elapsed = current_time - pending['timestamp']
             
             if time_elapsed >= 3600:
                 try:
-                    current_price = self.binance_client.get_symbol_price(pending['symbol'])
+                    if snapshot is None:
+                        snapshot = self.price_snapshot.get_snapshot()
+                    current_price = self.price_snapshot.get_price(pending['symbol'], snapshot)
                     
                     if current_price:
                         self.performance_tracker.resolve_outcome(
@@ -637,56 +1046,40 @@ class BinanceTradingBot:
             return None
         
         try:
-            macd_data = indicators['macd']
-            if isinstance(macd_data, dict):
-                macd_dict = macd_data
+            prepared = self.iteration_features.get(symbol)
+            features, variants = prepared if prepared else self.swarm_inputs(symbol)
+            if features:
+                market_data = features
             else:
-                macd_dict = {'macd': float(macd_data), 'signal': 0, 'histogram': 0}
+                market_data = self.legacy_swarm_market_data(indicators)
             
-            market_data = {
-                'price': float(indicators['close']),
-                'rsi': float(indicators['rsi']),
-                'macd': macd_dict,
-                'stoch_k': float(indicators.get('stoch_k', 50)),
-                'bb_lower': float(indicators['bb_lower']),
-                'bb_upper': float(indicators['bb_upper']),
-                'ema_9': float(indicators.get('ema_9', indicators['close'])),
-                'ema_21': float(indicators.get('ema_21', indicators['close'])),
-                'ema_50': float(indicators.get('ema_50', indicators['close'])),
-                'ema_200': float(indicators.get('ema_200', indicators['close'])),
-                'sma_20': float(indicators.get('sma_20', indicators['close'])),
-                'volume_ratio': float(indicators.get('volume_ratio', 1.0)),
-                'price_change_pct': float(indicators.get('price_change', 0)),
-                'adx': float(indicators.get('adx', 25)),
-                'atr': float(indicators.get('atr', 0)),
-                'atr_avg': float(indicators.get('atr_avg', 1)),
-                'bb_width': float(indicators.get('bb_width', 0)),
-                'high_20': float(indicators.get('high_20', indicators['close'])),
-                'low_20': float(indicators.get('low_20', indicators['close'])),
-                'rate_of_change': float(indicators.get('rate_of_change', 0))
-            }
-            
-            vote = self.swarm.conduct_vote(symbol, market_data)
+            with self.profiler.stage('swarm_vote'):
+                vote = self.swarm.conduct_vote(symbol, market_data, variants)
             
             if self.db:
-                self.db.save_swarm_vote(vote)
+                with self.profiler.stage('db_insert'):
+                    self.db.save_swarm_vote(vote)
             
             if self.swarm_enabled and self.config.get('swarm_intelligence', {}).get('paper_trading_enabled', True):
-                current_price = indicators['close']
-                self.swarm.run_paper_trading_cycle(symbol, market_data)
+                with self.profiler.stage('paper_trading'):
+                    self.swarm.run_paper_trading_cycle(symbol, market_data, variants)
             
             if self.causal_enabled and self.causal_engine:
-                technical_signals = {
-                    'rsi': indicators['rsi'],
-                    'stochastic': indicators['stoch_k'],
-                    'macd': macd_dict.get('macd', 0),
-                    'bb_position': (indicators['close'] - indicators['bb_lower']) / (indicators['bb_upper'] - indicators['bb_lower']),
-                    'volume_ratio': market_data['volume_ratio'],
-                    'price_change': market_data['price_change_pct'],
-                    'ema_alignment': 1 if indicators['close'] > indicators.get('ema_50', 0) else 0
-                }
+                if features:
+                    technical_signals = causal_signals(features)
+                else:
+                    technical_signals = {
+                        'rsi': indicators['rsi'],
+                        'stochastic': indicators['stoch_k'],
+                        'macd': float(indicators['macd']),
+                        'bb_position': (indicators['close'] - indicators['bb_lower']) / (indicators['bb_upper'] - indicators['bb_lower']),
+                        'volume_ratio': market_data['volume_ratio'],
+                        'price_change': market_data['price_change_pct'],
+                        'ema_alignment': 1 if indicators['close'] > indicators.get('ema_50', 0) else 0
+                    }
                 
-                causal_vote = self.causal_engine.get_causal_recommendation(vote, technical_signals)
+                with self.profiler.stage('causal'):
+                    causal_vote = self.causal_engine.get_causal_recommendation(vote, technical_signals)
                 
                 logger.info(f"   🧠 Causal Analysis: {causal_vote['decision']} "
                           f"(Confidence: {causal_vote['confidence']:.1f}%, "
@@ -700,24 +1093,138 @@ class BinanceTradingBot:
             logger.error(f"Swarm decision error: {e}")
             return None
     
+    def swarm_inputs(self, symbol):
+        """(متجه الميزات, متغيرات IndicatorBank أو None) لرمز واحد"""
+        klines, features = self.build_features(symbol)
+        variants = None
+        if features and self.indicator_bank:
+            variants = self.indicator_bank.variants(klines, features)
+        return features, variants
+    
+    def build_features(self, symbol):
+        """(klines, متجه الميزات الكامل FEATURE_SCHEMA) لإطار السرب؛ الميزات None عند الفشل"""
+        klines = self.market_data.get_kline_arrays(symbol, self.feature_interval,
+                                                   limit=self.feature_builder.required_candles)
+        if klines is None:
+            return None, None
+        return klines, self.feature_builder.build(klines)
+    
+    def legacy_swarm_market_data(self, indicators):
+        """مدخلات السرب من قيم المؤشرات فقط عند تعذر بناء متجه الميزات"""
+        macd_data = indicators['macd']
+        if isinstance(macd_data, dict):
+            macd_dict = macd_data
+        else:
+            macd_dict = {
+                'macd': float(macd_data),
+                'signal': float(indicators.get('macd_signal', 0)),
+                'histogram': float(indicators.get('macd_hist', 0))
+            }
+        
+        return {
+            'price': float(indicators['close']),
+            'rsi': float(indicators['rsi']),
+            'macd': macd_dict,
+            'stoch_k': float(indicators.get('stoch_k', 50)),
+            'bb_lower': float(indicators['bb_lower']),
+            'bb_upper': float(indicators['bb_upper']),
+            'ema_9': float(indicators.get('ema_9', indicators['close'])),
+            'ema_21': float(indicators.get('ema_21', indicators['close'])),
+            'ema_50': float(indicators.get('ema_50', indicators['close'])),
+            'ema_200': float(indicators.get('ema_200', indicators['close'])),
+            'sma_20': float(indicators.get('sma_20', indicators['close'])),
+            'volume_ratio': float(indicators.get('volume_ratio', 1.0)),
+            'price_change_pct': float(indicators.get('price_change', 0)),
+            'adx': float(indicators.get('adx', 25)),
+            'atr': float(indicators.get('atr', 0)),
+            'atr_avg': float(indicators.get('atr_avg', 1)),
+            'bb_width': float(indicators.get('bb_width', 0)),
+            'high_20': float(indicators.get('high_20', indicators['close'])),
+            'low_20': float(indicators.get('low_20', indicators['close'])),
+            'rate_of_change': float(indicators.get('rate_of_change', 0))
+        }
+    
     def display_status(self):
         open_positions = self.risk_manager.get_open_positions()
         
         if open_positions:
             logger.info("\n📊 Open Positions:")
+            snapshot = self.price_snapshot.get_snapshot()
             for symbol, position in open_positions.items():
-                current_price = self.binance_client.get_symbol_price(symbol)
+                current_price = self.price_snapshot.get_price(symbol, snapshot)
                 if current_price:
                     profit_pct = ((current_price - position['entry_price']) / position['entry_price']) * 100
                     logger.info(f"  {symbol}: Entry ${position['entry_price']:.2f} | "
                               f"Current ${current_price:.2f} | P/L: {profit_pct:+.2f}%")
         else:
             logger.info("\n📊 No open positions")
+        
+        for name, budget in get_rate_limit_stats().items():
+            deferred = sum(budget['deferred'].values())
+            if budget['weight_consumed'] or deferred:
+                logger.info(f"⚖️ {name} weight: {budget['used_weight']:.0f}/{budget['max_weight_per_minute']} "
+                            f"({budget['usage_pct']:.0f}%) | deferred: {deferred}")
+        
+        if self.technical_indicators.streaming_engine:
+            engine = self.technical_indicators.streaming_engine.get_stats()
+            logger.info(f"⚡ Indicator engine: {engine['series']} series | {engine['candles_committed']} candles committed "
+                        f"| {engine['reseeds']} reseeds")
+        
+        if self.technical_indicators.result_cache:
+            cache = self.technical_indicators.result_cache.get_stats()
+            ratios = " | ".join(f"{interval} {stats['hit_ratio']:.0%}" for interval, stats in cache['intervals'].items())
+            logger.info(f"🗃️ Indicator cache: {cache['hits']} hits / {cache['misses']} misses "
+                        f"({cache['hit_ratio']:.0%}){' | ' + ratios if ratios else ''}")
+        
+        if self.risk_monitor:
+            monitor = self.risk_monitor.get_stats()
+            logger.info(f"🛡️ Risk monitor: {monitor['evaluations']} evaluations | {monitor['polls']} polls | "
+                        f"latency avg {monitor['avg_latency_ms']:.1f}ms / max {monitor['max_latency_ms']:.1f}ms")
+        
+        if self.profiler.enabled:
+            slowest = sorted(self.profiler.last_iteration.items(), key=lambda item: item[1], reverse=True)
+            slowest = [(name, ms) for name, ms in slowest if name != 'iteration' and not name.startswith('symbol.')]
+            breakdown = " | ".join(f"{name} {ms:.0f}ms" for name, ms in slowest[:8])
+            logger.info(f"⏱️ Iteration stages: {breakdown}")
+        
+        if self.sharding:
+            sharding = self.sharding.get_stats()
+            alive = sum(1 for shard in sharding['shards'].values() if shard['alive'])
+            restarts = sum(shard['restarts'] for shard in sharding['shards'].values())
+            logger.info(f"🧩 Shards: {alive}/{len(sharding['shards'])} alive | restarts: {restarts} | "
+                        f"pending entries: {len(sharding['ledger']['pending']) if sharding['ledger'] else 0}")
+        
+        if self.scheduler:
+            scheduler = self.scheduler.get_stats()
+            fired = " | ".join(f"{group} {count}" for group, count in scheduler['fired'].items())
+            logger.info(f"⏰ Scheduler: clock offset {scheduler['clock_offset_ms']:+.0f}ms | "
+                        f"max lateness {scheduler['max_lateness_ms']:.0f}ms | fired: {fired}")
+    
+    def run_coordinator(self):
+        """
+        🧩 وضع المنسق: يخدم دفتر الصفقات لعمليات الـ Shards ويزامن الحساب
+        ويعيد تشغيل أي عامل يتوقف؛ التحليل كله في العمال
+        """
+        self.sharding.serve(self.risk_manager, self.stats, self.position_lock, lambda: trading_enabled)
+        self.sharding.start_workers(self.trading_pairs, self.config_file)
+        
+        while True:
+            bot_stats['last_check'] = datetime.now().isoformat()
+            
+            with self.position_lock:
+                self.risk_manager.sync_positions_with_binance()
+            
+            self.sharding.supervise()
+            self.display_status()
+            time.sleep(self.sharding.supervise_interval_seconds)
     
     def run(self):
         global bot_stats
         logger.info("\n🚀 Bot is now running...")
-        logger.info(f"Checking markets every {self.check_interval} seconds\n")
+        if self.scheduler:
+            logger.info(f"Analyzing on every {', '.join(self.analysis_intervals())} candle close\n")
+        else:
+            logger.info(f"Checking markets every {self.check_interval} seconds\n")
         
         bot_stats['status'] = 'running'
         bot_stats['start_time'] = datetime.now().isoformat()
@@ -726,14 +1233,29 @@ class BinanceTradingBot:
         
         self.display_account_info()
         
+        if self.risk_monitor:
+            self.risk_monitor.start()
+        
         iteration = 0
         try:
+            if self.sharding:
+                self.run_coordinator()
+            
             while True:
+                due_symbols = self.trading_pairs
+                if self.scheduler:
+                    due_symbols = self.wait_for_scheduled_symbols()
+                    if not due_symbols:
+                        continue
+                
                 iteration += 1
                 bot_stats['iterations'] = iteration
                 bot_stats['last_check'] = datetime.now().isoformat()
                 
                 global trading_enabled
+                if self.shard:
+                    # الإيقاف/التشغيل يأتي من واجهة المنسق
+                    trading_enabled = self.risk_manager.is_trading_enabled()
                 if not trading_enabled:
                     bot_stats['status'] = 'paused'
                     logger.warning("⏸️  التداول متوقف - في وضع الانتظار")
@@ -746,24 +1268,51 @@ class BinanceTradingBot:
                 logger.info(f"🔄 Iteration #{iteration} - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
                 logger.info(f"{'='*80}")
                 
-                # Real-Time Account Sync - تحقق من حساب Binance قبل أي شيء
-                self.risk_manager.sync_positions_with_binance()
+                self.profiler.begin_iteration()
+                iteration_started = time.perf_counter()
+                self.market_data.begin_iteration(iteration, closed_before_ms=self.close_cutoff_ms)
+                with self.profiler.stage('prefetch'):
+                    self.market_data.prefetch(
+                        [request for request in self.kline_requests
+                         if request[0] in due_symbols or request[0] not in self.trading_pairs],
+                        price_service=self.price_snapshot
+                    )
+                self.iteration_analysis = {}
+                self.iteration_features = {}
+                if self.batch_indicators_enabled:
+                    with self.profiler.stage('batch_indicators'):
+                        self.prepare_batch_indicators(due_symbols)
+                
+                # Real-Time Account Sync - تحقق من حساب Binance قبل أي شيء (المنسق يتولاها في وضع Shards)
+                if not self.shard:
+                    with self.profiler.stage('account_sync'):
+                        self.risk_manager.sync_positions_with_binance()
                 
                 if self.weaver_enabled:
-                    self.resolve_pending_outcomes()
+                    with self.profiler.stage('resolve_outcomes'):
+                        self.resolve_pending_outcomes()
+                
+                with self.profiler.stage('symbol_pipeline'):
+                    self.run_symbol_pipeline(due_symbols)
                 
-                for symbol in self.trading_pairs:
-                    logger.info(f"\n🔍 Analyzing {symbol}...")
-                    self.process_symbol(symbol)
+                self.market_data.end_iteration()
+                if self.profiler.enabled:
+                    self.profiler.record('iteration', time.perf_counter() - iteration_started)
+                    self.profiler.end_iteration()
                 
                 self.display_status()
                 
                 
-                logger.info(f"\n⏸️  Waiting {self.check_interval} seconds until next check...")
-                time.sleep(self.check_interval)
+                if self.scheduler:
+                    logger.info(f"\n⏰ Next candle close in {self.scheduler.seconds_until(self.analysis_intervals()[0]):.0f}s")
+                else:
+                    logger.info(f"\n⏸️  Waiting {self.check_interval} seconds until next check...")
+                    time.sleep(self.check_interval)
                 
         except KeyboardInterrupt:
             logger.info("\n\n🛑 Bot stopped by user")
+            if self.sharding:
+                self.sharding.stop()
             bot_stats['status'] = 'stopped'
             self.display_status()
             logger.info("\n👋 Goodbye!")
@@ -795,8 +1344,9 @@ def get_status():
         positions_raw = bot_instance.risk_manager.get_open_positions()
         
         positions_enriched = {}
+        snapshot = bot_instance.price_snapshot.get_snapshot()
         for symbol, pos in positions_raw.items():
-            current_price = bot_instance.binance_client.get_symbol_price(symbol)
+            current_price = bot_instance.price_snapshot.get_price(symbol, snapshot)
             entry_price = pos.get('entry_price', 0)
             position_type = pos.get('position_type', 'SPOT')
             leverage = pos.get('leverage', 1)
@@ -957,87 +1507,101 @@ def sell_all_positions():
         return jsonify({'success': False, 'error': 'Bot not initialized'}), 400
     
     try:
-        positions = bot_instance.risk_manager.get_open_positions()
+        with bot_instance.position_lock:
+            positions = bot_instance.risk_manager.get_open_positions()
         
-        if not positions:
-            return jsonify({'success': True, 'message': 'No open positions to sell', 'sold': 0})
+            if not positions:
+                return jsonify({'success': True, 'message': 'No open positions to sell', 'sold': 0})
         
-        results = []
-        sold_count = 0
-        failed_count = 0
+            results = []
+            sold_count = 0
+            failed_count = 0
+            snapshot = bot_instance.price_snapshot.get_snapshot()
         
-        for symbol, position in positions.items():
-            try:
-                current_price = bot_instance.binance_client.get_symbol_price(symbol)
-                quantity = position.get('quantity', 0)
-                entry_price = position.get('entry_price', 0)
+            ledger = bot_instance.exit_ledger()
+            for symbol, position in positions.items():
+                if ledger and not ledger.claim_exit(symbol):
+                    results.append({
+                        'symbol': symbol,
+                        'success': False,
+                        'error': 'Exit already in progress in another process'
+                    })
+                    failed_count += 1
+                    continue
+                try:
+                    current_price = bot_instance.price_snapshot.get_price(symbol, snapshot)
+                    quantity = position.get('quantity', 0)
+                    entry_price = position.get('entry_price', 0)
                 
-                if current_price and quantity > 0:
-                    profit_pct = ((current_price - entry_price) / entry_price) * 100 if entry_price else 0
+                    if current_price and quantity > 0:
+                        profit_pct = ((current_price - entry_price) / entry_price) * 100 if entry_price else 0
                     
-                    logger.info(f"🔴 MANUAL SELL ALL: Selling {symbol} at {profit_pct:.2f}% profit")
+                        logger.info(f"🔴 MANUAL SELL ALL: Selling {symbol} at {profit_pct:.2f}% profit")
                     
-                    order = bot_instance.binance_client.create_market_order(symbol, 'SELL', quantity)
+                        order = bot_instance.binance_client.create_market_order(symbol, 'SELL', quantity)
                     
-                    if order is None:
-                        results.append({
-                            'symbol': symbol,
-                            'success': False,
-                            'error': 'Order creation failed or rejected by exchange'
-                        })
-                        failed_count += 1
-                        logger.warning(f"⚠️ {symbol} sell order creation failed")
-                    elif order.get('status') == 'FILLED':
-                        bot_instance.risk_manager.close_position(
-                            symbol, 
-                            current_price, 
-                            "MANUAL_SELL_ALL"
-                        )
+                        if order is None:
+                            results.append({
+                                'symbol': symbol,
+                                'success': False,
+                                'error': 'Order creation failed or rejected by exchange'
+                            })
+                            failed_count += 1
+                            logger.warning(f"⚠️ {symbol} sell order creation failed")
+                        elif order.get('status') == 'FILLED':
+                            bot_instance.risk_manager.close_position(
+                                symbol, 
+                                current_price, 
+                                "MANUAL_SELL_ALL"
+                            )
                         
-                        profit_usd = (current_price - entry_price) * quantity if entry_price else 0
+                            profit_usd = (current_price - entry_price) * quantity if entry_price else 0
                         
-                        bot_instance.stats.record_trade(
-                            symbol, 
-                            entry_price, 
-                            current_price, 
-                            quantity, 
-                            "MANUAL_SELL_ALL"
-                        )
+                            bot_instance.stats.record_trade(
+                                symbol, 
+                                entry_price, 
+                                current_price, 
+                                quantity, 
+                                "MANUAL_SELL_ALL"
+                            )
                         
-                        results.append({
-                            'symbol': symbol,
-                            'success': True,
-                            'profit_pct': round(profit_pct, 2),
-                            'profit_usd': round(profit_usd, 2),
-                            'price': current_price
-                        })
-                        sold_count += 1
-                        logger.info(f"✅ {symbol} sold successfully at ${current_price:.2f} ({profit_pct:+.2f}%)")
-                    elif order.get('status') in ['PARTIALLY_FILLED', 'PENDING']:
-                        results.append({
-                            'symbol': symbol,
-                            'success': False,
-                            'error': f"Order partially filled or pending - Status: {order.get('status')}"
-                        })
-                        failed_count += 1
-                        logger.warning(f"⚠️ {symbol} order status: {order.get('status')} - Check manually")
-                    else:
-                        results.append({
-                            'symbol': symbol,
-                            'success': False,
-                            'error': f"Order status: {order.get('status', 'UNKNOWN')}"
-                        })
-                        failed_count += 1
-                        logger.warning(f"⚠️ {symbol} sell order failed - Status: {order.get('status')}")
+                            results.append({
+                                'symbol': symbol,
+                                'success': True,
+                                'profit_pct': round(profit_pct, 2),
+                                'profit_usd': round(profit_usd, 2),
+                                'price': current_price
+                            })
+                            sold_count += 1
+                            logger.info(f"✅ {symbol} sold successfully at ${current_price:.2f} ({profit_pct:+.2f}%)")
+                        elif order.get('status') in ['PARTIALLY_FILLED', 'PENDING']:
+                            results.append({
+                                'symbol': symbol,
+                                'success': False,
+                                'error': f"Order partially filled or pending - Status: {order.get('status')}"
+                            })
+                            failed_count += 1
+                            logger.warning(f"⚠️ {symbol} order status: {order.get('status')} - Check manually")
+                        else:
+                            results.append({
+                                'symbol': symbol,
+                                'success': False,
+                                'error': f"Order status: {order.get('status', 'UNKNOWN')}"
+                            })
+                            failed_count += 1
+                            logger.warning(f"⚠️ {symbol} sell order failed - Status: {order.get('status')}")
                         
-            except Exception as e:
-                results.append({
-                    'symbol': symbol,
-                    'success': False,
-                    'error': str(e)
-                })
-                failed_count += 1
-                logger.error(f"❌ Error selling {symbol}: {e}")
+                except Exception as e:
+                    results.append({
+                        'symbol': symbol,
+                        'success': False,
+                        'error': str(e)
+                    })
+                    failed_count += 1
+                    logger.error(f"❌ Error selling {symbol}: {e}")
+                finally:
+                    if ledger:
+                        ledger.release_exit(symbol)
         
         return jsonify({
             'success': True,
@@ -1139,66 +1703,67 @@ def create_demo_position():
         ]
         
         created_count = 0
-        for pos_data in demo_positions:
-            liquidation_price = pos_data['liquidation_price']
-            entry_price = pos_data['entry_price']
+        with bot_instance.position_lock:
+            for pos_data in demo_positions:
+                liquidation_price = pos_data['liquidation_price']
+                entry_price = pos_data['entry_price']
             
-            if pos_data['position_type'] == 'LONG':
-                stop_loss_price = entry_price * 0.98
-                take_profit_price = entry_price * 1.04
-            else:
-                stop_loss_price = entry_price * 1.02
-                take_profit_price = entry_price * 0.96
+                if pos_data['position_type'] == 'LONG':
+                    stop_loss_price = entry_price * 0.98
+                    take_profit_price = entry_price * 1.04
+                else:
+                    stop_loss_price = entry_price * 1.02
+                    take_profit_price = entry_price * 0.96
             
-            bot_instance.risk_manager.positions[pos_data['symbol']] = {
-                'status': 'open',
-                'entry_price': entry_price,
-                'quantity': pos_data['quantity'],
-                'signals': {'demo': True},
-                'entry_time': str(datetime.now()),
-                'market_regime': 'sideways',
-                'position_type': pos_data['position_type'],
-                'leverage': pos_data['leverage'],
-                'liquidation_price': liquidation_price,
-                'stop_loss_percent': 2.0,
-                'take_profit_percent': 4.0,
-                'unrealized_pnl': 0.0,
-                'funding_rate': None,
-                'trailing_stop': {
-                    'enabled': True,
-                    'current_stop_percent': -2.0 if pos_data['position_type'] == 'LONG' else 2.0,
-                    'highest_price': entry_price if pos_data['position_type'] == 'LONG' else None,
-                    'lowest_price': entry_price if pos_data['position_type'] == 'SHORT' else None,
-                    'activation_profit': 3.0,
-                    'trail_percent': 2.0
+                bot_instance.risk_manager.positions[pos_data['symbol']] = {
+                    'status': 'open',
+                    'entry_price': entry_price,
+                    'quantity': pos_data['quantity'],
+                    'signals': {'demo': True},
+                    'entry_time': str(datetime.now()),
+                    'market_regime': 'sideways',
+                    'position_type': pos_data['position_type'],
+                    'leverage': pos_data['leverage'],
+                    'liquidation_price': liquidation_price,
+                    'stop_loss_percent': 2.0,
+                    'take_profit_percent': 4.0,
+                    'unrealized_pnl': 0.0,
+                    'funding_rate': None,
+                    'trailing_stop': {
+                        'enabled': True,
+                        'current_stop_percent': -2.0 if pos_data['position_type'] == 'LONG' else 2.0,
+                        'highest_price': entry_price if pos_data['position_type'] == 'LONG' else None,
+                        'lowest_price': entry_price if pos_data['position_type'] == 'SHORT' else None,
+                        'activation_profit': 3.0,
+                        'trail_percent': 2.0
+                    }
                 }
-            }
             
-            if bot_instance.db:
-                try:
-                    bot_instance.db.save_position(
-                        symbol=pos_data['symbol'],
-                        entry_price=entry_price,
-                        quantity=pos_data['quantity'],
-                        entry_time=datetime.now(),
-                        stop_loss=stop_loss_price,
-                        take_profit=take_profit_price,
-                        trailing_stop_price=stop_loss_price,
-                        highest_price=entry_price,
-                        market_regime='sideways',
-                        buy_signals={'demo': 'true'},
-                        position_type=pos_data['position_type'],
-                        leverage=pos_data['leverage'],
-                        liquidation_price=liquidation_price
-                    )
-                except Exception as e:
-                    logger.error(f"Error saving demo position to DB: {e}")
+                if bot_instance.db:
+                    try:
+                        bot_instance.db.save_position(
+                            symbol=pos_data['symbol'],
+                            entry_price=entry_price,
+                            quantity=pos_data['quantity'],
+                            entry_time=datetime.now(),
+                            stop_loss=stop_loss_price,
+                            take_profit=take_profit_price,
+                            trailing_stop_price=stop_loss_price,
+                            highest_price=entry_price,
+                            market_regime='sideways',
+                            buy_signals={'demo': 'true'},
+                            position_type=pos_data['position_type'],
+                            leverage=pos_data['leverage'],
+                            liquidation_price=liquidation_price
+                        )
+                    except Exception as e:
+                        logger.error(f"Error saving demo position to DB: {e}")
             
-            bot_instance.risk_manager.save_positions()
-            created_count += 1
+                bot_instance.risk_manager.save_positions()
+                created_count += 1
             
-            pos_emoji = "🟢" if pos_data['position_type'] == 'LONG' else "🔴"
-            logger.info(f"{pos_emoji} Created DEMO {pos_data['position_type']} position: {pos_data['symbol']} @ ${entry_price:.2f} ({pos_data['leverage']}x)")
+                pos_emoji = "🟢" if pos_data['position_type'] == 'LONG' else "🔴"
+                logger.info(f"{pos_emoji} Created DEMO {pos_data['position_type']} position: {pos_data['symbol']} @ ${entry_price:.2f} ({pos_data['leverage']}x)")
         
         return jsonify({
             'success': True,
@@ -1250,6 +1815,23 @@ def get_swarm_stats():
             return jsonify({'success': False, 'error': str(e)})
     return jsonify({'success': False, 'enabled': False, 'message': 'Swarm not enabled'})
 
+@app.route('/metrics')
+def get_metrics():
+    """⏱️ زمن كل مرحلة (p50/p95/p99) + تفصيل آخر دورة"""
+    if not bot_instance:
+        return jsonify({'success': False, 'enabled': False, 'message': 'Bot not initialized'})
+    
+    try:
+        return jsonify({
+            'success': True,
+            **bot_instance.profiler.get_stats(),
+            'symbol_durations': bot_stats.get('symbol_durations', {}),
+            'risk_monitor': bot_instance.risk_monitor.get_stats() if bot_instance.risk_monitor else None
+        })
+    except Exception as e:
+        logger.error(f"Metrics error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/causal-graph')
 def get_causal_graph():
     """الرسم البياني السببي للعلاقات بين المتغيرات"""
@@ -1327,7 +1909,7 @@ def init_background_services():
     else:
         logger.warning("⚠️ TELEGRAM_BOT_TOKEN not set - Telegram bot disabled")
 
-if not os.environ.get('GUNICORN_WORKER'):
+if not os.environ.get('GUNICORN_WORKER') and not os.environ.get(SHARD_ENV):
     init_background_services()
 
 if __name__ == "__main__":
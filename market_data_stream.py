@@ -0,0 +1,364 @@
+import os
+import threading
+import time
+from collections import deque
+from logger_setup import setup_logger
+from stream_worker import StreamWorker
+
+logger = setup_logger('market_data_stream')
+
+LIVE_WS_BASE_URL = "wss://stream.binance.com:9443"
+TESTNET_WS_BASE_URL = "wss://stream.testnet.binance.vision"
+
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 3 * 60_000,
+    '5m': 5 * 60_000,
+    '15m': 15 * 60_000,
+    '30m': 30 * 60_000,
+    '1h': 60 * 60_000,
+    '2h': 2 * 60 * 60_000,
+    '4h': 4 * 60 * 60_000,
+    '6h': 6 * 60 * 60_000,
+    '8h': 8 * 60 * 60_000,
+    '12h': 12 * 60 * 60_000,
+    '1d': 24 * 60 * 60_000,
+    '3d': 3 * 24 * 60 * 60_000,
+    '1w': 7 * 24 * 60 * 60_000
+}
+
+def collect_stream_keys(config):
+    """
+    جمع كل أزواج (symbol, interval) التي يحتاجها البوت من الإعدادات
+    """
+    intervals = [config['trading']['candle_interval']]
+
+    multi_tf = config.get('multi_timeframe', {})
+    if multi_tf.get('enabled', False):
+        for key in ('short_timeframe', 'medium_timeframe', 'long_timeframe'):
+            if multi_tf.get(key):
+                intervals.append(multi_tf[key])
+
+    if config.get('custom_momentum', {}).get('enabled', False):
+        intervals.append('1h')
+
+    keys = []
+    for symbol in config['trading_pairs']:
+        for interval in intervals:
+            if (symbol, interval) not in keys:
+                keys.append((symbol, interval))
+
+    return keys
+
+def kline_event_to_row(k):
+    """تحويل حدث kline من WebSocket إلى نفس صيغة REST"""
+    return [
+        int(k['t']),
+        k['o'],
+        k['h'],
+        k['l'],
+        k['c'],
+        k['v'],
+        int(k['T']),
+        k['q'],
+        int(k['n']),
+        k['V'],
+        k['Q'],
+        k.get('B', '0')
+    ]
+
+class KlineStreamCache:
+    """
+    📡 كاش الشموع المباشر - يستقبل تحديثات kline عبر WebSocket
+    ويخدم get_historical_klines من الذاكرة بدلاً من REST
+    """
+    def __init__(self, binance_client, stream_keys, ws_base_url=None, max_candles=500,
+                 backfill_limit=100, stale_after_seconds=30):
+        self.binance_client = binance_client
+        self.stream_keys = list(stream_keys)
+        self.max_candles = max_candles
+        self.backfill_limit = backfill_limit
+        self.stale_after_seconds = stale_after_seconds
+
+        if ws_base_url is None:
+            ws_base_url = os.environ.get('BINANCE_WS_BASE_URL')
+        if ws_base_url is None:
+            ws_base_url = TESTNET_WS_BASE_URL if getattr(binance_client, 'testnet', False) else LIVE_WS_BASE_URL
+        self.ws_base_url = ws_base_url.rstrip('/')
+
+        self._lock = threading.Lock()
+        self._candles = {key: deque(maxlen=max_candles) for key in self.stream_keys}
+        self._needs_backfill = set(self.stream_keys)
+        self._resume_from = {}
+        self._short_history = set()
+
+        self.stats = {
+            'served_from_cache': 0,
+            'rest_backfills': 0,
+            'delta_backfills': 0,
+            'gaps_detected': 0,
+            'fallbacks': 0
+        }
+
+        self.worker = StreamWorker(
+            'klines',
+            url_factory=self.build_stream_url,
+            on_message=self.handle_message,
+            on_connect=self._on_connect
+        )
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        ws_config = config.get('market_data', {}).get('websocket', {})
+        return cls(
+            binance_client,
+            collect_stream_keys(config),
+            ws_base_url=ws_config.get('base_url') or config.get('endpoints', {}).get('ws_base_url'),
+            max_candles=ws_config.get('max_candles', 500),
+            backfill_limit=ws_config.get('backfill_limit', 100),
+            stale_after_seconds=ws_config.get('stale_after_seconds', 30)
+        )
+
+    def build_stream_url(self):
+        streams = '/'.join(f"{symbol.lower()}@kline_{interval}" for symbol, interval in self.stream_keys)
+        return f"{self.ws_base_url}/stream?streams={streams}"
+
+    def start(self):
+        if not self.stream_keys:
+            return False
+
+        started = self.worker.start()
+        if started:
+            logger.info(f"📡 Kline stream started for {len(self.stream_keys)} streams")
+        return started
+
+    def stop(self):
+        self.worker.stop()
+
+    def _on_connect(self):
+        # أي انقطاع قد يترك فجوة: السلاسل الفارغة تُملأ كاملة، والبقية تحتاج فقط
+        # الشموع منذ آخر open_time مخزن - إلا إذا وصل حدث لنفس الشمعة (السلسلة متصلة)
+        with self._lock:
+            for key in self.stream_keys:
+                if self._candles[key]:
+                    self._resume_from[key] = self._candles[key][-1][0]
+                else:
+                    self._needs_backfill.add(key)
+
+    def handle_message(self, message):
+        data = message.get('data', message)
+        if data.get('e') != 'kline':
+            return
+
+        k = data['k']
+        key = (data['s'], k['i'])
+        row = kline_event_to_row(k)
+
+        with self._lock:
+            candles = self._candles.get(key)
+            if candles is None:
+                return
+
+            if candles:
+                last_open_time = candles[-1][0]
+                if row[0] == last_open_time and self._resume_from.get(key) == last_open_time:
+                    # الشمعة المخزنة نفسها ما زالت مفتوحة وهذا الحدث يحمل قيمها الكاملة
+                    del self._resume_from[key]
+                if row[0] == last_open_time:
+                    candles[-1] = row
+                    return
+                if row[0] < last_open_time:
+                    return
+
+                interval_ms = INTERVAL_MS.get(k['i'])
+                if interval_ms and row[0] - last_open_time > interval_ms:
+                    self.stats['gaps_detected'] += 1
+                    self._needs_backfill.add(key)
+
+            candles.append(row)
+
+    def is_fresh(self):
+        if not self.worker.connected:
+            return False
+
+        age = self.worker.seconds_since_last_message()
+        return age is not None and age <= self.stale_after_seconds
+
+    def get_klines(self, symbol, interval, limit=100):
+        """
+        إرجاع آخر `limit` شمعة من الذاكرة، أو None للرجوع إلى REST
+        """
+        key = (symbol, interval)
+        if key not in self._candles:
+            return None
+
+        # الذاكرة لا تتسع لأكثر من max_candles: طلب أكبر كان يُعيد الملء من REST في كل استدعاء
+        limit = min(limit, self.max_candles)
+
+        if not self.is_fresh():
+            self._count('fallbacks')
+            return None
+
+        with self._lock:
+            needs_backfill = key in self._needs_backfill or key in self._resume_from or (
+                len(self._candles[key]) < limit and key not in self._short_history
+            )
+
+        if needs_backfill and not self._backfill(key, limit):
+            self._count('fallbacks')
+            return None
+
+        with self._lock:
+            candles = self._candles[key]
+            start = max(0, len(candles) - limit)
+            rows = [list(candles[i]) for i in range(start, len(candles))]
+            self.stats['served_from_cache'] += 1
+
+        return rows
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _plan_backfill(self, key, limit):
+        """
+        Returns: (fetch_limit, start_time) - start_time=None يعني إعادة ملء كاملة
+        بعد إعادة الاتصال تكفي الشموع منذ آخر open_time مخزن قبل الانقطاع
+        """
+        interval_ms = INTERVAL_MS.get(key[1])
+        with self._lock:
+            covered = len(self._candles[key]) >= limit or key in self._short_history
+            resume_from = None if key in self._needs_backfill else self._resume_from.get(key)
+
+        if resume_from is not None and interval_ms and covered:
+            missing = int((time.time() * 1000 - resume_from) // interval_ms) + 1
+            if missing <= self.backfill_limit:
+                return max(missing, 1), resume_from
+
+        return min(max(limit, self.backfill_limit), self.max_candles), None
+
+    def _backfill(self, key, limit):
+        symbol, interval = key
+        fetch_limit, start_time = self._plan_backfill(key, limit)
+
+        klines = self.binance_client.fetch_klines_rest(
+            symbol, interval, limit=fetch_limit, start_time=start_time, allow_mock=False
+        )
+        if not klines:
+            return False
+
+        with self._lock:
+            self.stats['rest_backfills' if start_time is None else 'delta_backfills'] += 1
+            candles = self._candles[key]
+            first_rest_open = klines[0][0]
+            last_rest_open = klines[-1][0]
+            # في الملء الجزئي ما قبل start_time متصل أصلاً؛ والشموع التي وصلت عبر البث أحدث من REST
+            older = [row for row in candles if row[0] < first_rest_open] if start_time is not None else []
+            streamed = [row for row in candles if row[0] >= last_rest_open]
+
+            candles.clear()
+            candles.extend(older)
+            candles.extend(klines[:-1] if streamed and streamed[0][0] == last_rest_open else klines)
+            candles.extend(streamed)
+            self._needs_backfill.discard(key)
+            self._resume_from.pop(key, None)
+            if start_time is None and len(klines) < fetch_limit:
+                self._short_history.add(key)
+
+        logger.debug(f"📥 Backfilled {len(klines)} candles for {symbol} {interval}"
+                     f"{'' if start_time is None else ' (since last stored candle)'}")
+        return True
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            'streams': len(self.stream_keys),
+            **self.worker.get_stats()
+        }
+
+class BookTickerStream:
+    """
+    📈 أفضل سعر شراء/بيع لحظي لكل رمز عبر <symbol>@bookTicker
+    كل تحديث يُمرر فوراً للمشتركين (مثل RiskMonitor) على خيط البث
+    """
+    def __init__(self, binance_client, symbols, ws_base_url=None, stale_after_seconds=5):
+        self.symbols = list(symbols)
+        self.stale_after_seconds = stale_after_seconds
+
+        if ws_base_url is None:
+            ws_base_url = os.environ.get('BINANCE_WS_BASE_URL')
+        if ws_base_url is None:
+            ws_base_url = TESTNET_WS_BASE_URL if getattr(binance_client, 'testnet', False) else LIVE_WS_BASE_URL
+        self.ws_base_url = ws_base_url.rstrip('/')
+
+        self._quotes = {}
+        self._listeners = []
+        self.updates = 0
+
+        self.worker = StreamWorker(
+            'book_ticker',
+            url_factory=self.build_stream_url,
+            on_message=self.handle_message
+        )
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        ws_config = config.get('market_data', {}).get('websocket', {})
+        return cls(
+            binance_client,
+            config['trading_pairs'],
+            ws_base_url=ws_config.get('base_url') or config.get('endpoints', {}).get('ws_base_url'),
+            stale_after_seconds=config.get('risk_monitor', {}).get('stale_after_seconds', 5)
+        )
+
+    def build_stream_url(self):
+        streams = '/'.join(f"{symbol.lower()}@bookTicker" for symbol in self.symbols)
+        return f"{self.ws_base_url}/stream?streams={streams}"
+
+    def subscribe(self, callback):
+        """callback(symbol, bid, ask) لكل تحديث"""
+        self._listeners.append(callback)
+
+    def start(self):
+        if not self.symbols:
+            return False
+
+        started = self.worker.start()
+        if started:
+            logger.info(f"📈 Book ticker stream started for {len(self.symbols)} symbols")
+        return started
+
+    def stop(self):
+        self.worker.stop()
+
+    def handle_message(self, message):
+        data = message.get('data', message)
+        if 'b' not in data or 'a' not in data:
+            return
+
+        symbol = data['s']
+        bid, ask = float(data['b']), float(data['a'])
+        self._quotes[symbol] = (bid, ask)
+        self.updates += 1
+
+        for callback in self._listeners:
+            callback(symbol, bid, ask)
+
+    def get_quote(self, symbol):
+        return self._quotes.get(symbol)
+
+    def is_fresh(self):
+        if not self.worker.connected:
+            return False
+
+        age = self.worker.seconds_since_last_message()
+        return age is not None and age <= self.stale_after_seconds
+
+    def get_stats(self):
+        return {
+            'symbols': len(self.symbols),
+            'updates': self.updates,
+            **self.worker.get_stats()
+        }
@@ -49,8 +49,13 @@ class MarketRegime:
             
             # 4. حساب momentum من البيانات التاريخية
             momentum_bullish = False
-            if historical_data and len(historical_data) >= self.trend_strength_periods:
-                recent_prices = [float(candle[4]) for candle in historical_data[-self.trend_strength_periods:]]
+            if isinstance(historical_data, dict):
+                closes = historical_data['close']
+            else:
+                closes = [float(candle[4]) for candle in historical_data] if historical_data else []
+            
+            if len(closes) >= self.trend_strength_periods:
+                recent_prices = [float(price) for price in closes[-self.trend_strength_periods:]]
                 price_change_pct = ((recent_prices[-1] - recent_prices[0]) / recent_prices[0]) * 100
                 momentum_bullish = price_change_pct > 0
                 signals.append(f"Momentum {self.trend_strength_periods} candles: {price_change_pct:+.2f}%")
@@ -0,0 +1,116 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict
+from logger_setup import setup_logger
+from rate_limiter import PRIORITY_PRICE
+
+logger = setup_logger('price_snapshot')
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """لقطة أسعار متسقة لكل الرموز في لحظة واحدة"""
+    timestamp: float
+    prices: Dict[str, float] = field(default_factory=dict)
+
+    def get(self, symbol, default=None):
+        return self.prices.get(symbol, default)
+
+    def age(self):
+        return time.time() - self.timestamp
+
+class PriceSnapshotService:
+    """
+    💹 خدمة لقطات الأسعار - طلب واحد لـ /api/v3/ticker/price لكل الرموز
+    مع TTL أقل من ثانية، بدلاً من get_symbol_price لكل صفقة
+    بعد فشل التحديث تُخدم اللقطة السابقة لمدة failure_backoff_seconds (TTL واحد على الأقل)
+    بدل أن يعيد كل مستدعٍ في الدورة طلب الـ weight-4
+    """
+    def __init__(self, binance_client, ttl_seconds=0.5, max_stale_seconds=30, failure_backoff_seconds=2.0):
+        self.binance_client = binance_client
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.failure_backoff_seconds = max(failure_backoff_seconds, ttl_seconds)
+        self._snapshot = PriceSnapshot(timestamp=0.0)
+        self._retry_after = 0.0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'refreshes': 0,
+            'primed': 0,
+            'cache_hits': 0,
+            'refresh_failures': 0,
+            'backoff_hits': 0,
+            'single_symbol_fallbacks': 0
+        }
+
+    @classmethod
+    def from_config(cls, config, binance_client):
+        snapshot_config = config.get('market_data', {}).get('price_snapshot', {})
+        return cls(
+            binance_client,
+            ttl_seconds=snapshot_config.get('ttl_seconds', 0.5),
+            max_stale_seconds=snapshot_config.get('max_stale_seconds', 30),
+            failure_backoff_seconds=snapshot_config.get('failure_backoff_seconds', 2.0)
+        )
+
+    def get_snapshot(self, priority=PRIORITY_PRICE):
+        """
+        إرجاع آخر لقطة، مع تحديثها إذا تجاوز عمرها الـ TTL
+        """
+        snapshot = self._snapshot
+        if snapshot.age() < self.ttl_seconds:
+            self.stats['cache_hits'] += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot.age() < self.ttl_seconds:
+                self.stats['cache_hits'] += 1
+                return snapshot
+
+            if time.time() < self._retry_after:
+                self.stats['backoff_hits'] += 1
+                return snapshot
+
+            prices = self.binance_client.get_all_prices(priority=priority)
+            if prices:
+                self._snapshot = PriceSnapshot(timestamp=time.time(), prices=prices)
+                self._retry_after = 0.0
+                self.stats['refreshes'] += 1
+            else:
+                self._retry_after = time.time() + self.failure_backoff_seconds
+                self.stats['refresh_failures'] += 1
+                logger.debug(f"Price snapshot refresh failed - keeping previous snapshot "
+                             f"for {self.failure_backoff_seconds}s")
+
+            return self._snapshot
+
+    def prime(self, prices):
+        """تعبئة اللقطة من أسعار جُلبت مسبقاً (مثلاً عبر العميل غير المتزامن)"""
+        if not prices:
+            return
+        with self._lock:
+            self._snapshot = PriceSnapshot(timestamp=time.time(), prices=dict(prices))
+            self.stats['primed'] += 1
+
+    def get_price(self, symbol, snapshot=None, priority=PRIORITY_PRICE):
+        """
+        سعر رمز واحد من اللقطة، مع الرجوع إلى get_symbol_price إذا لم يتوفر
+        """
+        if snapshot is None:
+            snapshot = self.get_snapshot(priority)
+
+        price = snapshot.get(symbol)
+        if price is not None and snapshot.age() <= self.max_stale_seconds:
+            return price
+
+        self.stats['single_symbol_fallbacks'] += 1
+        return self.binance_client.get_symbol_price(symbol, priority=priority)
+
+    def get_stats(self):
+        return {
+            **self.stats,
+            'symbols': len(self._snapshot.prices),
+            'snapshot_age_seconds': round(self._snapshot.age(), 3) if self._snapshot.timestamp else None
+        }
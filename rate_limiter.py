@@ -0,0 +1,274 @@
+import heapq
+import itertools
+import threading
+import time
+from logger_setup import setup_logger
+
+logger = setup_logger('rate_limiter')
+
+PRIORITY_ORDER = 0
+PRIORITY_STOP_CHECK = 1
+PRIORITY_PRICE = 2
+PRIORITY_KLINES = 3
+PRIORITY_SENTIMENT = 4
+
+PRIORITY_NAMES = {
+    PRIORITY_ORDER: 'orders',
+    PRIORITY_STOP_CHECK: 'stop_checks',
+    PRIORITY_PRICE: 'prices',
+    PRIORITY_KLINES: 'klines',
+    PRIORITY_SENTIMENT: 'sentiment'
+}
+
+# نسبة الميزانية التي يُسمح لكل أولوية باستهلاكها قبل التأجيل
+DEFAULT_PRIORITY_CEILINGS = {
+    PRIORITY_ORDER: 1.0,
+    PRIORITY_STOP_CHECK: 0.95,
+    PRIORITY_PRICE: 0.85,
+    PRIORITY_KLINES: 0.7,
+    PRIORITY_SENTIMENT: 0.5
+}
+
+# أوزان الطلبات (REQUEST_WEIGHT) حسب توثيق Binance
+ENDPOINT_WEIGHTS = {
+    'spot': {
+        'order': 1,
+        'account': 20,
+        'ticker_price': 2,
+        'ticker_price_all': 4,
+        'klines': None,
+        'exchange_info': 20,
+        'user_data_stream': 2,
+        'server_time': 1
+    },
+    'futures': {
+        'order': 1,
+        'account': 5,
+        'position_risk': 5,
+        'leverage': 1,
+        'margin_type': 1,
+        'klines': None,
+        'exchange_info': 1,
+        'premium_index': 1,
+        'funding_rate': 1,
+        'open_interest': 1
+    },
+    'coingecko': {
+        'coin': 1
+    }
+}
+
+def klines_weight(limit):
+    """وزن /klines يعتمد على limit"""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def endpoint_weight(market, endpoint, limit=None):
+    weight = ENDPOINT_WEIGHTS.get(market, {}).get(endpoint, 1)
+    if weight is None:
+        return klines_weight(limit or 500)
+    return weight
+
+class WeightRateLimiter:
+    """
+    ⚖️ محدد معدل بنظام token bucket لوزن الطلبات في الدقيقة
+
+    يتزامن مع X-MBX-USED-WEIGHT-1M من ردود Binance، ويؤجل الطلبات منخفضة
+    الأولوية قبل نفاد الميزانية، ويخدم المنتظرين حسب الأولوية.
+    """
+    def __init__(self, name, max_weight_per_minute=1200, priority_ceilings=None,
+                 max_wait_seconds=5.0):
+        self.name = name
+        self.max_weight_per_minute = max_weight_per_minute
+        self.refill_per_second = max_weight_per_minute / 60.0
+        self.max_wait_seconds = max_wait_seconds
+        self.priority_ceilings = dict(DEFAULT_PRIORITY_CEILINGS)
+        self.priority_ceilings.update(priority_ceilings or {})
+
+        self._tokens = float(max_weight_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._server_used_weight = None
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+        self.stats = {
+            'acquired': {name: 0 for name in PRIORITY_NAMES.values()},
+            'deferred': {name: 0 for name in PRIORITY_NAMES.values()},
+            'weight_consumed': 0,
+            'waits': 0,
+            'rate_limit_responses': 0
+        }
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_weight_per_minute,
+            self._tokens + (now - self._last_refill) * self.refill_per_second
+        )
+        self._last_refill = now
+
+    def used_weight(self):
+        with self._condition:
+            self._refill()
+            return self.max_weight_per_minute - self._tokens
+
+    def _fits(self, weight, priority):
+        if priority != PRIORITY_ORDER and time.time() < self._blocked_until:
+            return False
+
+        ceiling = self.max_weight_per_minute * self.priority_ceilings.get(priority, 1.0)
+        used = self.max_weight_per_minute - self._tokens
+        return used + weight <= ceiling
+
+    def acquire(self, weight, priority=PRIORITY_PRICE, max_wait_seconds=None):
+        """
+        حجز `weight` من الميزانية
+        Returns: True إذا سُمح بالطلب، False إذا تم تأجيله
+        """
+        if max_wait_seconds is None:
+            # الأولويات المنخفضة تؤجَّل فوراً بدلاً من الانتظار
+            max_wait_seconds = self.max_wait_seconds if priority <= PRIORITY_STOP_CHECK else 0.0
+
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        deadline = time.monotonic() + max_wait_seconds
+
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            waited = False
+
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == ticket and self._fits(weight, priority):
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        if priority == PRIORITY_ORDER:
+                            # الأوامر لا تُؤجَّل أبداً
+                            logger.warning(f"⚠️ [{self.name}] Weight budget exhausted - sending order anyway")
+                            break
+                        self.stats['deferred'][priority_name] += 1
+                        logger.debug(f"⏸️ [{self.name}] Deferred {priority_name} request (weight {weight}, "
+                                     f"used {self.max_weight_per_minute - self._tokens:.0f}/{self.max_weight_per_minute})")
+                        return False
+
+                    waited = True
+                    self._condition.wait(min(remaining, max(weight / self.refill_per_second, 0.05)))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+            self._tokens -= weight
+            self.stats['acquired'][priority_name] += 1
+            self.stats['weight_consumed'] += weight
+            if waited:
+                self.stats['waits'] += 1
+            return True
+
+    def update_from_headers(self, headers, status_code=None):
+        """مزامنة الميزانية مع الوزن الفعلي المُبلغ من الخادم"""
+        if headers is None:
+            return
+
+        used = None
+        for key, value in headers.items():
+            if key.lower() == 'x-mbx-used-weight-1m':
+                used = int(value)
+                break
+
+        with self._condition:
+            if used is not None:
+                self._refill()
+                self._server_used_weight = used
+                self._tokens = float(max(0, self.max_weight_per_minute - used))
+
+            if status_code in (418, 429):
+                self.stats['rate_limit_responses'] += 1
+                retry_after = headers.get('Retry-After')
+                block_seconds = int(retry_after) if retry_after and str(retry_after).isdigit() else 60
+                self._blocked_until = time.time() + block_seconds
+                self._tokens = 0.0
+                logger.warning(f"🚫 [{self.name}] HTTP {status_code} rate limit - blocking non-order requests for {block_seconds}s")
+
+    def get_stats(self):
+        used = self.used_weight()
+        return {
+            'used_weight': round(used, 1),
+            'max_weight_per_minute': self.max_weight_per_minute,
+            'usage_pct': round(used / self.max_weight_per_minute * 100, 1),
+            'server_used_weight': self._server_used_weight,
+            'blocked_seconds': max(0, round(self._blocked_until - time.time(), 1)),
+            **self.stats
+        }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+LIMITER_DEFAULTS = {
+    'spot': 1200,
+    'futures': 2400,
+    'coingecko': 30
+}
+
+class ResponseCapture:
+    """
+    آخر استجابة HTTP لكل خيط من جلسة python-binance
+    client.response مشترك بين الخيوط، فقد يُزامن المحدد من ترويسات طلب خيط آخر؛
+    خطاف الجلسة يعمل على خيط الطلب نفسه
+    """
+    def __init__(self):
+        self._local = threading.local()
+
+    def attach(self, client):
+        session = getattr(client, 'session', None)
+        if session is not None:
+            session.hooks['response'].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        self._local.response = response
+
+    def pop(self):
+        response = getattr(self._local, 'response', None)
+        self._local.response = None
+        return response
+
+def configure_rate_limiters(config):
+    """إنشاء محددات المعدل المشتركة من الإعدادات"""
+    limits_config = config.get('rate_limits', {})
+    ceilings = {
+        priority: limits_config.get('priority_ceilings', {}).get(name, DEFAULT_PRIORITY_CEILINGS[priority])
+        for priority, name in PRIORITY_NAMES.items()
+    }
+
+    with _limiters_lock:
+        for name, default_limit in LIMITER_DEFAULTS.items():
+            _limiters[name] = WeightRateLimiter(
+                name,
+                max_weight_per_minute=limits_config.get(name, {}).get('max_weight_per_minute', default_limit),
+                priority_ceilings=ceilings,
+                max_wait_seconds=limits_config.get('max_wait_seconds', 5.0)
+            )
+    return dict(_limiters)
+
+def get_rate_limiter(name):
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                limiter = WeightRateLimiter(name, max_weight_per_minute=LIMITER_DEFAULTS.get(name, 1200))
+                _limiters[name] = limiter
+    return limiter
+
+def get_rate_limit_stats():
+    return {name: limiter.get_stats() for name, limiter in list(_limiters.items())}
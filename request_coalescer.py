@@ -0,0 +1,192 @@
+import threading
+import time
+from logger_setup import setup_logger
+from kline_store import rows_to_arrays
+from market_data_stream import collect_stream_keys
+
+logger = setup_logger('request_coalescer')
+
+def collect_kline_requests(config, limit=100):
+    """
+    كل (symbol, interval, limit) تحتاجه الدورة الواحدة - لجلبها مسبقاً دفعة واحدة
+    """
+    momentum_enabled = config.get('custom_momentum', {}).get('enabled', False)
+    requests = {}
+
+    for symbol, interval in collect_stream_keys(config):
+        # 1h المضاف للزخم فقط يحتاج آخر 24 شمعة (get_24h_data)
+        momentum_only = momentum_enabled and interval == '1h' and not _analysis_uses_interval(config, '1h')
+        requests[(symbol, interval)] = 24 if momentum_only else limit
+
+    if momentum_enabled:
+        requests.setdefault(('BTCUSDT', '1h'), 24)
+
+    return [(symbol, interval, fetch_limit) for (symbol, interval), fetch_limit in requests.items()]
+
+def _analysis_uses_interval(config, interval):
+    if config['trading']['candle_interval'] == interval:
+        return True
+    multi_tf = config.get('multi_timeframe', {})
+    return multi_tf.get('enabled', False) and interval in (
+        multi_tf.get('short_timeframe'), multi_tf.get('medium_timeframe'), multi_tf.get('long_timeframe')
+    )
+
+class IterationKlineCache:
+    """
+    🔁 ذاكرة مؤقتة على مستوى الدورة الواحدة أمام BinanceClientManager
+
+    كل (symbol, interval) يُجلب مرة واحدة فقط في الدورة، والطلبات الأصغر
+    (limit أقل) تُخدم من ذيل النافذة المجلوبة مسبقاً.
+    مع closed_before_ms (دورة أطلقها إغلاق شمعة) تُحذف الشمعة الأخيرة إذا كانت
+    ما تزال تتشكل، فيُحلل كل المستهلكين الشمعة المغلقة نفسها.
+    """
+    def __init__(self, binance_client):
+        self.binance_client = binance_client
+        self.iteration = 0
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._prefetched = 0
+        self.async_client = None
+        self.last_iteration_stats = None
+        self.closed_before_ms = None
+
+    def attach_async_client(self, async_client):
+        self.async_client = async_client
+
+    def begin_iteration(self, iteration, closed_before_ms=None):
+        with self._lock:
+            self.iteration = iteration
+            self.closed_before_ms = closed_before_ms
+            self._entries = {}
+            self._hits = 0
+            self._misses = 0
+            self._prefetched = 0
+
+    def end_iteration(self):
+        with self._lock:
+            total = self._hits + self._misses
+            stats = {
+                'iteration': self.iteration,
+                'hits': self._hits,
+                'misses': self._misses,
+                'prefetched': self._prefetched,
+                'hit_rate': (self._hits / total * 100) if total else 0.0,
+                'series': len(self._entries)
+            }
+        self.last_iteration_stats = stats
+
+        if total:
+            logger.info(f"🔁 Kline requests: {stats['misses']} fetched, {stats['hits']} shared "
+                        f"({stats['hit_rate']:.0f}% coalesced)")
+        return stats
+
+    def prefetch(self, kline_requests, price_service=None):
+        """
+        جلب كل شموع الدورة (+ لقطة الأسعار) بالتوازي عبر العميل غير المتزامن
+        قبل مرحلة القرار. الرموز التي يفشل جلبها تُجلب لاحقاً بالمسار العادي.
+        """
+        if not self.async_client:
+            return 0
+
+        kline_store = getattr(self.binance_client, 'kline_store', None)
+        kline_stream = getattr(self.binance_client, 'kline_stream', None)
+        if kline_stream and kline_stream.is_fresh():
+            # الشموع تصل من البث مباشرة - نكتفي بالأسعار
+            kline_requests = []
+
+        plans = []
+        for symbol, interval, limit in kline_requests:
+            if kline_store:
+                fetch_limit, start_time = kline_store.plan_fetch(symbol, interval, limit)
+            else:
+                fetch_limit, start_time = limit, None
+            plans.append((symbol, interval, fetch_limit, start_time, limit))
+
+        started = time.time()
+        results, prices = self.async_client.fetch_iteration_inputs(
+            [plan[:4] for plan in plans], include_prices=price_service is not None
+        )
+
+        prefetched = 0
+        for symbol, interval, fetch_limit, start_time, limit in plans:
+            rows = results.get((symbol, interval))
+            if not rows:
+                continue
+
+            if kline_store:
+                if not kline_store.apply_fetch(symbol, interval, rows, start_time):
+                    continue
+                arrays = kline_store.peek_arrays(symbol, interval, limit)
+            else:
+                arrays = rows_to_arrays(rows)
+
+            if arrays is None:
+                continue
+
+            with self._get_key_lock((symbol, interval)):
+                self._entries[(symbol, interval)] = {'limit': limit, 'arrays': arrays}
+            prefetched += 1
+
+        if prices and price_service:
+            price_service.prime(prices)
+
+        with self._lock:
+            self._prefetched = prefetched
+
+        logger.info(f"⚡ Prefetched {prefetched}/{len(plans)} kline series"
+                    f"{' + prices' if prices else ''} in {(time.time() - started) * 1000:.0f}ms")
+        return prefetched
+
+    def _get_key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks[key] = lock
+            return lock
+
+    def get_kline_arrays(self, symbol, interval, limit=100):
+        """
+        إرجاع آخر `limit` شمعة كأعمدة NumPy مع مشاركة الجلب بين كل المستهلكين
+        """
+        key = (symbol, interval)
+
+        with self._get_key_lock(key):
+            entry = self._entries.get(key)
+            if entry and entry['limit'] >= limit:
+                with self._lock:
+                    self._hits += 1
+                return self._tail(self._closed(entry['arrays']), limit)
+
+            with self._lock:
+                self._misses += 1
+
+            arrays = self.binance_client.get_kline_arrays(symbol, interval, limit=limit)
+            if arrays is None:
+                klines = self.binance_client.get_historical_klines(symbol, interval, limit=limit)
+                if not klines:
+                    return None
+                arrays = rows_to_arrays(klines)
+
+            self._entries[key] = {'limit': limit, 'arrays': arrays}
+            return self._closed(arrays)
+
+    def _closed(self, arrays):
+        """حذف الشمعة الأخيرة إذا كانت close_time بعد الإغلاق المجدول (شمعة فُتحت للتو)"""
+        if self.closed_before_ms is None or not len(arrays['close_time']):
+            return arrays
+        if arrays['close_time'][-1] < self.closed_before_ms:
+            return arrays
+        return {name: values[:-1] for name, values in arrays.items()}
+
+    def _tail(self, arrays, limit):
+        size = len(arrays['close'])
+        if size <= limit:
+            return arrays
+        return {name: values[size - limit:] for name, values in arrays.items()}
+
+    def get_stats(self):
+        return self.last_iteration_stats
@@ -2,14 +2,18 @@ from logger_setup import setup_logger
 import json
 import os
 from futures_risk_manager import FuturesRiskMixin
+from exchange_metadata import ExchangeMetadataCache
+from rate_limiter import PRIORITY_STOP_CHECK
 
 logger = setup_logger('risk_manager')
 
 class RiskManager(FuturesRiskMixin):
-    def __init__(self, config, binance_client, trading_strategy=None, db_manager=None, futures_client=None):
+    def __init__(self, config, binance_client, trading_strategy=None, db_manager=None, futures_client=None, price_service=None, exchange_metadata=None):
         self.config = config
         self.binance_client = binance_client
+        self.price_service = price_service
         self.futures_client = futures_client
+        self.exchange_metadata = exchange_metadata or ExchangeMetadataCache(binance_client, futures_client)
         self.trading_strategy = trading_strategy
         self.db = db_manager
         self.positions_file = 'positions.json'
@@ -109,23 +113,7 @@ class RiskManager(FuturesRiskMixin):
             if current_price and current_price > 0:
                 quantity = position_value / current_price
                 
-                symbol_info = self.binance_client.get_symbol_info(symbol)
-                if symbol_info:
-                    for filter in symbol_info['filters']:
-                        if filter['filterType'] == 'LOT_SIZE':
-                            step_size = float(filter['stepSize'])
-                            
-                            # Calculate precision from step_size
-                            step_size_str = f"{step_size:.10f}".rstrip('0')
-                            if '.' in step_size_str:
-                                precision = len(step_size_str.split('.')[1])
-                            else:
-                                precision = 0
-                            
-                            # Round to step_size and apply precision
-                            quantity = round(quantity / step_size) * step_size
-                            quantity = round(quantity, precision)
-                            break
+                quantity = self.exchange_metadata.round_quantity(symbol, quantity)
                 
                 logger.info(f"Position size for {symbol}: {quantity:.8f} (${position_value:.2f})")
                 return quantity
@@ -149,17 +137,21 @@ class RiskManager(FuturesRiskMixin):
         
         return True
     
-    def open_position(self, symbol, entry_price, quantity, signals):
-        market_regime = 'sideways'
+    def open_position(self, symbol, entry_price, quantity, signals, market_regime=None):
         stop_loss_multiplier = 1.0
         take_profit_multiplier = 1.0
         
-        if self.trading_strategy and hasattr(self.trading_strategy, 'current_regime'):
+        # في وضع Shards يُمرَّر نظام السوق من العامل: استراتيجية المنسق لا تتكيف أبداً
+        if market_regime is None and self.trading_strategy and hasattr(self.trading_strategy, 'current_regime'):
             market_regime = self.trading_strategy.current_regime
+        
+        if market_regime:
             regime_config = self.config.get('market_regime', {})
             regime_strategy = regime_config.get(f'{market_regime}_strategy', {})
             stop_loss_multiplier = regime_strategy.get('stop_loss_multiplier', 1.0)
             take_profit_multiplier = regime_strategy.get('take_profit_multiplier', 1.0)
+        else:
+            market_regime = 'sideways'
         
         base_stop_loss = self.config['risk_management']['stop_loss_percent']
         base_take_profit = self.config['risk_management']['take_profit_percent']
@@ -277,6 +269,11 @@ class RiskManager(FuturesRiskMixin):
         
         return False
     
+    def get_current_price(self, symbol):
+        if self.price_service:
+            return self.price_service.get_price(symbol, priority=PRIORITY_STOP_CHECK)
+        return self.binance_client.get_symbol_price(symbol, priority=PRIORITY_STOP_CHECK)
+    
     def get_open_positions(self):
         return {k: v for k, v in self.positions.items() if v.get('status') == 'open'}
     
@@ -317,13 +314,10 @@ class RiskManager(FuturesRiskMixin):
             ghost_positions = []
             
             for symbol, position in open_positions.items():
-                # الحصول على baseAsset الصحيح من معلومات الرمز
-                symbol_info = self.binance_client.get_symbol_info(symbol)
+                # الحصول على baseAsset الصحيح من معلومات المنصة المخزنة
+                base_asset = self.exchange_metadata.get_base_asset(symbol)
                 
-                if symbol_info:
-                    # استخدام baseAsset الرسمي من Binance
-                    base_asset = symbol_info.get('baseAsset')
-                else:
+                if not base_asset:
                     # Fallback: محاولة استخراج يدوي (لكن مع تحذير)
                     logger.warning(f"Cannot get symbol info for {symbol}, using fallback parsing")
                     # إزالة العملات المقتبسة المعروفة
@@ -365,7 +359,7 @@ class RiskManager(FuturesRiskMixin):
                     position = self.positions[symbol]
                     
                     # حساب P/L تقريبي (نفترض سعر الخروج = آخر سعر معروف)
-                    current_price = self.binance_client.get_symbol_price(symbol)
+                    current_price = self.get_current_price(symbol)
                     if not current_price:
                         current_price = position['entry_price']  # fallback
                     
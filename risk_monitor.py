@@ -0,0 +1,118 @@
+import threading
+import time
+from logger_setup import setup_logger
+
+logger = setup_logger('risk_monitor')
+
+class RiskMonitor:
+    """
+    🛡️ حلقة مخاطر مستقلة عن حلقة الإشارات
+
+    كل تحديث سعر من BookTickerStream يوقظ خيط المراقبة فوراً، فتُقيّم قواعد
+    الخروج (Stop Loss / Take Profit / Trailing) للرمز خلال أجزاء من الثانية
+    بدل انتظار جلب الشموع والتصويت. التحديثات المتتالية لنفس الرمز تُدمج في
+    آخر سعر. عند غياب البث (أو انقطاعه) تُفحص كل الصفقات على لقطة الأسعار
+    كل poll_interval_seconds.
+
+    evaluate_quote(symbol, bid, ask) و poll() يوفرهما البوت (تحت position_lock)
+    """
+    def __init__(self, evaluate_quote, poll, ticker_stream=None, poll_interval_seconds=1.0):
+        self.evaluate_quote = evaluate_quote
+        self.poll = poll
+        self.ticker_stream = ticker_stream
+        self.poll_interval_seconds = poll_interval_seconds
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_poll = 0.0
+
+        self.stats = {
+            'quotes': 0,
+            'evaluations': 0,
+            'polls': 0,
+            'errors': 0,
+            'max_latency_ms': 0.0,
+            'total_latency_ms': 0.0
+        }
+
+        if ticker_stream:
+            ticker_stream.subscribe(self.on_quote)
+
+    @classmethod
+    def from_config(cls, config, evaluate_quote, poll, ticker_stream=None):
+        monitor_config = config.get('risk_monitor', {})
+        return cls(
+            evaluate_quote,
+            poll,
+            ticker_stream=ticker_stream,
+            poll_interval_seconds=monitor_config.get('poll_interval_seconds', 1.0)
+        )
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return True
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='risk-monitor', daemon=True)
+        self._thread.start()
+        logger.info(f"🛡️ Risk monitor started ({'book ticker' if self.ticker_stream else 'polling'}, "
+                    f"poll every {self.poll_interval_seconds}s when stream is stale)")
+        return True
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+
+    def on_quote(self, symbol, bid, ask):
+        """يُستدعى من خيط البث: يسجل آخر سعر ويوقظ المراقب"""
+        with self._lock:
+            self._pending[symbol] = (bid, ask, time.time())
+        self.stats['quotes'] += 1
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wakeup.wait(self.poll_interval_seconds)
+            self._wakeup.clear()
+
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            for symbol, (bid, ask, received_at) in pending.items():
+                try:
+                    self.evaluate_quote(symbol, bid, ask)
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"Error evaluating risk for {symbol}: {e}")
+
+                latency_ms = (time.time() - received_at) * 1000
+                self.stats['evaluations'] += 1
+                self.stats['total_latency_ms'] += latency_ms
+                self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], latency_ms)
+
+            stream_fresh = self.ticker_stream is not None and self.ticker_stream.is_fresh()
+            if not stream_fresh and time.time() - self._last_poll >= self.poll_interval_seconds:
+                self._last_poll = time.time()
+                self.stats['polls'] += 1
+                try:
+                    self.poll()
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"Error polling risk checks: {e}")
+
+    def get_stats(self):
+        evaluations = self.stats['evaluations']
+        return {
+            'quotes': self.stats['quotes'],
+            'evaluations': evaluations,
+            'polls': self.stats['polls'],
+            'errors': self.stats['errors'],
+            'avg_latency_ms': round(self.stats['total_latency_ms'] / evaluations, 2) if evaluations else 0.0,
+            'max_latency_ms': round(self.stats['max_latency_ms'], 2),
+            'stream': self.ticker_stream.get_stats() if self.ticker_stream else None
+        }
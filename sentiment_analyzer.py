@@ -1,9 +1,11 @@
 from logger_setup import setup_logger
 import json
 import os
+import threading
 from datetime import datetime, timedelta
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import requests
+from http_transport import get_transport
+from rate_limiter import get_rate_limiter, endpoint_weight, PRIORITY_SENTIMENT
 
 logger = setup_logger('sentiment_analyzer')
 
@@ -16,6 +18,8 @@ class SentimentAnalyzer:
         
         self.vader = SentimentIntensityAnalyzer()
         self.cache = self.load_cache()
+        # يُستدعى من خيوط تحليل الرموز المتوازية
+        self._cache_lock = threading.Lock()
         
         self.reddit_enabled = False
         self.coingecko_enabled = True
@@ -63,16 +67,23 @@ class SentimentAnalyzer:
             
             score, source = self.fetch_coingecko_sentiment(coin_name)
             
+            if source == 'deferred':
+                # الميزانية محجوزة لطلبات أهم - نستخدم آخر قيمة معروفة بدون تخزين
+                if symbol in self.cache:
+                    return self.cache[symbol]['score'], self.cache[symbol]['source']
+                return 50.0, 'deferred'
+            
             if score is None:
                 score, source = 50.0, 'default'
                 logger.warning(f"⚠️ No sentiment data for {symbol}, using neutral (50/100)")
             
-            self.cache[symbol] = {
-                'score': score,
-                'source': source,
-                'timestamp': datetime.now().isoformat()
-            }
-            self.save_cache()
+            with self._cache_lock:
+                self.cache[symbol] = {
+                    'score': score,
+                    'source': source,
+                    'timestamp': datetime.now().isoformat()
+                }
+                self.save_cache()
             
             logger.info(f"💭 Sentiment for {symbol}: {score:.1f}/100 (source: {source})")
             return score, source
@@ -96,6 +107,9 @@ class SentimentAnalyzer:
             
             coin_id = coin_id_map.get(coin_name, coin_name)
             
+            if not get_rate_limiter('coingecko').acquire(endpoint_weight('coingecko', 'coin'), PRIORITY_SENTIMENT):
+                return None, 'deferred'
+            
             url = f"https://api.coingecko.com/api/v3/coins/{coin_id}"
             params = {
                 'localization': 'false',
@@ -105,7 +119,7 @@ class SentimentAnalyzer:
                 'developer_data': 'false'
             }
             
-            response = requests.get(url, params=params, timeout=10)
+            response = get_transport().get(url, params=params)
             
             if response.status_code != 200:
                 logger.warning(f"CoinGecko API returned {response.status_code}")
@@ -0,0 +1,289 @@
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from logger_setup import setup_logger
+
+logger = setup_logger('shard_coordinator')
+
+# يُضبط في بيئة عملية العامل: main لا يشغّل الخدمات الخلفية عند استيراده
+SHARD_ENV = 'BOT_SHARD'
+AUTHKEY_ENV = 'BOT_SHARD_AUTHKEY'
+
+def shard_pairs(trading_pairs, shards):
+    """توزيع الرموز على الـ Shards بالتناوب مع الحفاظ على ترتيبها"""
+    shards = max(1, min(shards, len(trading_pairs)))
+    return [trading_pairs[i::shards] for i in range(shards)]
+
+class PositionLedger:
+    """
+    📒 دفتر الصفقات الوحيد (في عملية المنسق) يخدم كل العمال عبر IPC
+
+    كل عملية تمر بنفس قفل البوت (position_lock) فتتسلسل مع RiskMonitor وواجهات Flask.
+    can_open_position يحجز مقعداً ذرياً حتى open_position، فلا يتجاوز عاملان
+    max_positions معاً؛ العامل يحرر الحجز بـ release() في كل مسار لا يفتح صفقة،
+    و reservation_ttl_seconds شبكة أمان فقط إذا توقف العامل قبل ذلك
+
+    الخروج بنفس الطريقة: claim_exit يمنح عملية واحدة فقط (عامل أو RiskMonitor المنسق)
+    حق أمر SELL لصفقة مفتوحة حتى release_exit، فلا يتكرر البيع بين العمليات
+    """
+    def __init__(self, risk_manager, lock, trading_enabled=None, reservation_ttl_seconds=120):
+        self.risk_manager = risk_manager
+        self._lock = lock
+        self._trading_enabled = trading_enabled
+        self.reservation_ttl_seconds = reservation_ttl_seconds
+        self._reservations = {}
+        self._exit_claims = {}
+        self.stats = {'reserved': 0, 'rejected': 0, 'expired': 0, 'exit_claims': 0, 'exit_conflicts': 0}
+
+    def _prune(self):
+        now = time.time()
+        for symbol, reserved_at in list(self._reservations.items()):
+            if now - reserved_at >= self.reservation_ttl_seconds:
+                del self._reservations[symbol]
+                self.stats['expired'] += 1
+        for symbol, claimed_at in list(self._exit_claims.items()):
+            if now - claimed_at >= self.reservation_ttl_seconds:
+                del self._exit_claims[symbol]
+                self.stats['expired'] += 1
+
+    def is_trading_enabled(self):
+        return self._trading_enabled() if self._trading_enabled else True
+
+    def can_open_position(self, symbol):
+        with self._lock:
+            self._prune()
+            if symbol in self._reservations:
+                return False
+
+            max_positions = self.risk_manager.config['risk_management']['max_positions']
+            if len(self.risk_manager.get_open_positions()) + len(self._reservations) >= max_positions:
+                logger.warning(f"Cannot open position for {symbol} - max positions ({max_positions}) "
+                               f"reached including {len(self._reservations)} pending")
+                self.stats['rejected'] += 1
+                return False
+
+            if not self.risk_manager.can_open_position(symbol):
+                self.stats['rejected'] += 1
+                return False
+
+            self._reservations[symbol] = time.time()
+            self.stats['reserved'] += 1
+            return True
+
+    def release(self, symbol):
+        with self._lock:
+            self._reservations.pop(symbol, None)
+
+    def claim_exit(self, symbol):
+        """حق أمر الخروج لصفقة مفتوحة؛ False إذا كانت مطالَبة من عملية أخرى أو أُغلقت"""
+        with self._lock:
+            self._prune()
+            position = self.risk_manager.get_position(symbol)
+            if symbol in self._exit_claims or not position or position.get('status') != 'open':
+                self.stats['exit_conflicts'] += 1
+                return False
+
+            self._exit_claims[symbol] = time.time()
+            self.stats['exit_claims'] += 1
+            return True
+
+    def release_exit(self, symbol):
+        with self._lock:
+            self._exit_claims.pop(symbol, None)
+
+    def open_position(self, symbol, entry_price, quantity, signals, market_regime=None):
+        with self._lock:
+            self._reservations.pop(symbol, None)
+            return self.risk_manager.open_position(symbol, entry_price, quantity, signals, market_regime)
+
+    def open_futures_position(self, symbol, entry_price, quantity, position_type, signals, market_regime):
+        with self._lock:
+            self._reservations.pop(symbol, None)
+            return self.risk_manager.open_futures_position(
+                symbol, entry_price, quantity, position_type, signals, market_regime
+            )
+
+    def close_position(self, symbol, exit_price, reason):
+        with self._lock:
+            return self.risk_manager.close_position(symbol, exit_price, reason)
+
+    def close_futures_position(self, symbol, exit_price, reason):
+        with self._lock:
+            return self.risk_manager.close_futures_position(symbol, exit_price, reason)
+
+    def update_trailing_stop(self, symbol, current_price):
+        with self._lock:
+            return self.risk_manager.update_trailing_stop(symbol, current_price)
+
+    def check_trailing_stop(self, symbol, current_price):
+        with self._lock:
+            return self.risk_manager.check_trailing_stop(symbol, current_price)
+
+    def update_futures_trailing_stop(self, symbol, current_price):
+        with self._lock:
+            return self.risk_manager.update_futures_trailing_stop(symbol, current_price)
+
+    def calculate_position_size(self, symbol, current_price):
+        return self.risk_manager.calculate_position_size(symbol, current_price)
+
+    def calculate_futures_position_size(self, symbol, current_price, leverage=2):
+        return self.risk_manager.calculate_futures_position_size(symbol, current_price, leverage)
+
+    def get_open_positions(self):
+        with self._lock:
+            return self.risk_manager.get_open_positions()
+
+    def get_position(self, symbol):
+        with self._lock:
+            return self.risk_manager.get_position(symbol)
+
+    def get_stats(self):
+        with self._lock:
+            self._prune()
+            return {
+                **self.stats,
+                'open_positions': len(self.risk_manager.get_open_positions()),
+                'pending': sorted(self._reservations),
+                'exiting': sorted(self._exit_claims)
+            }
+
+class _LedgerServer(BaseManager):
+    pass
+
+class _LedgerClient(BaseManager):
+    pass
+
+_LedgerClient.register('ledger')
+_LedgerClient.register('statistics')
+
+def connect_ledger(address, authkey):
+    """
+    (وكيل الدفتر, وكيل StatisticsTracker) من عملية العامل
+    """
+    client = _LedgerClient(address=address, authkey=authkey)
+    client.connect()
+    return client.ledger(), client.statistics()
+
+class ShardCoordinator:
+    """
+    🧩 توزيع trading_pairs على عمليات مستقلة (عملية لكل Shard) لتجاوز نواة واحدة
+
+    المنسق (عملية Flask/gunicorn) يملك RiskManager و StatisticsTracker ويخدمهما
+    عبر قناة IPC محلية (BaseManager على 127.0.0.1 مع authkey عشوائي)؛ كل عامل
+    يشغّل خط التحليل الكامل لرموزه فقط، ويعيد تشغيله المنسق إذا توقف
+    """
+    def __init__(self, processes=2, host='127.0.0.1', port=0, supervise_interval_seconds=30,
+                 reservation_ttl_seconds=120):
+        self.processes = processes
+        self.host = host
+        self.port = port
+        self.supervise_interval_seconds = supervise_interval_seconds
+        self.reservation_ttl_seconds = reservation_ttl_seconds
+        self.authkey = secrets.token_bytes(16)
+        self.address = None
+        self.ledger = None
+        self.config_file = None
+        self.workers = {}
+
+    @classmethod
+    def from_config(cls, config):
+        sharding_config = config.get('sharding', {})
+        return cls(
+            processes=sharding_config.get('processes', 2),
+            host=sharding_config.get('host', '127.0.0.1'),
+            port=sharding_config.get('port', 0),
+            supervise_interval_seconds=sharding_config.get('supervise_interval_seconds', 30),
+            reservation_ttl_seconds=sharding_config.get('reservation_ttl_seconds', 120)
+        )
+
+    def serve(self, risk_manager, statistics, lock, trading_enabled=None):
+        """بدء خادم IPC في خيط خلفي داخل عملية المنسق"""
+        self.ledger = PositionLedger(risk_manager, lock, trading_enabled,
+                                     reservation_ttl_seconds=self.reservation_ttl_seconds)
+        _LedgerServer.register('ledger', callable=lambda: self.ledger)
+        _LedgerServer.register('statistics', callable=lambda: statistics)
+
+        server = _LedgerServer(address=(self.host, self.port), authkey=self.authkey).get_server()
+        self.address = server.address
+        threading.Thread(target=server.serve_forever, name='shard-ledger', daemon=True).start()
+        logger.info(f"📒 Position ledger serving shards on {self.address[0]}:{self.address[1]}")
+
+    def start_workers(self, trading_pairs, config_file):
+        self.config_file = config_file
+        for index, symbols in enumerate(shard_pairs(trading_pairs, self.processes)):
+            self._spawn(index, symbols)
+
+    def _spawn(self, index, symbols, restarts=0):
+        env = dict(os.environ, **{SHARD_ENV: str(index), AUTHKEY_ENV: self.authkey.hex()})
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__),
+             '--shard', str(index),
+             '--symbols', ','.join(symbols),
+             '--config', os.path.abspath(self.config_file),
+             '--address', f"{self.address[0]}:{self.address[1]}"],
+            env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        self.workers[index] = {'process': process, 'symbols': symbols, 'restarts': restarts}
+        logger.info(f"🧩 Shard {index} started (pid {process.pid}): {', '.join(symbols)}")
+
+    def supervise(self):
+        """إعادة تشغيل أي عامل توقف"""
+        for index, worker in list(self.workers.items()):
+            exit_code = worker['process'].poll()
+            if exit_code is not None:
+                logger.warning(f"⚠️ Shard {index} exited with code {exit_code} - restarting")
+                self._spawn(index, worker['symbols'], worker['restarts'] + 1)
+
+    def stop(self, timeout=10):
+        for worker in self.workers.values():
+            if worker['process'].poll() is None:
+                worker['process'].terminate()
+        for worker in self.workers.values():
+            try:
+                worker['process'].wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                worker['process'].kill()
+
+    def get_stats(self):
+        return {
+            'shards': {
+                index: {
+                    'pid': worker['process'].pid,
+                    'alive': worker['process'].poll() is None,
+                    'symbols': worker['symbols'],
+                    'restarts': worker['restarts']
+                }
+                for index, worker in self.workers.items()
+            },
+            'ledger': self.ledger.get_stats() if self.ledger else None
+        }
+
+def run_shard(argv=None):
+    """نقطة دخول عملية العامل"""
+    parser = argparse.ArgumentParser(description='Trading bot analysis shard')
+    parser.add_argument('--shard', type=int, required=True)
+    parser.add_argument('--symbols', required=True)
+    parser.add_argument('--config', default='config.json')
+    parser.add_argument('--address', required=True)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault(SHARD_ENV, str(args.shard))
+    host, port = args.address.rsplit(':', 1)
+    shard = {
+        'index': args.shard,
+        'symbols': args.symbols.split(','),
+        'address': (host, int(port)),
+        'authkey': bytes.fromhex(os.environ[AUTHKEY_ENV])
+    }
+
+    from main import BinanceTradingBot
+    BinanceTradingBot(args.config, shard=shard).run()
+
+if __name__ == '__main__':
+    run_shard()
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'started')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+class _NullStage:
+    """يُعاد عند تعطيل المحلل: لا توقيت ولا تخزين"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_STAGE = _NullStage()
+
+class StageProfiler:
+    """
+    ⏱️ توقيت كل مرحلة في الدورة (جلب الشموع، المؤشرات، تصويت السرب، السببية،
+    قاعدة البيانات، المشاعر...) مع مدرج متدحرج لآخر `window` قياس لكل مرحلة
+    و p50/p95/p99 عند الطلب
+
+    with profiler.stage('swarm_vote'): ...
+    عند التعطيل stage() يعيد NULL_STAGE المشترك فتكاد الكلفة تنعدم
+    """
+    def __init__(self, enabled=False, window=500):
+        self.enabled = enabled
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._iteration = {}
+        self.last_iteration = {}
+
+    @classmethod
+    def from_config(cls, config):
+        profiler_config = config.get('profiler', {})
+        return cls(
+            enabled=profiler_config.get('enabled', False),
+            window=profiler_config.get('window', 500)
+        )
+
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._iteration[name] = self._iteration.get(name, 0.0) + seconds
+
+    def begin_iteration(self):
+        with self._lock:
+            self._iteration = {}
+
+    def end_iteration(self):
+        """مجموع زمن كل مرحلة في الدورة المنتهية (ms)"""
+        with self._lock:
+            self.last_iteration = {name: round(seconds * 1000, 2) for name, seconds in self._iteration.items()}
+        return self.last_iteration
+
+    def percentiles(self):
+        with self._lock:
+            stages = {name: np.fromiter(samples, dtype=np.float64) for name, samples in self._samples.items()}
+
+        result = {}
+        for name, values in sorted(stages.items()):
+            if not len(values):
+                continue
+            p50, p95, p99 = np.percentile(values, (50, 95, 99)) * 1000
+            result[name] = {
+                'count': len(values),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(float(values.max()) * 1000, 3)
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples = {}
+            self._iteration = {}
+            self.last_iteration = {}
+
+    def get_stats(self):
+        return {
+            'enabled': self.enabled,
+            'window': self.window,
+            'stages': self.percentiles() if self.enabled else {},
+            'last_iteration_ms': self.last_iteration
+        }
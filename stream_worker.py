@@ -0,0 +1,141 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from logger_setup import setup_logger
+
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError:
+    websockets = None
+    WEBSOCKETS_AVAILABLE = False
+
+logger = setup_logger('stream_worker')
+
+class StreamWorker:
+    """
+    خيط خلفي يدير اتصال WebSocket واحد مع إعادة الاتصال التلقائية
+    """
+    def __init__(self, name, url_factory, on_message, on_connect=None,
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, ping_interval=20):
+        self.name = name
+        self.url_factory = url_factory
+        self.on_message = on_message
+        self.on_connect = on_connect
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.ping_interval = ping_interval
+
+        self.connected = False
+        self.last_message_time = None
+        self.messages_received = 0
+        self.reconnects = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._loop = None
+        self._ws = None
+
+    def start(self):
+        if not WEBSOCKETS_AVAILABLE:
+            logger.warning(f"⚠️ [{self.name}] websockets package not installed - stream disabled")
+            return False
+
+        if self._thread and self._thread.is_alive():
+            return True
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, name=f"stream-{self.name}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout=5):
+        self._stop_event.set()
+        if self._loop and self._ws is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        self.connected = False
+
+    def reconnect(self):
+        """إغلاق الاتصال الحالي لإجبار إعادة الاتصال برابط جديد من url_factory"""
+        if self._loop and self._ws is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(self._ws.close(), self._loop)
+            except Exception:
+                pass
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def seconds_since_last_message(self):
+        if self.last_message_time is None:
+            return None
+        return time.time() - self.last_message_time
+
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._consume_forever())
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _consume_forever(self):
+        delay = self.reconnect_delay
+
+        while not self._stop_event.is_set():
+            url = self.url_factory()
+            if not url:
+                await asyncio.sleep(delay)
+                continue
+
+            try:
+                async with websockets.connect(url, ping_interval=self.ping_interval, max_size=2 ** 22) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    delay = self.reconnect_delay
+                    logger.info(f"✅ [{self.name}] WebSocket connected")
+
+                    if self.on_connect:
+                        self.on_connect()
+
+                    async for raw in ws:
+                        self.last_message_time = time.time()
+                        self.messages_received += 1
+                        try:
+                            self.on_message(json.loads(raw))
+                        except Exception as e:
+                            logger.error(f"[{self.name}] Error handling stream message: {e}")
+
+                        if self._stop_event.is_set():
+                            break
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    logger.warning(f"⚠️ [{self.name}] WebSocket disconnected: {e}")
+            finally:
+                self._ws = None
+                self.connected = False
+
+            if self._stop_event.is_set():
+                break
+
+            self.reconnects += 1
+            sleep_for = delay + random.uniform(0, delay / 2)
+            logger.info(f"🔄 [{self.name}] Reconnecting in {sleep_for:.1f}s...")
+            await asyncio.sleep(sleep_for)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def get_stats(self):
+        return {
+            'connected': self.connected,
+            'messages_received': self.messages_received,
+            'reconnects': self.reconnects,
+            'seconds_since_last_message': self.seconds_since_last_message()
+        }
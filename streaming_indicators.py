@@ -0,0 +1,369 @@
+import math
+import sys
+import threading
+import time
+from collections import deque
+import numpy as np
+import pandas as pd
+from logger_setup import setup_logger
+from market_data_stream import INTERVAL_MS
+from indicator_snapshot import IndicatorSnapshot
+
+logger = setup_logger('streaming_indicators')
+
+NAN = float('nan')
+
+class RmaAccumulator:
+    """
+    متوسط Wilder بصيغة pandas_ta.rma:
+    ewm(alpha=1/length, adjust=True, min_periods=length).mean()
+    """
+    __slots__ = ('length', 'decay', 'numerator', 'denominator', 'count')
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.count = 0
+
+    def _step(self, x):
+        if math.isnan(x):
+            if self.count == 0:
+                return 0.0, 0.0, 0
+            # pandas (ignore_na=False): القيمة المفقودة تُضعف الأوزان السابقة فقط
+            return self.numerator * self.decay, self.denominator * self.decay, self.count
+        return self.numerator * self.decay + x, self.denominator * self.decay + 1.0, self.count + 1
+
+    def _value(self, numerator, denominator, count):
+        return numerator / denominator if count >= self.length else NAN
+
+    def peek(self, x):
+        return self._value(*self._step(x))
+
+    def push(self, x):
+        self.numerator, self.denominator, self.count = self._step(x)
+        return self._value(self.numerator, self.denominator, self.count)
+
+class EmaAccumulator:
+    """
+    pandas_ta.ema: أول قيمة = SMA لأول length عنصر، ثم ewm(span=length, adjust=False)
+    """
+    __slots__ = ('length', 'alpha', 'seed_sum', 'seed_count', 'value')
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed_sum = 0.0
+        self.seed_count = 0
+        self.value = None
+
+    def peek(self, x):
+        if self.value is not None:
+            return self.value + self.alpha * (x - self.value)
+        if self.seed_count + 1 == self.length:
+            return (self.seed_sum + x) / self.length
+        return NAN
+
+    def push(self, x):
+        result = self.peek(x)
+        if self.value is None:
+            self.seed_sum += x
+            self.seed_count += 1
+            if self.seed_count < self.length:
+                return NAN
+        self.value = result
+        return result
+
+class RollingWindow:
+    """نافذة بطول ثابت مع معاينة القيمة التالية بدون تعديل"""
+    __slots__ = ('length', 'values')
+
+    def __init__(self, length):
+        self.length = length
+        self.values = deque(maxlen=length)
+
+    def candidate(self, x):
+        """محتوى النافذة لو أُضيفت x، أو None قبل امتلائها"""
+        if len(self.values) + 1 < self.length:
+            return None
+        window = list(self.values)[1:] if len(self.values) == self.length else list(self.values)
+        window.append(x)
+        return window
+
+    def push(self, x):
+        self.values.append(x)
+
+def _mean(window):
+    return sum(window) / len(window) if window is not None else NAN
+
+def _population_std(window, mean):
+    return math.sqrt(sum((x - mean) ** 2 for x in window) / len(window))
+
+class SeriesIndicatorState:
+    """
+    حالة المؤشرات لسلسلة (symbol, interval) واحدة
+    الشموع المغلقة تُضاف في O(1)، والشمعة الجارية تُحسب كمعاينة فقط
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.last_open_time = None
+        self.latest_values = None
+        self.prev_high = None
+        self.prev_low = None
+        self.prev_close = None
+
+        self.rsi_gain = RmaAccumulator(settings['rsi_period'])
+        self.rsi_loss = RmaAccumulator(settings['rsi_period'])
+
+        self.stoch_high = RollingWindow(settings['stochastic_period'])
+        self.stoch_low = RollingWindow(settings['stochastic_period'])
+        self.stoch_raw = RollingWindow(settings['stoch_smooth_k'])
+        self.stoch_k = RollingWindow(settings['stoch_d'])
+
+        self.bb_window = RollingWindow(settings['bb_period'])
+
+        self.macd_fast = EmaAccumulator(settings['macd_fast'])
+        self.macd_slow = EmaAccumulator(settings['macd_slow'])
+        self.macd_signal = EmaAccumulator(settings['macd_signal'])
+
+        self.ema_short = EmaAccumulator(settings['ema_short'])
+        self.ema_long = EmaAccumulator(settings['ema_long'])
+
+        self.atr = RmaAccumulator(settings['adx_period'])
+        self.dm_plus = RmaAccumulator(settings['adx_period'])
+        self.dm_minus = RmaAccumulator(settings['adx_period'])
+        self.adx = RmaAccumulator(settings['adx_period'])
+
+    def _compute(self, high, low, close, commit):
+        """
+        حساب كل المؤشرات لشمعة جديدة؛ commit=False يترك الحالة كما هي
+        """
+        op = 'push' if commit else 'peek'
+        values = {}
+
+        # RSI
+        if self.prev_close is None:
+            gain = loss = NAN
+        else:
+            change = close - self.prev_close
+            gain = max(change, 0.0)
+            loss = -min(change, 0.0)
+        avg_gain = getattr(self.rsi_gain, op)(gain)
+        avg_loss = getattr(self.rsi_loss, op)(loss)
+        total = avg_gain + avg_loss
+        values['rsi'] = 100.0 * avg_gain / total if total else NAN
+
+        # Stochastic
+        highs = self.stoch_high.candidate(high)
+        lows = self.stoch_low.candidate(low)
+        raw = NAN
+        if highs is not None:
+            highest, lowest = max(highs), min(lows)
+            price_range = (highest - lowest) or sys.float_info.epsilon
+            raw = 100.0 * (close - lowest) / price_range
+        raw_window = self.stoch_raw.candidate(raw) if not math.isnan(raw) else None
+        stoch_k = _mean(raw_window)
+        k_window = self.stoch_k.candidate(stoch_k) if not math.isnan(stoch_k) else None
+        values['stoch_k'] = stoch_k
+        values['stoch_d'] = _mean(k_window)
+
+        # Bollinger Bands (ddof=0 كما في pandas_ta)
+        bb = self.bb_window.candidate(close)
+        if bb is not None:
+            middle = _mean(bb)
+            deviation = self.settings['bb_std'] * _population_std(bb, middle)
+            values['bb_upper'], values['bb_middle'], values['bb_lower'] = middle + deviation, middle, middle - deviation
+        else:
+            values['bb_upper'] = values['bb_middle'] = values['bb_lower'] = NAN
+
+        # MACD - الإشارة تبدأ من أول قيمة MACD صالحة
+        fast = getattr(self.macd_fast, op)(close)
+        slow = getattr(self.macd_slow, op)(close)
+        macd = fast - slow
+        signal = getattr(self.macd_signal, op)(macd) if not math.isnan(macd) else NAN
+        values['macd'], values['macd_signal'], values['macd_hist'] = macd, signal, macd - signal
+
+        # EMA
+        values['ema_short'] = getattr(self.ema_short, op)(close)
+        values['ema_long'] = getattr(self.ema_long, op)(close)
+
+        # ADX
+        if self.prev_close is None:
+            true_range = plus = minus = NAN
+        else:
+            true_range = max((high - low) or sys.float_info.epsilon,
+                             abs(high - self.prev_close), abs(self.prev_close - low))
+            up = high - self.prev_high
+            down = self.prev_low - low
+            plus = up if up > down and up > 0 else 0.0
+            minus = down if down > up and down > 0 else 0.0
+        atr = getattr(self.atr, op)(true_range)
+        dmp = 100.0 * getattr(self.dm_plus, op)(plus) / atr
+        dmn = 100.0 * getattr(self.dm_minus, op)(minus) / atr
+        dm_total = dmp + dmn
+        dx = 100.0 * abs(dmp - dmn) / dm_total if dm_total else NAN
+        values['adx'] = getattr(self.adx, op)(dx)
+        values['dmp'], values['dmn'] = dmp, dmn
+
+        if commit:
+            self.stoch_high.push(high)
+            self.stoch_low.push(low)
+            if not math.isnan(raw):
+                self.stoch_raw.push(raw)
+            if not math.isnan(stoch_k):
+                self.stoch_k.push(stoch_k)
+            self.bb_window.push(close)
+            self.prev_high, self.prev_low, self.prev_close = high, low, close
+
+        return values
+
+    def push(self, open_time, high, low, close):
+        self.last_open_time = open_time
+        self.latest_values = self._compute(high, low, close, commit=True)
+        return self.latest_values
+
+    def preview(self, high, low, close):
+        return self._compute(high, low, close, commit=False)
+
+class StreamingIndicatorEngine:
+    """
+    ⚡ محرك مؤشرات تدفقي لكل (symbol, interval)
+
+    بدلاً من إعادة حساب pandas_ta على كل الشموع في كل دورة، تُضاف كل شمعة
+    مغلقة إلى مُراكمات Wilder/EMA ونوافذ متدحرجة مرة واحدة (O(1))، وتُحسب
+    الشمعة الجارية فقط كمعاينة. عند البداية أو وجود فجوة يُعاد البناء من
+    النافذة المتاحة. النتائج تطابق pandas_ta على نفس تاريخ الشموع.
+
+    التسامح: المؤشرات ذات النوافذ المنتهية (Stochastic, Bollinger) تطابق إعادة
+    حساب آخر نافذة (~1e-9). المؤشرات التراكمية (RSI, MACD, EMA, ADX/DMI) تطابق
+    إعادة الحساب على كل التاريخ الذي رآه المحرك (~1e-9)، لكنها تختلف عن
+    إعادة حساب نافذة من 100 شمعة لأن أثر البداية يتلاشى تدريجياً: حتى نقطة
+    واحدة للمذبذبات (0-100) وحتى 0.2% من السعر لـ EMA/MACD
+    (مثلاً ema_long=50). tests/test_indicator_engines.py يتحقق من الحدود.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+        self.stats = {
+            'updates': 0,
+            'candles_committed': 0,
+            'reseeds': 0,
+            'previews': 0
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        indicators = config['indicators']
+        return cls({
+            'rsi_period': indicators['rsi_period'],
+            'stochastic_period': indicators['stochastic_period'],
+            'stoch_smooth_k': indicators.get('stoch_smooth_k', 3),
+            'stoch_d': indicators.get('stoch_d', 3),
+            'bb_period': indicators['bb_period'],
+            'bb_std': indicators['bb_std'],
+            'macd_fast': indicators['macd_fast'],
+            'macd_slow': indicators['macd_slow'],
+            'macd_signal': indicators['macd_signal'],
+            'ema_short': indicators['ema_short'],
+            'ema_long': indicators['ema_long'],
+            'adx_period': indicators['adx_period']
+        })
+
+    def _series_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _is_contiguous(state, open_times, closed_count, interval_ms):
+        """هل تكمل النافذة الحالية الحالة المخزنة بدون فجوة؟"""
+        if state.last_open_time is None:
+            return False
+        begin = int(np.searchsorted(open_times, state.last_open_time, side='right'))
+        if begin > closed_count:
+            return False
+        if begin > 0:
+            return int(open_times[begin - 1]) == state.last_open_time
+        return bool(interval_ms) and int(open_times[0]) == state.last_open_time + interval_ms
+
+    def _reseed(self, key, open_times, highs, lows, closes, closed_count):
+        self.stats['reseeds'] += 1
+        state = SeriesIndicatorState(self.settings)
+        values = None
+        # تحويل واحد إلى قوائم Python أسرع من فهرسة numpy عنصراً عنصراً
+        open_times, highs, lows, closes = (column[:closed_count].tolist()
+                                           for column in (open_times, highs, lows, closes))
+        for i in range(closed_count):
+            values = state.push(int(open_times[i]), highs[i], lows[i], closes[i])
+        self._states[key] = state
+        return state, values
+
+    def update(self, symbol, interval, arrays, now_ms=None):
+        """
+        تحديث السلسلة من arrays (صيغة KlineStore) وإرجاع آخر القيم
+        بنفس مفاتيح TechnicalIndicators.get_latest_values، أو None
+        """
+        n = len(arrays['close'])
+        if n == 0:
+            return None
+
+        key = (symbol, interval)
+        interval_ms = INTERVAL_MS.get(interval)
+        now_ms = now_ms if now_ms is not None else time.time() * 1000
+
+        open_times = arrays['open_time']
+        highs = arrays['high']
+        lows = arrays['low']
+        closes = arrays['close']
+        closed_count = n if arrays['close_time'][-1] < now_ms else n - 1
+
+        with self._series_lock(key):
+            self.stats['updates'] += 1
+            state = self._states.get(key)
+            values = None
+
+            if state is None or not self._is_contiguous(state, open_times, closed_count, interval_ms):
+                state, values = self._reseed(key, open_times, highs, lows, closes, closed_count)
+            else:
+                begin = int(np.searchsorted(open_times, state.last_open_time, side='right'))
+                for i in range(begin, closed_count):
+                    values = state.push(int(open_times[i]), float(highs[i]), float(lows[i]), float(closes[i]))
+                    self.stats['candles_committed'] += 1
+
+            last = n - 1
+            if closed_count < n:
+                self.stats['previews'] += 1
+                values = state.preview(float(highs[last]), float(lows[last]), float(closes[last]))
+            elif values is None:
+                # لا شموع جديدة منذ آخر استدعاء
+                values = state.latest_values
+
+        if values is None:
+            return None
+
+        return IndicatorSnapshot(
+            pd.Timestamp(int(arrays['close_time'][last]), unit='ms'),
+            float(closes[last]),
+            float(arrays['volume'][last]),
+            **values
+        )
+
+    def reset(self, symbol=None, interval=None):
+        with self._lock:
+            for key in list(self._states):
+                if (symbol is None or key[0] == symbol) and (interval is None or key[1] == interval):
+                    del self._states[key]
+
+    def get_stats(self):
+        updates = self.stats['updates']
+        return {
+            **self.stats,
+            'series': len(self._states),
+            'candles_per_update': round(self.stats['candles_committed'] / updates, 3) if updates else 0.0
+        }
@@ -66,6 +66,13 @@ class WorkerBotConfig:
     
     volume_threshold: float = 1.5
     initial_balance: float = 1000.0
+    
+    @property
+    def indicator_params(self) -> Tuple:
+        """مفتاح متغير المؤشرات الذي يقرأه هذا البوت من IndicatorBank"""
+        return (self.rsi_period, self.stoch_k, self.stoch_d, self.bb_period, self.bb_std,
+                self.macd_fast, self.macd_slow, self.macd_signal,
+                self.ema_fast, self.ema_medium, self.ema_slow)
 
 
 @dataclass
@@ -186,11 +193,17 @@ class WorkerBot:
             return "SELL"
         return None
     
+    @staticmethod
+    def _macd_lines(data) -> tuple:
+        """(macd, signal) من dict متداخل {'macd': {...}} أو حقول مسطحة (FeatureSnapshot)"""
+        macd = data.get('macd', 0)
+        if isinstance(macd, dict):
+            return macd.get('macd', 0), macd.get('signal', 0)
+        return macd, data.get('macd_signal', 0)
+    
     def _analyze_macd_only(self, data: Dict) -> Optional[str]:
         """استراتيجية MACD فقط"""
-        macd = data.get('macd', {})
-        macd_line = macd.get('macd', 0)
-        signal_line = macd.get('signal', 0)
+        macd_line, signal_line = self._macd_lines(data)
         
         if macd_line > signal_line and macd_line < 0:
             return "BUY"
@@ -255,12 +268,10 @@ class WorkerBot:
     
     def _analyze_macd_bb_combo(self, data: Dict) -> Optional[str]:
         """استراتيجية MACD + Bollinger Bands"""
-        macd = data.get('macd', {})
         price = data.get('price', 0)
         bb_lower = data.get('bb_lower', 0)
         
-        macd_line = macd.get('macd', 0)
-        signal_line = macd.get('signal', 0)
+        macd_line, signal_line = self._macd_lines(data)
         
         if macd_line > signal_line and price <= bb_lower * 1.01:
             return "BUY"
@@ -527,10 +538,15 @@ class SwarmManager:
         ]
         
         timeframes = ["5m", "15m", "1h", "4h"]
+        periods = [14, 9, 21]
+        ema_sets = [(9, 21, 50), (12, 26, 50), (5, 13, 34)]
         
         for i in range(self.num_workers):
             strategy = strategies[i % len(strategies)]
             timeframe = timeframes[i % len(timeframes)]
+            # نفس الاستراتيجية تتكرر بمعاملات مختلفة في كل دورة على قائمة الاستراتيجيات
+            variant = i // len(strategies)
+            ema_fast, ema_medium, ema_slow = ema_sets[variant % len(ema_sets)]
             
             config = WorkerBotConfig(
                 bot_id=i + 1,
@@ -540,7 +556,12 @@ class SwarmManager:
                 rsi_sell_threshold=70 + (i % 5) * 2,
                 stoch_buy=15 + (i % 4) * 3,
                 stoch_sell=75 + (i % 4) * 3,
-                bb_std=1.5 + (i % 5) * 0.2,
+                bb_std=round(1.5 + (i % 5) * 0.2, 1),
+                rsi_period=periods[variant % len(periods)],
+                stoch_k=periods[(variant * 2) % len(periods)],
+                ema_fast=ema_fast,
+                ema_medium=ema_medium,
+                ema_slow=ema_slow,
                 volume_threshold=1.2 + (i % 6) * 0.1
             )
             
@@ -549,9 +570,17 @@ class SwarmManager:
         
         logger.info(f"✅ Swarm initialized with {len(self.workers)} workers")
     
-    def conduct_vote(self, symbol: str, market_data: Dict) -> SwarmVote:
+    @staticmethod
+    def _worker_data(worker: WorkerBot, market_data: Dict, variants: Optional[Dict]) -> Dict:
+        """متغير المؤشرات الخاص بالبوت من IndicatorBank إن وُجد"""
+        if variants:
+            return variants.get(worker.config.indicator_params, market_data)
+        return market_data
+    
+    def conduct_vote(self, symbol: str, market_data: Dict, variants: Optional[Dict] = None) -> SwarmVote:
         """
         إجراء تصويت جماعي من جميع البوتات
+        variants: {indicator_params: market_data} من IndicatorBank.variants
         """
         buy_votes = 0
         sell_votes = 0
@@ -564,7 +593,7 @@ class SwarmManager:
         for worker in self.workers:
             worker.update_vote_weight()
             
-            signal = worker.get_vote_signal(symbol, market_data)
+            signal = worker.get_vote_signal(symbol, self._worker_data(worker, market_data, variants))
             weight = worker.performance.vote_weight
             
             if signal == "BUY":
@@ -627,7 +656,7 @@ class SwarmManager:
         
         return vote
     
-    def run_paper_trading_cycle(self, symbol: str, market_data: Dict):
+    def run_paper_trading_cycle(self, symbol: str, market_data: Dict, variants: Optional[Dict] = None):
         """
         دورة تداول افتراضي لجميع البوتات
         """
@@ -637,7 +666,7 @@ class SwarmManager:
             return
         
         for worker in self.workers:
-            signal = worker.get_vote_signal(symbol, market_data)
+            signal = worker.get_vote_signal(symbol, self._worker_data(worker, market_data, variants))
             
             if signal:
                 worker.execute_paper_trade(symbol, signal, price)
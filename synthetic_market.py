@@ -0,0 +1,187 @@
+import time
+import zlib
+import numpy as np
+import pandas as pd
+from logger_setup import setup_logger
+from market_data_stream import INTERVAL_MS
+
+logger = setup_logger('synthetic_market')
+
+REGIMES = ('bull', 'bear', 'sideways')
+REGIME_INDEX = {name: i for i, name in enumerate(REGIMES)}
+
+DEFAULT_BASE_PRICES = {
+    'BTCUSDT': 95000,
+    'ETHUSDT': 3200,
+    'SOLUSDT': 220,
+    'XRPUSDT': 0.65,
+    'BNBUSDT': 620
+}
+
+# العائد المتوقع والتقلب لكل حالة سوق (لكل يوم)
+DEFAULT_REGIME_PARAMS = {
+    'bull': {'drift': 0.004, 'volatility': 0.03},
+    'bear': {'drift': -0.005, 'volatility': 0.04},
+    'sideways': {'drift': 0.0, 'volatility': 0.015}
+}
+
+DAY_MS = 86_400_000
+
+class SyntheticPath:
+    """
+    مولد عوائد لرمز واحد يحتفظ بحالته (حالة السوق + التقلب الكامن)
+    بحيث تكمل الاستدعاءات المتتالية نفس المسار
+    """
+    def __init__(self, rng, dt_days, regime_params, switch_probability, vol_persistence,
+                 vol_of_vol, tail_df, regime=None):
+        self.rng = rng
+        self.switch_probability = switch_probability
+        self.vol_persistence = vol_persistence
+        self.vol_of_vol = vol_of_vol
+        self.tail_df = tail_df
+
+        self.drift = np.array([regime_params[name]['drift'] * dt_days for name in REGIMES])
+        self.sigma = np.array([regime_params[name]['volatility'] * np.sqrt(dt_days) for name in REGIMES])
+
+        self.regime = REGIME_INDEX[regime] if regime else int(rng.integers(len(REGIMES)))
+        # نبدأ التقلب الكامن من توزيعه المستقر
+        self.log_vol = float(rng.normal(0.0, vol_of_vol))
+
+    def _regimes(self, n):
+        # سلسلة ماركوف: عند كل تبديل ننتقل لإحدى الحالتين الأخريين بالتساوي
+        switches = self.rng.random(n) < self.switch_probability
+        steps = self.rng.integers(1, len(REGIMES), n) * switches
+        regimes = (self.regime + np.cumsum(steps)) % len(REGIMES)
+        self.regime = int(regimes[-1])
+        return regimes
+
+    def _log_volatility(self, n):
+        # AR(1) للوغاريتم التقلب: h_t = phi*h_{t-1} + (1-phi)*e_t (تجميع التقلب)
+        phi = self.vol_persistence
+        shocks = self.rng.normal(0.0, self.vol_of_vol * np.sqrt((1 + phi) / (1 - phi)), n)
+        shocks[0] = phi * self.log_vol + (1 - phi) * shocks[0]
+        log_vol = pd.Series(shocks).ewm(alpha=1 - phi, adjust=False).mean().to_numpy()
+        self.log_vol = float(log_vol[-1])
+        return log_vol
+
+    def next_returns(self, n):
+        """
+        Returns: (log_returns, volatility, regimes) لأول n شمعة تالية
+        """
+        regimes = self._regimes(n)
+        volatility = self.sigma[regimes] * np.exp(self._log_volatility(n) - self.vol_of_vol ** 2)
+
+        # ذيول ثقيلة (Student-t) بتباين واحد
+        shocks = self.rng.standard_t(self.tail_df, n) * np.sqrt((self.tail_df - 2) / self.tail_df)
+        returns = self.drift[regimes] - 0.5 * volatility ** 2 + volatility * shocks
+        return returns, volatility, regimes
+
+class SyntheticMarket:
+    """
+    🧪 مولد سوق اصطناعي متجه (NumPy) وقابل للتكرار
+
+    مسار سعر هندسي عشوائي مع تبديل حالات السوق (bull/bear/sideways)
+    وتجميع التقلب، بنفس صيغ KlineStore وصفوف REST من Binance.
+    نفس seed + symbol + interval => نفس الشموع دائماً.
+    """
+    def __init__(self, seed=42, base_prices=None, regime_params=None, mean_regime_days=5.0,
+                 vol_half_life_hours=12.0, vol_of_vol=0.5, tail_df=4.0):
+        self.seed = seed
+        self.base_prices = dict(DEFAULT_BASE_PRICES)
+        self.base_prices.update(base_prices or {})
+        self.regime_params = dict(DEFAULT_REGIME_PARAMS)
+        self.regime_params.update(regime_params or {})
+        self.mean_regime_days = mean_regime_days
+        self.vol_half_life_hours = vol_half_life_hours
+        self.vol_of_vol = vol_of_vol
+        self.tail_df = tail_df
+
+    def _rng(self, symbol, interval):
+        return np.random.default_rng([self.seed, zlib.crc32(symbol.encode()), zlib.crc32(interval.encode())])
+
+    def path(self, symbol, interval='1m', regime=None, rng=None):
+        dt_days = INTERVAL_MS[interval] / DAY_MS
+        return SyntheticPath(
+            rng if rng is not None else self._rng(symbol, interval),
+            dt_days,
+            self.regime_params,
+            switch_probability=min(1.0, dt_days / self.mean_regime_days),
+            vol_persistence=0.5 ** (dt_days * 24 / self.vol_half_life_hours),
+            vol_of_vol=self.vol_of_vol,
+            tail_df=self.tail_df,
+            regime=regime
+        )
+
+    def generate(self, symbol, n, interval='1m', end_time_ms=None, regime=None):
+        """
+        توليد n شمعة تنتهي عند end_time_ms (الافتراضي: الآن)
+        Returns: dict من الأعمدة (float64) بنفس حقول KlineStore + 'regime'
+        """
+        interval_ms = INTERVAL_MS[interval]
+        path = self.path(symbol, interval, regime)
+        rng = path.rng
+        returns, volatility, regimes = path.next_returns(n)
+
+        base_price = self.base_prices.get(symbol, 100)
+        close = base_price * np.exp(np.cumsum(returns))
+        open_ = np.empty(n)
+        open_[0] = base_price
+        open_[1:] = close[:-1]
+
+        # طول الظلال يتناسب مع تقلب الشمعة
+        high = np.maximum(open_, close) * np.exp(np.abs(rng.normal(0.0, 0.5, n)) * volatility)
+        low = np.minimum(open_, close) * np.exp(-np.abs(rng.normal(0.0, 0.5, n)) * volatility)
+
+        # الحجم يرتفع مع التقلب وحجم الحركة
+        activity = volatility / path.sigma[regimes] * (1 + np.abs(returns) / volatility)
+        volume = rng.lognormal(np.log(1000.0), 0.4, n) * activity * (100.0 / base_price) ** 0.5
+        taker_ratio = np.clip(0.5 + 0.1 * returns / volatility, 0.05, 0.95)
+        typical = (open_ + close) / 2
+
+        if end_time_ms is None:
+            end_time_ms = int(time.time() * 1000)
+        last_open = end_time_ms // interval_ms * interval_ms
+        open_time = last_open - np.arange(n - 1, -1, -1, dtype=np.float64) * interval_ms
+
+        return {
+            'open_time': open_time,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume,
+            'close_time': open_time + interval_ms - 1,
+            'quote_volume': volume * typical,
+            'trades': np.maximum(1.0, np.round(volume * 0.3)),
+            'taker_buy_base': volume * taker_ratio,
+            'taker_buy_quote': volume * taker_ratio * typical,
+            'regime': regimes
+        }
+
+    def generate_many(self, symbols, n, interval='1m', end_time_ms=None):
+        """توليد n شمعة لكل رمز؛ مسار كل رمز مستقل عن بقية القائمة"""
+        if end_time_ms is None:
+            end_time_ms = int(time.time() * 1000)
+        return {symbol: self.generate(symbol, n, interval, end_time_ms) for symbol in symbols}
+
+    def generate_klines(self, symbol, limit=100, interval='1m', end_time_ms=None):
+        """نفس المسار بصيغة صفوف REST من /api/v3/klines"""
+        arrays = self.generate(symbol, limit, interval, end_time_ms)
+        columns = zip(
+            arrays['open_time'].astype(np.int64).tolist(),
+            arrays['open'].tolist(),
+            arrays['high'].tolist(),
+            arrays['low'].tolist(),
+            arrays['close'].tolist(),
+            arrays['volume'].tolist(),
+            arrays['close_time'].astype(np.int64).tolist(),
+            arrays['quote_volume'].tolist(),
+            arrays['trades'].astype(np.int64).tolist(),
+            arrays['taker_buy_base'].tolist(),
+            arrays['taker_buy_quote'].tolist()
+        )
+        return [
+            [open_time, f"{o:.8f}", f"{h:.8f}", f"{l:.8f}", f"{c:.8f}", f"{v:.8f}",
+             close_time, f"{qv:.8f}", trades, f"{tb:.8f}", f"{tq:.8f}", "0"]
+            for open_time, o, h, l, c, v, close_time, qv, trades, tb, tq in columns
+        ]
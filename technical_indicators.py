@@ -2,14 +2,76 @@ import pandas as pd
 import numpy as np
 import pandas_ta as ta
 from logger_setup import setup_logger
+from indicator_kernels import IndicatorKernels
+from indicator_snapshot import IndicatorSnapshot
 
 logger = setup_logger('technical_indicators')
 
 class TechnicalIndicators:
     def __init__(self, config):
         self.config = config
+        self.engine_mode = config.get('indicator_engine', {}).get('mode', 'pandas')
+        self.kernels = IndicatorKernels.from_config(config)
+        self.streaming_engine = None
+        self.result_cache = None
+        self.demand = None
+    
+    def attach_streaming_engine(self, streaming_engine):
+        self.streaming_engine = streaming_engine
+    
+    def attach_result_cache(self, result_cache):
+        self.result_cache = result_cache
+    
+    def attach_demand(self, demand):
+        self.demand = demand
+    
+    def demanded_groups(self, interval):
+        return self.demand.groups(interval) if self.demand and interval else None
+    
+    def trend_for(self, indicators, interval):
+        """الاتجاه فقط إذا كان له مستهلك على هذا الإطار"""
+        if self.demand and interval and not self.demand.needs_trend(interval):
+            return None
+        return self.classify_trend(indicators)
+    
+    def analyze(self, klines, symbol=None, interval=None):
+        """
+        آخر قيم المؤشرات + الاتجاه
+        يستخدم المحرك التدفقي عند توفره (تحديث O(1) لكل شمعة)، ثم نوى NumPy
+        (mode = numpy)، وإلا pandas_ta؛ ومع result_cache لا يُعاد الحساب لنفس الشمعة المغلقة
+        Returns: (indicators, trend) أو None
+        """
+        if self.result_cache and symbol and isinstance(klines, dict):
+            return self.result_cache.get_or_compute(
+                symbol, interval, klines, lambda arrays: self._analyze(arrays, symbol, interval)
+            )
+        return self._analyze(klines, symbol, interval)
+    
+    def _analyze(self, klines, symbol=None, interval=None):
+        groups = self.demanded_groups(interval)
+        if self.streaming_engine and symbol and isinstance(klines, dict):
+            indicators = self.streaming_engine.update(symbol, interval, klines)
+        elif self.engine_mode == 'numpy':
+            indicators = self.kernels.latest_values(klines, groups)
+        else:
+            indicators = self.get_latest_values(self.calculate_all_indicators(klines, groups))
+        
+        if indicators is None:
+            return None
+        return indicators, self.trend_for(indicators, interval)
+    
+    def analyze_batch(self, klines_by_symbol, interval=None):
+        """
+        تحليل كل الرموز لنفس الإطار الزمني في تمريرة NumPy واحدة
+        Returns: {symbol: (indicators, trend)}
+        """
+        batch = self.kernels.latest_values_batch(klines_by_symbol, self.demanded_groups(interval))
+        return {symbol: (indicators, self.trend_for(indicators, interval)) for symbol, indicators in batch.items()}
     
     def prepare_dataframe(self, klines):
+        if isinstance(klines, dict):
+            return self.prepare_dataframe_from_arrays(klines)
+        
         try:
             df = pd.DataFrame(klines, columns=[
                 'open_time', 'open', 'high', 'low', 'close', 'volume',
@@ -28,6 +90,23 @@ class TechnicalIndicators:
             logger.error(f"Error preparing dataframe: {e}")
             return None
     
+    def prepare_dataframe_from_arrays(self, arrays):
+        """بناء DataFrame مباشرة من views الـ float64 في KlineStore بدون تحليل نصوص"""
+        try:
+            df = pd.DataFrame({
+                'open_time': pd.to_datetime(arrays['open_time'], unit='ms'),
+                'open': arrays['open'],
+                'high': arrays['high'],
+                'low': arrays['low'],
+                'close': arrays['close'],
+                'volume': arrays['volume'],
+                'close_time': pd.to_datetime(arrays['close_time'], unit='ms')
+            }, copy=False)
+            return df
+        except Exception as e:
+            logger.error(f"Error preparing dataframe from arrays: {e}")
+            return None
+    
     def calculate_rsi(self, df):
         try:
             rsi_period = self.config['indicators']['rsi_period']
@@ -40,9 +119,11 @@ class TechnicalIndicators:
     def calculate_stochastic(self, df):
         try:
             stoch_period = self.config['indicators']['stochastic_period']
-            stoch = ta.stoch(df['high'], df['low'], df['close'], k=stoch_period, d=3, smooth_k=3)
-            df['stoch_k'] = stoch['STOCHk_14_3_3']
-            df['stoch_d'] = stoch['STOCHd_14_3_3']
+            stoch_d = self.config['indicators'].get('stoch_d', 3)
+            smooth_k = self.config['indicators'].get('stoch_smooth_k', 3)
+            stoch = ta.stoch(df['high'], df['low'], df['close'], k=stoch_period, d=stoch_d, smooth_k=smooth_k)
+            df['stoch_k'] = stoch[f'STOCHk_{stoch_period}_{stoch_d}_{smooth_k}']
+            df['stoch_d'] = stoch[f'STOCHd_{stoch_period}_{stoch_d}_{smooth_k}']
             return df
         except Exception as e:
             logger.error(f"Error calculating Stochastic: {e}")
@@ -114,17 +195,22 @@ class TechnicalIndicators:
             logger.error(f"Error calculating ADX: {e}")
             return df
     
-    def calculate_all_indicators(self, klines):
+    def calculate_all_indicators(self, klines, groups=None):
         df = self.prepare_dataframe(klines)
         if df is None or df.empty:
             return None
         
-        df = self.calculate_rsi(df)
-        df = self.calculate_stochastic(df)
-        df = self.calculate_bollinger_bands(df)
-        df = self.calculate_macd(df)
-        df = self.calculate_ema(df)
-        df = self.calculate_adx(df)
+        calculators = {
+            'rsi': self.calculate_rsi,
+            'stoch': self.calculate_stochastic,
+            'bbands': self.calculate_bollinger_bands,
+            'macd': self.calculate_macd,
+            'ema': self.calculate_ema,
+            'adx': self.calculate_adx
+        }
+        for group, calculate in calculators.items():
+            if groups is None or group in groups:
+                df = calculate(df)
         
         return df
     
@@ -132,33 +218,18 @@ class TechnicalIndicators:
         if df is None or df.empty:
             return None
         
-        latest = df.iloc[-1]
-        return {
-            'timestamp': latest['close_time'],
-            'close': latest['close'],
-            'volume': latest['volume'],
-            'rsi': latest['rsi'],
-            'stoch_k': latest['stoch_k'],
-            'stoch_d': latest['stoch_d'],
-            'bb_upper': latest['bb_upper'],
-            'bb_middle': latest['bb_middle'],
-            'bb_lower': latest['bb_lower'],
-            'macd': latest['macd'],
-            'macd_signal': latest['macd_signal'],
-            'macd_hist': latest['macd_hist'],
-            'ema_short': latest['ema_short'],
-            'ema_long': latest['ema_long'],
-            'adx': latest['adx'],
-            'dmp': latest['dmp'],
-            'dmn': latest['dmn']
-        }
+        latest = df.iloc[-1].to_dict()
+        latest['timestamp'] = latest['close_time']
+        # المؤشرات التي لم يطلبها أي مستهلك (IndicatorDemand) تبقى NaN
+        return IndicatorSnapshot.from_mapping(latest)
     
     def analyze_trend(self, df):
         if df is None or df.empty:
             return 'neutral'
         
-        latest = df.iloc[-1]
-        
+        return self.classify_trend(df.iloc[-1])
+    
+    def classify_trend(self, latest):
         ema_bullish = latest['ema_short'] > latest['ema_long']
         price_above_ema = latest['close'] > latest['ema_long']
         adx_strong = latest['adx'] > self.config['indicators']['adx_threshold']
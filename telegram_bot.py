@@ -33,6 +33,7 @@ class TelegramBotController:
         self.application.add_handler(CommandHandler("positions", self.positions_command))
         self.application.add_handler(CommandHandler("regime", self.regime_command))
         self.application.add_handler(CommandHandler("logs", self.logs_command))
+        self.application.add_handler(CommandHandler("metrics", self.metrics_command))
         self.application.add_handler(CommandHandler("help", self.help_command))
         self.application.add_handler(CommandHandler("analyze", self.ai_analyze_command))
         self.application.add_handler(CommandHandler("audit", self.ai_audit_command))
@@ -237,8 +238,9 @@ class TelegramBotController:
 
 """
             
+            snapshot = self.bot.price_snapshot.get_snapshot()
             for symbol, pos in positions.items():
-                current_price = self.bot.binance_client.get_current_price(symbol)
+                current_price = self.bot.price_snapshot.get_price(symbol, snapshot)
                 profit_pct = ((current_price - pos['entry_price']) / pos['entry_price'] * 100) if current_price else 0
                 profit_emoji = "🟢" if profit_pct > 0 else "🔴"
                 
@@ -389,6 +391,42 @@ class TelegramBotController:
             logger.error(f"Error in logs_command: {e}")
             await update.message.reply_text(f"❌ خطأ في جلب السجلات: {str(e)}")
     
+    async def metrics_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self.is_authorized(update):
+            await update.message.reply_text("⛔ عذراً، غير مصرح لك باستخدام هذا البوت")
+            return
+        
+        try:
+            profiler = self.bot.profiler
+            if not profiler.enabled:
+                await update.message.reply_text("⚠️ محلل المراحل غير مفعل (profiler.enabled في config.json)")
+                return
+            
+            stages = profiler.percentiles()
+            ranked = sorted(
+                ((name, stats) for name, stats in stages.items() if not name.startswith('symbol.')),
+                key=lambda item: item[1]['p95_ms'], reverse=True
+            )
+            
+            message = """
+⏱️ زمن مراحل الدورة (ms)
+━━━━━━━━━━━━━━━━━━━━
+
+المرحلة  p50 / p95 / p99
+"""
+            for name, stats in ranked[:15]:
+                message += f"{name}: {stats['p50_ms']:.1f} / {stats['p95_ms']:.1f} / {stats['p99_ms']:.1f}\n"
+            
+            await update.message.reply_text(
+                f"```\n{message}\n```",
+                parse_mode='Markdown',
+                reply_markup=self.get_main_keyboard()
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in metrics_command: {e}")
+            await update.message.reply_text(f"❌ خطأ في جلب القياسات: {str(e)}")
+    
     async def help_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self.is_authorized(update):
             await update.message.reply_text("⛔ عذراً، غير مصرح لك باستخدام هذا البوت")
@@ -407,6 +445,7 @@ class TelegramBotController:
 /positions - المراكز المفتوحة
 /regime - حالة السوق
 /logs - آخر السجلات
+/metrics - زمن مراحل الدورة
 /help - هذه الرسالة
 
 💡 يمكنك أيضاً استخدام الأزرار التفاعلية!
@@ -1,4 +1,4 @@
-import requests
+from http_transport import get_transport
 import os
 from logger_setup import setup_logger
 from datetime import datetime
@@ -29,7 +29,7 @@ class TelegramNotifier:
                 'text': message,
                 'parse_mode': 'HTML'
             }
-            response = requests.post(url, data=data, timeout=10)
+            response = get_transport().post(url, data=data)
             
             if response.status_code == 200:
                 logger.debug("✅ Telegram message sent")
@@ -0,0 +1,97 @@
+"""
+تكافؤ محركات المؤشرات (pandas_ta / نوى NumPy / المحرك التدفقي) على سلسلة اصطناعية ثابتة
+"""
+
+import math
+import pytest
+from synthetic_market import SyntheticMarket
+from indicator_kernels import IndicatorKernels
+from streaming_indicators import StreamingIndicatorEngine
+from indicator_snapshot import IndicatorSnapshot
+
+CONFIG = {
+    'indicators': {
+        'rsi_period': 14,
+        'stochastic_period': 14,
+        'stoch_smooth_k': 3,
+        'stoch_d': 3,
+        'bb_period': 20,
+        'bb_std': 2,
+        'macd_fast': 12,
+        'macd_slow': 26,
+        'macd_signal': 9,
+        'ema_short': 20,
+        'ema_long': 50,
+        'adx_period': 14,
+        'adx_threshold': 25
+    }
+}
+
+INDICATORS = IndicatorSnapshot.FIELDS[3:]
+# نوافذ منتهية: القيمة لا تعتمد على ما قبل النافذة
+WINDOWED = ('stoch_k', 'stoch_d', 'bb_upper', 'bb_middle', 'bb_lower')
+OSCILLATORS = ('rsi', 'adx', 'dmp', 'dmn')
+
+WINDOW = 100
+UPDATES = 300
+FAR_FUTURE_MS = 10 ** 15  # كل الشموع مغلقة: لا معاينة
+
+@pytest.fixture(scope='module')
+def candles():
+    market = SyntheticMarket(seed=7)
+    return market.generate('BTCUSDT', WINDOW + UPDATES, '1h', end_time_ms=1_700_000_000_000)
+
+def window(arrays, start, size=WINDOW):
+    return {name: column[start:start + size] for name, column in arrays.items()}
+
+def assert_close(actual, expected, rel=1e-9, abs_=1e-9):
+    for name in INDICATORS:
+        a, e = actual[name], expected[name]
+        if math.isnan(e):
+            assert math.isnan(a), name
+        else:
+            assert a == pytest.approx(e, rel=rel, abs=abs_), name
+
+@pytest.fixture(scope='module')
+def streamed(candles):
+    """المحرك التدفقي بعد UPDATES شمعة مضافة تدريجياً على نافذة منزلقة"""
+    engine = StreamingIndicatorEngine.from_config(CONFIG)
+    engine.update('BTCUSDT', '1h', window(candles, 0), now_ms=FAR_FUTURE_MS)
+    for start in range(1, UPDATES + 1):
+        latest = engine.update('BTCUSDT', '1h', window(candles, start), now_ms=FAR_FUTURE_MS)
+    assert engine.stats['reseeds'] == 1
+    return latest
+
+def test_streaming_matches_kernels_over_seen_history(candles, streamed):
+    kernels = IndicatorKernels.from_config(CONFIG)
+    assert_close(streamed, kernels.latest_values(candles))
+
+def test_streaming_tolerance_against_window_recompute(candles, streamed):
+    recomputed = IndicatorKernels.from_config(CONFIG).latest_values(window(candles, UPDATES))
+    close = recomputed['close']
+    for name in INDICATORS:
+        difference = abs(streamed[name] - recomputed[name])
+        if name in WINDOWED:
+            assert difference <= 1e-9 * max(abs(recomputed[name]), 1.0), name
+        elif name in OSCILLATORS:
+            assert difference <= 1.0, name
+        else:
+            assert difference <= 2e-3 * close, name
+
+def test_batch_matches_latest_values():
+    market = SyntheticMarket(seed=11)
+    data = market.generate_many(['BTCUSDT', 'ETHUSDT', 'BNBUSDT'], WINDOW, '5m')
+    kernels = IndicatorKernels.from_config(CONFIG)
+    for groups in (None, ('rsi', 'macd')):
+        batch = kernels.latest_values_batch(data, groups)
+        for symbol, arrays in data.items():
+            assert_close(batch[symbol], kernels.latest_values(arrays, groups))
+
+def test_kernels_match_pandas_ta(candles):
+    pytest.importorskip('pandas_ta')
+    from technical_indicators import TechnicalIndicators
+
+    indicators = TechnicalIndicators(CONFIG)
+    expected = indicators.get_latest_values(indicators.calculate_all_indicators(candles))
+    actual = IndicatorKernels.from_config(CONFIG).latest_values(candles)
+    assert_close(actual, expected, rel=1e-6, abs_=1e-6)
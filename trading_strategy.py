@@ -204,16 +204,10 @@ class TradingStrategy:
                 signals.append(f"RSI={indicators['rsi']:.2f} > {self.rsi_overbought}")
                 sell_reason = "RSI_OVERBOUGHT"
             
-            if entry_price:
-                profit_percent = ((indicators['close'] - entry_price) / entry_price) * 100
-                
-                take_profit_percent = self.config['risk_management']['take_profit_percent']
-                if position and 'take_profit_percent' in position:
-                    take_profit_percent = position['take_profit_percent']
-                
-                if profit_percent >= take_profit_percent:
-                    signals.append(f"Profit={profit_percent:.2f}% >= Target={take_profit_percent:.1f}%")
-                    sell_reason = "TAKE_PROFIT"
+            reached, profit_percent, take_profit_percent = self.take_profit_status(indicators['close'], entry_price, position)
+            if reached:
+                signals.append(f"Profit={profit_percent:.2f}% >= Target={take_profit_percent:.1f}%")
+                sell_reason = "TAKE_PROFIT"
             
             if prev_indicators and not np.isnan(prev_indicators.get('macd_hist', np.nan)):
                 macd_bearish_cross = (
@@ -257,3 +251,31 @@ class TradingStrategy:
         except Exception as e:
             logger.error(f"Error checking stop loss: {e}")
             return False
+    
+    def take_profit_status(self, current_price, entry_price, position=None):
+        """
+        (تحقق الهدف, نسبة الربح, نسبة الهدف) - مصدر واحد لعتبة Take Profit
+        يستخدمه check_sell_signal و should_take_profit
+        """
+        if not entry_price:
+            return False, 0.0, None
+        
+        profit_percent = ((current_price - entry_price) / entry_price) * 100
+        
+        take_profit_percent = self.config['risk_management']['take_profit_percent']
+        if position and 'take_profit_percent' in position:
+            take_profit_percent = position['take_profit_percent']
+        
+        return profit_percent >= take_profit_percent, profit_percent, take_profit_percent
+    
+    def should_take_profit(self, current_price, entry_price, position=None):
+        try:
+            reached, profit_percent, take_profit_percent = self.take_profit_status(current_price, entry_price, position)
+            if reached:
+                logger.info(f"🎯 TAKE PROFIT TRIGGERED: Profit={profit_percent:.2f}% >= {take_profit_percent}%")
+                return True
+            
+            return False
+        except Exception as e:
+            logger.error(f"Error checking take profit: {e}")
+            return False